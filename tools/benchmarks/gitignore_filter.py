@@ -0,0 +1,93 @@
+"""Measure the time taken to filter the paths in a tree with gitignore.PathFilter,
+compared with checking each path against each rule in turn.
+
+The paths are collected from the tree first, so only the filtering is timed.
+The reference filter doesn't prune paths inside ignored directories, so the
+number of included paths can differ when the tree contains ignored
+directories.
+
+Usage: python tools/benchmarks/gitignore_filter.py [--root PATH] [--extra RULE ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir, os.pardir)))
+
+from tools.gitignore.gitignore import PathFilter
+
+
+def reference_filter(path_filter, path):
+    """Check a path against each rule in turn, in the way PathFilter did before
+    the rules were combined"""
+    if path[-1] == "/":
+        path = path[:-1]
+        rules = path_filter.rules_dir
+    else:
+        rules = path_filter.rules_file
+    include = True
+    for regexp, invert in rules:
+        if not include and invert and regexp.match(path):
+            include = True
+        elif include and not invert and regexp.match(path):
+            include = False
+    return include
+
+
+def collect_paths(root):
+    rv = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        if rel_dir == os.curdir:
+            rel_dir = ""
+        for dir_name in dirnames:
+            rv.append(os.path.join(rel_dir, dir_name) + "/")
+        for filename in filenames:
+            rv.append(os.path.join(rel_dir, filename))
+    return rv
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", action="store",
+                        default=os.path.abspath(os.path.join(here, os.pardir, os.pardir)),
+                        help="Root of the tree, containing the .gitignore file")
+    parser.add_argument("--extra", action="append", default=[".git/*"],
+                        help="Extra rule to add to the ones in .gitignore")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of times to repeat each measurement, keeping the fastest")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    paths = collect_paths(args.root)
+    rules = PathFilter(args.root, args.extra)
+    print("%i paths, %i file rules, %i directory rules" % (len(paths), len(rules.rules_file),
+                                                          len(rules.rules_dir)))
+
+    def run_reference():
+        return sum(1 for path in paths if reference_filter(rules, path))
+
+    def run_filter():
+        path_filter = PathFilter(args.root, args.extra)
+        return sum(1 for path in paths if path_filter(path))
+
+    for name, func in [("reference", run_reference),
+                       ("PathFilter", run_filter)]:
+        results = [timed(func) for _ in xrange(args.repeat)]
+        elapsed = min(item[0] for item in results)
+        print("%-10s %7.3f s %10.0f paths/s %8i included" % (name, elapsed, len(paths) / elapsed,
+                                                             results[0][1]))
+
+
+def timed(func):
+    start = time.time()
+    rv = func()
+    return time.time() - start, rv
+
+
+if __name__ == "__main__":
+    main()
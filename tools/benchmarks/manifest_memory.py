@@ -0,0 +1,64 @@
+"""Measure the time and memory taken to load a manifest and construct all of
+its items, as wptrunner does at startup.
+
+Usage: python tools/benchmarks/manifest_memory.py [--manifest PATH]
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir)))
+
+import localpaths
+from manifest import manifest
+
+wpt_root = localpaths.repo_root
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+    return rss / 1024.0
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--manifest", default=os.path.join(wpt_root, "MANIFEST.json"),
+                        help="Path to the manifest to load")
+    parser.add_argument("--tests-root", default=wpt_root,
+                        help="Path to the root of the tests")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+
+    gc.collect()
+    start_rss = max_rss_mb()
+    start = time.time()
+
+    m = manifest.load(args.tests_root, args.manifest)
+    if m is None:
+        print("Failed to load manifest from %s" % args.manifest)
+        return 1
+    load_time = time.time() - start
+
+    count = 0
+    for _, _, tests in m:
+        count += len(tests)
+    total_time = time.time() - start
+
+    gc.collect()
+    print("Items:        %d" % count)
+    print("Load time:    %.2fs" % load_time)
+    print("Total time:   %.2fs" % total_time)
+    print("Memory:       %.1f MB" % (max_rss_mb() - start_rss))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Measure the cost of looking up a handler in wptserve's Router as the
+number of registered routes grows, compared with checking each route's
+regexp in turn.
+
+Routes are generated the same way as serve.RoutesBuilder, with seven routes
+per mount point.
+
+Usage: python tools/benchmarks/router_dispatch.py [--requests N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir)))
+
+import localpaths
+from six.moves.urllib.parse import urlsplit
+from wptserve.router import Router, any_method
+
+
+class Request(object):
+    def __init__(self, method, path):
+        self.method = method
+        self.url_parts = urlsplit(path)
+        self.route_match = None
+
+
+def linear_get_handler(router, request):
+    for method, regexp, handler in reversed(router.routes):
+        if (request.method == method or
+            method in (any_method, "*") or
+            (request.method == "HEAD" and method == "GET")):
+            m = regexp.match(request.url_parts.path)
+            if m:
+                return handler
+    return None
+
+
+def make_routes(mount_points):
+    routes = [("GET", "/tools/runner/*", None),
+              ("POST", "/tools/runner/update_manifest.py", None),
+              ("*", "/_certs/*", None),
+              ("*", "/tools/*", None),
+              ("*", "{spec}/tools/*", None),
+              ("*", "/serve.py", None)]
+    # As in RoutesBuilder.get_routes, mount points added later get priority
+    for url_base in reversed(mount_points):
+        for method, suffix in [("GET", "*.worker.html"),
+                               ("GET", "*.window.html"),
+                               ("GET", "*.any.html"),
+                               ("GET", "*.any.worker.js"),
+                               ("GET", "*.asis"),
+                               ("*", "*.py"),
+                               ("GET", "*")]:
+            routes.append((method, url_base + suffix, url_base + suffix))
+    return routes
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000,
+                        help="Number of lookups to time for each route count")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+
+    # A mix of requests that are handled by the root mount point, and so
+    # have to get past the routes for every other mount point first
+    requests = [Request("GET", "/dom/nodes/Node-cloneNode.html"),
+                Request("GET", "/fetch/api/resources/preflight.py"),
+                Request("GET", "/html/webappapis/atob/base64.any.worker.js"),
+                Request("POST", "/XMLHttpRequest/resources/echo-method.py")]
+
+    print("%8s %12s %12s" % ("routes", "linear (us)", "indexed (us)"))
+    for mount_count in [0, 2, 5, 10, 20, 50]:
+        mount_points = ["/"] + ["/mount%i/" % i for i in range(mount_count)]
+        router = Router("/", make_routes(mount_points))
+        for request in requests:
+            assert router.get_handler(request) == linear_get_handler(router, request)
+
+        results = []
+        for func in [linear_get_handler, lambda router, request: router.get_handler(request)]:
+            def run():
+                for request in requests:
+                    func(router, request)
+            count = args.requests // len(requests)
+            results.append(timeit.timeit(run, number=count) / (count * len(requests)) * 1e6)
+        print("%8i %12.2f %12.2f" % ((len(router.routes),) + tuple(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Compare the wall-clock time to run a synthetic, skewed set of tests with
+wptrunner's SingleTestSource against the previous scheme of assigning each
+test to a process by hash(test.id) up front.
+
+Each simulated manager is a thread that sleeps for the duration of each
+test it runs. Most tests are short, but a small fraction have a long
+duration, as with tests that time out.
+
+Usage: python tools/benchmarks/runner_scheduling.py [--processes N] [--tests N]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir, "wptrunner")))
+
+from wptrunner.testloader import SingleTestSource
+
+
+class Test(object):
+    def __init__(self, id, duration):
+        self.id = id
+        self.duration = duration
+
+    def update_metadata(self, metadata):
+        return metadata
+
+
+def make_tests(count, slow_fraction, scale, seed):
+    rng = random.Random(seed)
+    tests = []
+    for i in xrange(count):
+        if rng.random() < slow_fraction:
+            duration = rng.uniform(20, 40) * scale
+        else:
+            duration = rng.uniform(0.5, 1.5) * scale
+        tests.append(Test("/dir%i/test%i.html" % (i // 50, i), duration))
+    return tests
+
+
+def run_partitioned(tests, processes):
+    queues = [deque() for _ in xrange(processes)]
+    for test in tests:
+        queues[hash(test.id) % processes].append(test)
+
+    def run(group):
+        while group:
+            time.sleep(group.popleft().duration)
+
+    return run_threads([(run, (group,)) for group in queues])
+
+
+def run_shared(tests, processes):
+    queue = SingleTestSource.make_queue(tests, processes=processes)
+
+    def run(source):
+        while True:
+            group, _ = source.group()
+            if group is None:
+                break
+            try:
+                test = group.popleft()
+            except IndexError:
+                continue
+            time.sleep(test.duration)
+
+    return run_threads([(run, (SingleTestSource(queue),)) for _ in xrange(processes)])
+
+
+def run_threads(targets):
+    finished = []
+
+    def wrapper(func, args):
+        func(*args)
+        finished.append(time.time())
+
+    threads = [threading.Thread(target=wrapper, args=item) for item in targets]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Wall-clock time, and time from the first manager running out of tests
+    # to the end of the run
+    return max(finished) - start, max(finished) - min(finished)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4,
+                        help="Number of simulated test runner managers")
+    parser.add_argument("--tests", type=int, default=800,
+                        help="Number of tests")
+    parser.add_argument("--slow-fraction", type=float, default=0.02,
+                        help="Fraction of tests that are slow")
+    parser.add_argument("--scale", type=float, default=0.005,
+                        help="Duration in seconds of a typical short test")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    tests = make_tests(args.tests, args.slow_fraction, args.scale, args.seed)
+    total = sum(test.duration for test in tests)
+    print("%i tests, %.2fs of test time over %i processes (ideal %.2fs)" %
+          (len(tests), total, args.processes, total / args.processes))
+    print("%-12s %10s %10s" % ("scheduler", "wall (s)", "tail (s)"))
+    for name, func in [("partitioned", run_partitioned), ("shared", run_shared)]:
+        wall, tail = func(tests, args.processes)
+        print("%-12s %10.2f %10.2f" % (name, wall, tail))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Measure the latency of reftest screenshot cache operations from several
+test runner processes at once, using a multiprocessing.Manager dict proxy
+compared with the shared memory ScreenshotHashStore.
+
+Each process looks up the hashes of a set of reference urls, adding the
+hashes that are missing, like RefTestImplementation.get_hash; in the "with
+screenshots" case a screenshot is also stored for every tenth url, like
+the proxy cache did after a failure.
+
+Usage: python tools/benchmarks/screenshot_cache.py [--processes N] [--urls N]
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir, "wptrunner")))
+
+from wptrunner.screenshotcache import ScreenshotHashStore, ScreenshotLRU
+
+
+def run_proxy(cache, keys, screenshot, results):
+    start = time.time()
+    for i, key in enumerate(keys):
+        if key not in cache:
+            cache[key] = (hashlib.sha1(key[0]).hexdigest(), None)
+        else:
+            hash_value, _ = cache[key]
+        if screenshot is not None and i % 10 == 0:
+            cache[key] = (cache[key][0], screenshot)
+    results.put((time.time() - start) / len(keys))
+
+
+def run_store(cache, keys, screenshot, results):
+    screenshots = ScreenshotLRU()
+    start = time.time()
+    for i, key in enumerate(keys):
+        hash_value = cache.get(key)
+        if hash_value is None:
+            cache[key] = hashlib.sha1(key[0]).hexdigest()
+        if screenshot is not None and i % 10 == 0:
+            screenshots[key] = screenshot
+    results.put((time.time() - start) / len(keys))
+
+
+def measure(func, cache, args):
+    urls = [("/css/ref-%i.html" % i, None, None) for i in xrange(args.urls)]
+    screenshot = "x" * args.screenshot_size if args.screenshots else None
+    results = multiprocessing.Queue()
+    procs = []
+    for i in xrange(args.processes):
+        keys = list(urls)
+        random.Random(i).shuffle(keys)
+        procs.append(multiprocessing.Process(target=func,
+                                             args=(cache, keys, screenshot, results)))
+    for proc in procs:
+        proc.start()
+    latencies = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return sum(latencies) / len(latencies)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8,
+                        help="Number of processes using the cache at once")
+    parser.add_argument("--urls", type=int, default=5000,
+                        help="Number of reference urls looked up by each process")
+    parser.add_argument("--screenshot-size", type=int, default=100000,
+                        help="Size in bytes of the screenshots stored with --screenshots")
+    parser.add_argument("--no-screenshots", action="store_false", dest="screenshots",
+                        help="Only measure the case without screenshots")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    screenshot_cases = [False, True] if args.screenshots else [False]
+
+    print("%i processes, %i urls" % (args.processes, args.urls))
+    manager = multiprocessing.Manager()
+    try:
+        for screenshots in screenshot_cases:
+            args.screenshots = screenshots
+            label = "with screenshots" if screenshots else "hashes only"
+            for name, func, cache in [("proxy", run_proxy, manager.dict()),
+                                      ("store", run_store, ScreenshotHashStore())]:
+                latency = measure(func, cache, args)
+                print("%-16s %-6s %8.1f us/lookup" % (label, name, latency * 1e6))
+    finally:
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure the time taken to apply the sub pipe to the .sub.html files in
+the tree, with every request parsing the template from scratch compared
+with rendering a template compiled once and kept in the template cache.
+
+Usage: python tools/benchmarks/sub_templates.py [--rounds N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+here = os.path.dirname(__file__)
+wpt_root = os.path.abspath(os.path.join(here, os.pardir, os.pardir))
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir)))
+
+import localpaths
+from six.moves.urllib.parse import urlsplit
+from wptserve.pipes import template, template_cache
+from wptserve.request import RequestHeaders, MultiDict
+
+
+class Server(object):
+    def __init__(self):
+        domains = {"": "web-platform.test"}
+        for subdomain in ["www", "www1", "www2", u"\u5929\u6c17\u306e\u826f\u3044\u65e5",
+                          u"\xe9l\xe8ve"]:
+            domains[subdomain] = "%s.web-platform.test" % subdomain
+        self.config = {"host": "web-platform.test",
+                       "domains": domains,
+                       "ports": {"http": [8000, 8001],
+                                 "https": [8443],
+                                 "ws": [8888],
+                                 "wss": [8889]}}
+
+
+class Request(object):
+    def __init__(self, path):
+        self.server = Server()
+        self.url_parts = urlsplit("http://web-platform.test:8000/%s?a=b" % path)
+        self.url_base = "/"
+        self.headers = RequestHeaders({})
+        self.GET = MultiDict()
+
+
+def sub_html_files():
+    for dir_path, dir_names, file_names in os.walk(wpt_root):
+        dir_names[:] = [item for item in dir_names
+                        if not item.startswith(".") and
+                        os.path.join(dir_path, item) != os.path.join(wpt_root, "tools")]
+        for name in file_names:
+            if name.endswith(".sub.html"):
+                yield os.path.join(dir_path, name)
+
+
+def render_uncached(path, request):
+    with open(path, "rb") as f:
+        return template(request, f.read())
+
+
+def render_cached(path, request):
+    with open(path, "rb") as f:
+        return template_cache.get(path, f).render(request)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20,
+                        help="Number of times to render every file")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+
+    files = []
+    for path in sub_html_files():
+        request = Request(os.path.relpath(path, wpt_root))
+        try:
+            render_uncached(path, request)
+        except Exception:
+            # Uses substitutions that need a full server configuration
+            continue
+        files.append((path, request))
+
+    print("%i .sub.html files, %i rounds" % (len(files), args.rounds))
+    for name, func in [("uncached", render_uncached), ("cached", render_cached)]:
+        def run():
+            for path, request in files:
+                func(path, request)
+        run()
+        elapsed = timeit.timeit(run, number=args.rounds)
+        print("%-10s %8.1f us/file" % (name, elapsed / (args.rounds * len(files)) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Measure the time taken to update expectation metadata from large raw
+logs, reading the logs serially compared with parsing them in a pool of
+processes and merging the resulting tables.
+
+Synthetic logs are generated for a number of platforms, each with the
+test_status and test_end messages of every test plus the log and
+process_output messages that fill real logs. The "mozlog" case decodes
+every line with mozlog.reader, as the updater did before, to show the cost
+of the parsing on its own.
+
+Usage: python tools/benchmarks/update_expected.py [--logs N] [--tests N] [--subtests N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir, "wptrunner")))
+
+from mozlog import reader
+
+from wptrunner import manifestupdate, metadata
+
+
+class ManifestItem(object):
+    item_type = "testharness"
+
+    def __init__(self, id):
+        self.id = id
+
+
+def write_logs(tmp_dir, args):
+    rng = random.Random(0)
+    log_filenames = []
+    for i in xrange(args.logs):
+        path = os.path.join(tmp_dir, "log%i.json" % i)
+        run_info = {"os": ["linux", "mac", "win"][i % 3], "debug": i % 2 == 0}
+        timestamp = 1500000000000
+        with open(path, "w") as f:
+            def write(action, **data):
+                data.update({"action": action, "time": timestamp, "thread": "TestRunner",
+                             "pid": 1000 + i, "source": "web-platform-tests"})
+                f.write(json.dumps(data) + "\n")
+
+            write("suite_start", tests=[], run_info=run_info)
+            for test in xrange(args.tests):
+                test_id = "/dir%i/test%i.html" % (test // 100, test)
+                write("test_start", test=test_id)
+                for _ in xrange(args.noise):
+                    write("process_output", process="1000", command="browser",
+                          data="console.log: %s %s" % (test_id, "x" * 60))
+                write("log", level="INFO", message="Loading %s" % test_id)
+                for subtest in xrange(args.subtests):
+                    status = "FAIL" if rng.random() < 0.05 else "PASS"
+                    write("test_status", test=test_id, subtest="subtest %i" % subtest,
+                          status=status, expected="PASS", message=None)
+                write("test_end", test=test_id, status="OK", expected="OK")
+                timestamp += 100
+            write("suite_end")
+        log_filenames.append(path)
+    return log_filenames
+
+
+def create_updater(args):
+    test_manifest = object()
+    expected_tree = {}
+    id_path_map = {}
+    for test in xrange(args.tests):
+        test_id = "/dir%i/test%i.html" % (test // 100, test)
+        item = ManifestItem(test_id)
+        expected = manifestupdate.ExpectedManifest(None, test_id[1:], "/")
+        expected.append(manifestupdate.TestNode.create(test_id))
+        expected_tree[item] = expected
+        id_path_map[test_id] = (test_manifest, item)
+    return metadata.ExpectedUpdater({test_manifest: {}}, {test_manifest: expected_tree},
+                                    id_path_map)
+
+
+def read_mozlog(log_filenames):
+    count = 0
+    for log_filename in log_filenames:
+        with open(log_filename) as f:
+            for _ in reader.read(f):
+                count += 1
+    return count
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs", type=int, default=12,
+                        help="Number of log files, one for each platform or chunk")
+    parser.add_argument("--tests", type=int, default=2000,
+                        help="Number of tests in each log")
+    parser.add_argument("--subtests", type=int, default=20,
+                        help="Number of subtests of each test")
+    parser.add_argument("--noise", type=int, default=5,
+                        help="Number of process_output messages logged by each test")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(),
+                        help="Number of processes to parse the logs with")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        log_filenames = write_logs(tmp_dir, args)
+        size = sum(os.path.getsize(item) for item in log_filenames)
+        print("%i logs, %.1f MB, %i processes" % (args.logs, size / 1e6, args.processes))
+
+        start = time.time()
+        read_mozlog(log_filenames)
+        print("%-24s %6.2f s" % ("mozlog (parse only)", time.time() - start))
+
+        for name, processes in [("serial", 1), ("parallel", args.processes)]:
+            updater = create_updater(args)
+            start = time.time()
+            updater.update_from_log_files(log_filenames, processes=processes)
+            print("%-24s %6.2f s" % (name, time.time() - start))
+
+        start = time.time()
+        tables = [metadata.read_log_file_results(item) for item in log_filenames]
+        parse_time = time.time() - start
+        updater = create_updater(args)
+        start = time.time()
+        for results in tables:
+            updater.update_from_results(results)
+        print("%-24s %6.2f s parse, %6.2f s merge" % ("serial breakdown", parse_time,
+                                                      time.time() - start))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure the throughput of the wptmanifest tokenizer used for expectation
+metadata files, compared with the original character at a time tokenizer.
+
+By default a set of synthetic metadata files is tokenized; pass --metadata
+to use the .ini files under a metadata directory instead.
+
+Usage: python tools/benchmarks/wptmanifest_tokenizer.py [--files N] [--metadata PATH]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+here = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(here, os.pardir, "wptrunner")))
+
+from wptrunner.wptmanifest.parser import Tokenizer, parse, token_types
+from wptrunner.wptmanifest.tests.reference_tokenizer import ReferenceTokenizer
+
+
+def synthetic_manifest(rng, index):
+    lines = ["[test%i.html]" % index,
+             "  type: testharness",
+             "  prefs: [dom.feature.enabled:true, layout.css.property:false]",
+             "  expected:",
+             '    if os == "linux" and not debug: TIMEOUT',
+             '    if (os == "win") and (version == "10.0"): ERROR  # bug 12345',
+             "    OK"]
+    for subtest in xrange(rng.randint(1, 10)):
+        lines.extend(["",
+                      "  [Subtest %i checking that the \\] escape and some values work]" % subtest,
+                      "    expected:",
+                      '      if debug and (processor == "x86") and bits == 32: PASS',
+                      "      FAIL"])
+    return "\n".join(lines) + "\n"
+
+
+def load_metadata(path):
+    rv = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            if filename.endswith(".ini"):
+                with open(os.path.join(dirpath, filename)) as f:
+                    rv.append(f.read())
+    return rv
+
+
+def tokenize_all(tokenizer_cls, manifests):
+    count = 0
+    for data in manifests:
+        for token in tokenizer_cls().tokenize(data):
+            if token[0] == token_types.eof:
+                break
+            count += 1
+    return count
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000,
+                        help="Number of synthetic metadata files")
+    parser.add_argument("--metadata", action="store",
+                        help="Directory containing .ini files to use instead of synthetic ones")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of times to repeat each measurement, keeping the fastest")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    if args.metadata:
+        manifests = load_metadata(args.metadata)
+    else:
+        rng = random.Random(0)
+        manifests = [synthetic_manifest(rng, i) for i in xrange(args.files)]
+    size = sum(len(item) for item in manifests)
+    lines = sum(item.count("\n") for item in manifests)
+    print("%i files, %i lines, %.1f MB" % (len(manifests), lines, size / 1e6))
+
+    for name, func in [("reference", lambda: tokenize_all(ReferenceTokenizer, manifests)),
+                       ("tokenizer", lambda: tokenize_all(Tokenizer, manifests)),
+                       ("parse", lambda: [parse(item) for item in manifests])]:
+        elapsed = min(timed(func) for _ in xrange(args.repeat))
+        print("%-10s %7.2f s %8.0f lines/s %6.2f MB/s" % (name, elapsed, lines / elapsed,
+                                                          size / elapsed / 1e6))
+
+
+def timed(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+if __name__ == "__main__":
+    main()
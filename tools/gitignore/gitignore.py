@@ -1,9 +1,13 @@
 import itertools
 import re
 import os
+from collections import OrderedDict
 
 end_space = re.compile(r"([^\\]\s)*$")
 
+# Start of the regexps for patterns that can match in any directory
+any_dir_prefix = "^(?:.*/)?"
+
 
 def fnmatch_translate(pat, path_name=False):
     parts = []
@@ -16,7 +20,7 @@ def fnmatch_translate(pat, path_name=False):
             pat = pat[1:]
     else:
         any_char = "."
-        parts.append("^(?:.*/)?")
+        parts.append(any_dir_prefix)
     while i < len(pat):
         c = pat[i]
         if c == "\\":
@@ -87,8 +91,53 @@ def parse_line(line):
     return invert, dir_only, fnmatch_translate(line, "/" in line)
 
 
+def compile_rules(rules):
+    """Compile a list of (regexp, invert) rules into a list of (regexp, invert)
+    pairs with one combined regexp for each run of consecutive rules with the
+    same value of invert.
+
+    Whether a path is included is decided by the last rule that matches it, so
+    only the last run with a matching rule needs to be found. The rules that
+    can match in any directory share their leading (?:.*/)? so that it's only
+    tried once per path, and for those starting with * it's dropped, since the
+    .* it's followed by already matches any directory."""
+    rv = []
+    for invert, group in itertools.groupby(rules, lambda x: x[1]):
+        any_dir = []
+        any_suffix = []
+        other = []
+        for regexp, _ in group:
+            pattern = regexp.pattern
+            if pattern.startswith(any_dir_prefix + ".*"):
+                any_suffix.append(pattern[len(any_dir_prefix) + 2:-1])
+            elif pattern.startswith(any_dir_prefix):
+                any_dir.append(pattern[len(any_dir_prefix):-1])
+            else:
+                other.append(pattern)
+        if any_dir:
+            other.insert(0, "%s(?:%s)$" % (any_dir_prefix, "|".join(any_dir)))
+        if any_suffix:
+            other.insert(0, "^.*(?:%s)$" % "|".join(any_suffix))
+        rv.append((re.compile("|".join("(?:%s)" % pattern for pattern in other)), invert))
+    rv.reverse()
+    return rv
+
+
 class PathFilter(object):
-    def __init__(self, root, extras=None):
+    """Filter for paths relative to a repository root, based on the rules in
+    the .gitignore file at the root and any extra rules.
+
+    Calling the filter with a path returns False if the path is ignored. Paths
+    ending in / are directories and are only matched against rules ending in
+    /. Files and directories inside an ignored directory are also ignored; the
+    verdicts for directories are kept in an LRU cache so that each directory is
+    only matched once while walking a tree.
+
+    :param root: Path to the repository root, or None
+    :param extras: List of extra rules in .gitignore syntax
+    :param cache_size: Maximum number of directory verdicts to cache"""
+
+    def __init__(self, root, extras=None, cache_size=1024):
         if root:
             ignore_path = os.path.join(root, ".gitignore")
         else:
@@ -100,6 +149,14 @@ class PathFilter(object):
 
         self.rules_file = []
         self.rules_dir = []
+        self._compiled_file = None
+        self._compiled_dir = None
+
+        self.cache_size = cache_size
+        self._dir_cache = OrderedDict()
+        # Most consecutive paths are in the same directory
+        self._last_dir = None
+        self._last_dir_included = None
 
         if extras is None:
             extras = []
@@ -124,6 +181,41 @@ class PathFilter(object):
             self.rules_dir.append((regexp, invert))
         else:
             self.rules_file.append((regexp, invert))
+        self._compiled_file = None
+        self._compiled_dir = None
+        self._dir_cache.clear()
+        self._last_dir = None
+
+    def _match(self, path, path_is_dir):
+        if path_is_dir:
+            if self._compiled_dir is None:
+                self._compiled_dir = compile_rules(self.rules_dir)
+            rules = self._compiled_dir
+        else:
+            if self._compiled_file is None:
+                self._compiled_file = compile_rules(self.rules_file)
+            rules = self._compiled_file
+
+        for regexp, invert in rules:
+            if regexp.match(path):
+                return invert
+        return True
+
+    def _dir_included(self, path):
+        """Check whether the directory at path, without a trailing /, and all
+        its parent directories are included"""
+        if not path:
+            return True
+        cache = self._dir_cache
+        if path in cache:
+            include = cache.pop(path)
+        else:
+            include = (self._dir_included(path.rpartition("/")[0]) and
+                       self._match(path, True))
+            if len(cache) >= self.cache_size:
+                cache.popitem(last=False)
+        cache[path] = include
+        return include
 
     def __call__(self, path):
         if os.path.sep != "/":
@@ -132,17 +224,11 @@ class PathFilter(object):
         if self.trivial:
             return True
 
-        path_is_dir = path[-1] == "/"
-        if path_is_dir:
-            path = path[:-1]
-            rules = self.rules_dir
-        else:
-            rules = self.rules_file
+        if path[-1] == "/":
+            return self._dir_included(path[:-1])
 
-        include = True
-        for regexp, invert in rules:
-            if not include and invert and regexp.match(path):
-                include = True
-            elif include and not invert and regexp.match(path):
-                include = False
-        return include
+        dir_path = path.rpartition("/")[0]
+        if dir_path != self._last_dir:
+            self._last_dir_included = self._dir_included(dir_path)
+            self._last_dir = dir_path
+        return self._last_dir_included and self._match(path, False)
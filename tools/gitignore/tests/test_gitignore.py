@@ -1,6 +1,6 @@
 import pytest
 
-from ..gitignore import fnmatch_translate, PathFilter
+from ..gitignore import compile_rules, fnmatch_translate, PathFilter
 
 match_data = [
     ("foo", False, ["a/foo", "foo"]),
@@ -73,3 +73,55 @@ def test_path_filter(path, expected):
     ]
     f = PathFilter(None, extras)
     assert f(path) == expected
+
+
+def reference_filter(path_filter, path):
+    """Check a path against each rule in turn, without the combined regexps
+    or the directory pruning"""
+    if path[-1] == "/":
+        path = path[:-1]
+        rules = path_filter.rules_dir
+    else:
+        rules = path_filter.rules_file
+    include = True
+    for regexp, invert in rules:
+        if regexp.match(path):
+            include = invert
+    return include
+
+
+def test_path_filter_rule_order():
+    extras = ["*.a", "!b.a", "c/*.a", "!*.b", "*.b", "d/", "!d/", "e/", "!e/f/"]
+    f = PathFilter(None, extras)
+    paths = ["x.a", "b.a", "c/b.a", "c/x.a", "x.b", "d/", "e/", "f/"]
+    for path in paths:
+        assert f(path) == reference_filter(f, path), path
+    assert [path for path in paths if f(path)] == ["b.a", "d/", "f/"]
+    # The parent directory is ignored
+    assert not f("e/f/")
+
+
+def test_path_filter_ignored_dir():
+    f = PathFilter(None, ["build/", "!keep"], cache_size=2)
+    assert f("a/b.txt")
+    assert not f("build/")
+    assert not f("a/build/")
+    # Everything under an ignored directory is ignored, including paths that
+    # a later rule includes
+    assert not f("a/build/keep")
+    assert not f("a/build/c/")
+    assert not f("a/build/c/d.txt")
+    assert f("a/c/d.txt")
+    assert len(f._dir_cache) == 2
+    assert not f("a/build/c/d.txt")
+
+
+@pytest.mark.parametrize("pattern, input, path_name",
+                         list(expand_data(match_data)) + list(expand_data(mismatch_data)))
+def test_compile_rules(pattern, input, path_name):
+    regexp = fnmatch_translate(pattern, path_name)
+    other = fnmatch_translate("other", False)
+    for rules in [[(regexp, False)], [(other, False), (regexp, False)]]:
+        compiled = compile_rules(rules)
+        assert len(compiled) == 1
+        assert bool(compiled[0][0].match(input)) == bool(regexp.match(input))
@@ -3,8 +3,10 @@ from __future__ import print_function, unicode_literals
 import abc
 import argparse
 import ast
+import hashlib
 import itertools
 import json
+import multiprocessing
 import os
 import re
 import subprocess
@@ -17,8 +19,10 @@ from .. import localpaths
 from ..gitignore.gitignore import PathFilter
 from ..wpt import testfiles
 
-from manifest.sourcefile import SourceFile, js_meta_re, python_meta_re, space_chars
-from six import binary_type, iteritems, itervalues
+from manifest.sourcefile import SourceFile, blob_hash, js_meta_re, python_meta_re, space_chars
+from manifest.utils import replace_file
+from manifest.vcs import MtimeCache
+from six import BytesIO, binary_type, iteritems, itervalues
 from six.moves import range
 from six.moves.urllib.parse import urlsplit, urljoin
 
@@ -450,7 +454,7 @@ def check_parsed(repo_root, path, f):
         reference_file = os.path.join(repo_root, ref_parts.path[1:])
         reference_rel = reftest_node.attrib.get("rel", "")
 
-        if not os.path.isfile(reference_file):
+        if not file_exists(repo_root, reference_file):
             errors.append(("NON-EXISTENT-REF",
                      "Reference test with a non-existent '%s' relationship reference: '%s'" % (reference_rel, href), path, None))
 
@@ -671,6 +675,204 @@ def check_file_contents(repo_root, path, f):
     return errors
 
 
+# List of (path, exists) pairs for the other files whose existence was checked
+# while linting a file, or None if the checks aren't being recorded
+_checked_files = None
+
+
+def file_exists(repo_root, abs_path):
+    """
+    Checks whether a file other than the one being linted exists. The result
+    affects the errors for the file being linted, so it is recorded in order
+    that cached errors can be discarded when it changes.
+
+    :param repo_root: the repository root
+    :param abs_path: the absolute path of the file
+    :returns: True if the file exists
+    """
+
+    rv = os.path.isfile(abs_path)
+    if _checked_files is not None:
+        _checked_files.append((os.path.relpath(abs_path, repo_root), rv))
+    return rv
+
+
+def lint_path_recording(repo_root, path):
+    """
+    Runs the path and file contents lints for a single path, recording the
+    other files that were checked for.
+
+    :returns: a tuple of the list of errors found for ``path``, the list of
+              (path, exists) pairs for the other files that were checked, and
+              the hash of the file contents, or None if ``path`` is a directory
+    """
+
+    global _checked_files
+    _checked_files = []
+    try:
+        errors, file_hash = _lint_path(repo_root, path)
+        return errors, _checked_files, file_hash
+    finally:
+        _checked_files = None
+
+
+def lint_path(repo_root, path):
+    """
+    Runs the path and file contents lints for a single path.
+
+    :param repo_root: the repository root
+    :param path: the path of the file within the repository
+    :returns: a list of errors found for ``path``, before filtering with the
+              whitelist
+    """
+
+    return _lint_path(repo_root, path)[0]
+
+
+def _lint_path(repo_root, path):
+    errors = check_path(repo_root, path)
+    abs_path = os.path.join(repo_root, path)
+    file_hash = None
+    if not os.path.isdir(abs_path):
+        # The file lints each read the file, so read it from disk only once
+        with open(abs_path, 'rb') as f:
+            content = f.read()
+        file_hash = blob_hash(content)
+        errors.extend(check_file_contents(repo_root, path, BytesIO(content)))
+    return errors, file_hash
+
+
+def _lint_path_worker(args):
+    repo_root, path = args
+    return lint_path_recording(repo_root, path)
+
+
+def lint_paths_parallel(repo_root, paths, jobs):
+    """
+    Runs the path and file contents lints for a list of paths using a pool
+    of worker processes.
+
+    :param repo_root: the repository root
+    :param paths: a list of paths within the repository
+    :param jobs: the number of worker processes to use
+    :returns: an iterator over the result of ``lint_path_recording`` for each
+              path, in the same order as ``paths``, yielding results as soon
+              as they are available
+    """
+
+    # Small chunks keep the output flowing, while avoiding the overhead of
+    # sending each path to a worker separately
+    chunksize = max(1, min(64, len(paths) // (jobs * 4)))
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for errors in pool.imap(_lint_path_worker,
+                                [(repo_root, path) for path in paths],
+                                chunksize):
+            yield errors
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def rules_hash():
+    """
+    Hash of the source of the lints, so that cached errors are discarded when
+    the lints change.
+    """
+
+    rules = hashlib.sha1()
+    for module in [sys.modules[__name__], fnmatch, sys.modules[SourceFile.__module__]]:
+        with open(os.path.splitext(module.__file__)[0] + ".py", "rb") as f:
+            rules.update(f.read())
+    return rules.hexdigest()
+
+
+class LintCache(object):
+    """Persistent cache of the errors found by the path and file contents lints
+    for each file, keyed by the path and validated against the file's mtime,
+    size and inode, or the hash of the contents.
+
+    The errors are stored before they are filtered with the whitelist, so
+    changes to the whitelist apply to cached errors. All the entries are
+    discarded when the lints change.
+
+    :param cache_root: Directory in which to store the cache, or None to
+                       disable caching
+    :param repo_root: the repository root
+    :param rules: Hash of the lint rules, as returned by ``rules_hash``"""
+
+    file_name = "lint.json"
+    version = 2
+
+    def __init__(self, cache_root, repo_root, rules):
+        self.path = os.path.join(cache_root, self.file_name) if cache_root else None
+        self.repo_root = repo_root
+        self.rules = rules
+        self.data = {}
+        if self.path:
+            self.data = self._load()
+        self.modified = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if (not isinstance(data, dict) or
+            data.get("version") != self.version or
+            data.get("rules") != self.rules):
+            return {}
+        return data["entries"]
+
+    def get(self, path, stat, file_hash=None):
+        """Return the cached errors for path if the file is unchanged since the
+        errors were found, either according to its stat or because it has the
+        contents with hash file_hash, and the other files that the lints
+        checked for haven't been added or removed, or None otherwise"""
+        entry = self.data.get(path)
+        if entry is None:
+            return None
+        if entry[0] != MtimeCache._stat_key(stat) and (file_hash is None or
+                                                       entry[1] != file_hash):
+            return None
+        for checked_path, exists in entry[3]:
+            if os.path.isfile(os.path.join(self.repo_root, checked_path)) != exists:
+                return None
+        return [tuple(error) for error in entry[2]]
+
+    def add(self, path, stat, file_hash, errors, checked_files):
+        if self.path is None:
+            return
+        self.data[path] = [MtimeCache._stat_key(stat), file_hash, errors, checked_files]
+        self.modified = True
+
+    def retain(self, paths):
+        """Drop the entries for any paths other than paths"""
+        paths = set(paths)
+        data = {path: entry for path, entry in iteritems(self.data) if path in paths}
+        if len(data) != len(self.data):
+            self.data = data
+            self.modified = True
+
+    def dump(self):
+        if self.path is None or not self.modified:
+            return
+        dir_name = os.path.dirname(self.path)
+        if not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.version,
+                       "rules": self.rules,
+                       "entries": self.data}, f)
+        replace_file(tmp_path, self.path)
+        self.modified = False
+
+
 def output_errors_text(errors):
     for error_type, description, path, line_number in errors:
         pos_string = path
@@ -754,6 +956,13 @@ def create_parser():
                         "option if the lint script exists outside the repository")
     parser.add_argument("--all", action="store_true", help="If no paths are passed, try to lint the whole "
                         "working directory, not just files that changed")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processes to use for linting files, or 0 to use one per CPU")
+    parser.add_argument("--cache-root", action="store", default=None,
+                        help="Path in which to store the cache of lint results for unchanged files "
+                        "(default: <repo-root>/.wptcache)")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", default=True,
+                        help="Lint every file rather than using cached results")
     return parser
 
 
@@ -773,10 +982,21 @@ def main(**kwargs):
 
     paths = lint_paths(kwargs, repo_root)
 
-    return lint(repo_root, paths, output_format)
+    jobs = kwargs.get("jobs", 1)
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+
+    cache_root = None
+    if kwargs.get("cache", True):
+        cache_root = kwargs.get("cache_root") or os.path.join(repo_root, ".wptcache")
 
+    # Only a run over the whole tree knows which files no longer exist
+    all_paths = bool(kwargs.get("all") and not kwargs.get("paths"))
 
-def lint(repo_root, paths, output_format):
+    return lint(repo_root, paths, output_format, jobs, cache_root, all_paths)
+
+
+def lint(repo_root, paths, output_format, jobs=1, cache_root=None, all_paths=False):
     error_count = defaultdict(int)
     last = None
 
@@ -807,24 +1027,52 @@ def lint(repo_root, paths, output_format):
 
         return (errors[-1][0], path)
 
-    for path in paths[:]:
-        abs_path = os.path.join(repo_root, path)
-        if not os.path.exists(abs_path):
-            paths.remove(path)
-            continue
-
-        if any(fnmatch.fnmatch(path, file_match) for file_match in ignored_files):
-            paths.remove(path)
-            continue
+    paths[:] = [path for path in paths
+                if os.path.exists(os.path.join(repo_root, path)) and
+                not any(fnmatch.fnmatch(path, file_match) for file_match in ignored_files)]
+
+    # The errors for unchanged files are taken from the cache. Files that
+    # have been touched since they were linted are still unchanged if their
+    # hash in the manifest's cache matches, but files aren't read here; the
+    # hash of each file that is linted is computed from its contents as it
+    # is linted.
+    lint_cache = LintCache(cache_root, repo_root, rules_hash() if cache_root else None)
+    mtime_cache = MtimeCache(cache_root)
+    cached_errors = {}
+    stats = {}
+    if cache_root is not None:
+        if all_paths:
+            lint_cache.retain(paths)
+        for path in paths:
+            abs_path = os.path.join(repo_root, path)
+            if os.path.isdir(abs_path):
+                continue
+            stat = os.stat(abs_path)
+            stats[path] = stat
+            errors = lint_cache.get(path, stat, mtime_cache.get(path, stat))
+            if errors is not None:
+                cached_errors[path] = errors
+
+    to_lint = [path for path in paths if path not in cached_errors]
+    if jobs > 1 and len(to_lint) > 1:
+        results = lint_paths_parallel(repo_root, to_lint, jobs)
+    else:
+        results = (lint_path_recording(repo_root, path) for path in to_lint)
 
-        errors = check_path(repo_root, path)
+    # Errors are output in the order of the paths however they are computed,
+    # so the output doesn't depend on the number of jobs or on the cache
+    for path in paths:
+        if path in cached_errors:
+            errors = cached_errors[path]
+        else:
+            errors, checked_files, file_hash = next(results)
+            if path in stats:
+                lint_cache.add(path, stats[path], file_hash, errors, checked_files)
         last = process_errors(errors) or last
+    lint_cache.dump()
 
-        if not os.path.isdir(abs_path):
-            with open(abs_path, 'rb') as f:
-                errors = check_file_contents(repo_root, path, f)
-                last = process_errors(errors) or last
-
+    # These lints need the complete list of paths, so they run once all the
+    # files have been linted
     errors = check_all_paths(repo_root, paths)
     last = process_errors(errors) or last
 
@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 
 import os
+import shutil
 import sys
 
 import mock
@@ -247,6 +248,71 @@ def test_lint_passing_and_failing(caplog):
     assert "okay.html" not in caplog.text
 
 
+def test_lint_jobs(caplog):
+    paths = ["ref/non_existent_relative.html", "broken.html", "okay.html",
+             "css/css-unique/a.html", "css/css-unique/match/a.html",
+             "ref/same_file_path.html", "ref/absolute.html", "broken_ignored.html"]
+
+    outputs = []
+    for jobs in [1, 2]:
+        start = len(caplog.text)
+        rv = lint(_dummy_repo, paths[:], "normal", jobs)
+        outputs.append((rv, caplog.text[start:]))
+
+    # The errors are the same, and in the same order, with any number of jobs
+    assert outputs[0] == outputs[1]
+    assert outputs[0][0] > 0
+    assert outputs[0][1].index("non_existent_relative.html") < outputs[0][1].index("broken.html")
+
+
+def test_lint_cache(caplog, tmpdir):
+    repo = str(tmpdir.join("repo"))
+    shutil.copytree(_dummy_repo, repo)
+    cache_root = str(tmpdir.join("cache"))
+    paths = ["broken.html", "okay.html", "ref/non_existent_relative.html"]
+
+    def run(checked_paths):
+        start = len(caplog.text)
+        with _mock_lint("check_file_contents") as mocked_check_file_contents:
+            rv = lint(repo, paths[:], "normal", cache_root=cache_root)
+            linted = sorted(call[0][1] for call in mocked_check_file_contents.call_args_list)
+            assert linted == sorted(checked_paths)
+        return rv, caplog.text[start:]
+
+    first = run(paths)
+    assert first[0] == 2
+    # Unchanged files aren't linted again, and give the same errors
+    assert run([]) == first
+
+    # Changed files are linted again
+    with open(os.path.join(repo, "okay.html"), "a") as f:
+        f.write("<!-- changed --> \n")
+    assert run(["okay.html"])[0] == 3
+
+    # Adding a missing reference file changes the errors of the test
+    with open(os.path.join(repo, "ref", "non_existent_file.html"), "w") as f:
+        f.write("")
+    assert run(["ref/non_existent_relative.html"])[0] == 2
+
+    # Changing the lints discards the cache. The new cache replaces the old
+    # file with a rename, removing it first only on Windows.
+    with mock.patch("os.remove", wraps=os.remove) as remove:
+        with mock.patch.object(lint_mod, "rules_hash", return_value="changed"):
+            assert run(paths)[0] == 2
+    assert not remove.called
+
+    # The hash of each linted file is computed from the contents it was
+    # linted with
+    cache = lint_mod.LintCache(cache_root, repo, "changed")
+    assert cache.data["okay.html"][1] == lint_mod.SourceFile(repo, "okay.html", "/").hash
+
+    # Linting the whole tree drops the entries for files that no longer exist
+    with mock.patch.object(lint_mod, "rules_hash", return_value="changed"):
+        assert lint(repo, paths[1:], "normal", cache_root=cache_root, all_paths=True) == 1
+    cache = lint_mod.LintCache(cache_root, repo, "changed")
+    assert sorted(cache.data.keys()) == paths[1:]
+
+
 def test_check_css_globally_unique_identical_test(caplog):
     with _mock_lint("check_path") as mocked_check_path:
         with _mock_lint("check_file_contents") as mocked_check_file_contents:
@@ -390,7 +456,31 @@ def test_main_with_args():
         sys.argv = ['./lint', 'a', 'b', 'c']
         with _mock_lint('lint', return_value=True) as m:
             lint_mod.main(**vars(create_parser().parse_args()))
-            m.assert_called_once_with(repo_root, ['a', 'b', 'c'], "normal")
+            m.assert_called_once_with(repo_root, ['a', 'b', 'c'], "normal", 1,
+                                      os.path.join(repo_root, ".wptcache"), False)
+    finally:
+        sys.argv = orig_argv
+
+
+def test_main_jobs():
+    orig_argv = sys.argv
+    try:
+        sys.argv = ['./lint', '--jobs', '2', 'a']
+        with _mock_lint('lint', return_value=True) as m:
+            lint_mod.main(**vars(create_parser().parse_args()))
+            m.assert_called_once_with(repo_root, ['a'], "normal", 2,
+                                      os.path.join(repo_root, ".wptcache"), False)
+    finally:
+        sys.argv = orig_argv
+
+
+def test_main_no_cache():
+    orig_argv = sys.argv
+    try:
+        sys.argv = ['./lint', '--no-cache', 'a']
+        with _mock_lint('lint', return_value=True) as m:
+            lint_mod.main(**vars(create_parser().parse_args()))
+            m.assert_called_once_with(repo_root, ['a'], "normal", 1, None, False)
     finally:
         sys.argv = orig_argv
 
@@ -402,7 +492,8 @@ def test_main_no_args():
         with _mock_lint('lint', return_value=True) as m:
             with _mock_lint('changed_files', return_value=['foo', 'bar']) as m2:
                 lint_mod.main(**vars(create_parser().parse_args()))
-                m.assert_called_once_with(repo_root, ['foo', 'bar'], "normal")
+                m.assert_called_once_with(repo_root, ['foo', 'bar'], "normal", 1,
+                                          os.path.join(repo_root, ".wptcache"), False)
     finally:
         sys.argv = orig_argv
 
@@ -414,6 +505,7 @@ def test_main_all():
         with _mock_lint('lint', return_value=True) as m:
             with _mock_lint('all_filesystem_paths', return_value=['foo', 'bar']) as m2:
                 lint_mod.main(**vars(create_parser().parse_args()))
-                m.assert_called_once_with(repo_root, ['foo', 'bar'], "normal")
+                m.assert_called_once_with(repo_root, ['foo', 'bar'], "normal", 1,
+                                          os.path.join(repo_root, ".wptcache"), True)
     finally:
         sys.argv = orig_argv
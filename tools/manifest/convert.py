@@ -0,0 +1,42 @@
+import argparse
+import os
+
+from . import manifest
+from .log import get_logger
+
+here = os.path.dirname(__file__)
+
+wpt_root = os.path.abspath(os.path.join(here, os.pardir, os.pardir))
+
+logger = get_logger()
+
+
+def abs_path(path):
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def convert(tests_root, src_path, dest_path, format):
+    m = manifest.load(tests_root, src_path)
+    if m is None:
+        raise manifest.ManifestError("Failed to load manifest from %s" % src_path)
+    logger.info("Writing %s manifest to %s" % (format, dest_path))
+    manifest.write(m, dest_path, format=format)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "src_path", type=abs_path, help="Path to the manifest to convert.")
+    parser.add_argument(
+        "dest_path", type=abs_path, help="Path to write the converted manifest to.")
+    parser.add_argument(
+        "--format", choices=["json", "sqlite"], default="sqlite",
+        help="Format of the converted manifest. The JSON format is the interchange "
+        "format; the sqlite format allows tests to be loaded on demand.")
+    parser.add_argument(
+        "--tests-root", type=abs_path, default=wpt_root, help="Path to root of tests.")
+    return parser
+
+
+def run(**kwargs):
+    convert(kwargs["tests_root"], kwargs["src_path"], kwargs["dest_path"], kwargs["format"])
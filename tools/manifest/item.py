@@ -2,12 +2,42 @@ import os
 from six.moves.urllib.parse import urljoin
 from abc import ABCMeta, abstractmethod, abstractproperty
 
+from .utils import rel_path_to_url
+
+
+class SourceFileStub(object):
+    """Lightweight stand-in for a SourceFile, used by items loaded from a
+    manifest. This only records where the file is; unlike SourceFile it can't
+    be used to (re)compute the manifest items for the file.
+
+    :param tests_root: Path to the root of the source tree
+    :param rel_path: File path relative to tests_root
+    :param url_base: Base URL used when converting file paths to urls"""
+
+    __slots__ = ("tests_root", "rel_path", "url_base")
+
+    def __init__(self, tests_root, rel_path, url_base):
+        self.tests_root = tests_root
+        self.rel_path = rel_path
+        self.url_base = url_base
+
+    @property
+    def path(self):
+        return os.path.join(self.tests_root, self.rel_path)
+
+    @property
+    def url(self):
+        return rel_path_to_url(self.rel_path, self.url_base)
+
+    @property
+    def meta_flags(self):
+        name = os.path.splitext(os.path.basename(self.rel_path))[0]
+        return name.split(".")[1:]
+
 
 def get_source_file(source_files, tests_root, manifest, path):
     def make_new():
-        from .sourcefile import SourceFile
-
-        return SourceFile(tests_root, path, manifest.url_base)
+        return SourceFileStub(tests_root, path, manifest.url_base)
 
     if source_files is None:
         return make_new()
@@ -18,9 +48,17 @@ def get_source_file(source_files, tests_root, manifest, path):
     return source_files[path]
 
 
+def _slot_names(cls):
+    for klass in cls.__mro__:
+        for name in getattr(klass, "__slots__", ()):
+            yield name
+
+
 class ManifestItem(object):
     __metaclass__ = ABCMeta
 
+    __slots__ = ("manifest", "source_file")
+
     item_type = None
 
     def __init__(self, source_file, manifest=None):
@@ -72,6 +110,8 @@ class ManifestItem(object):
 
 
 class URLManifestItem(ManifestItem):
+    __slots__ = ("_url", "url_base")
+
     def __init__(self, source_file, url, url_base="/", manifest=None):
         ManifestItem.__init__(self, source_file, manifest=manifest)
         self._url = url
@@ -100,6 +140,8 @@ class URLManifestItem(ManifestItem):
 
 
 class TestharnessTest(URLManifestItem):
+    __slots__ = ("timeout", "testdriver")
+
     item_type = "testharness"
 
     def __init__(self, source_file, url, url_base="/", timeout=None, testdriver=False, manifest=None):
@@ -132,6 +174,8 @@ class TestharnessTest(URLManifestItem):
 
 
 class RefTestNode(URLManifestItem):
+    __slots__ = ("references", "timeout", "viewport_size", "dpi")
+
     item_type = "reftest_node"
 
     def __init__(self, source_file, url, references, url_base="/", timeout=None,
@@ -172,42 +216,56 @@ class RefTestNode(URLManifestItem):
                    dpi=extras.get("dpi"),
                    manifest=manifest)
 
+    def _copy_as(self, cls):
+        rv = cls.__new__(cls)
+        for name in _slot_names(type(self)):
+            setattr(rv, name, getattr(self, name))
+        return rv
+
     def to_RefTest(self):
         if type(self) == RefTest:
             return self
-        rv = RefTest.__new__(RefTest)
-        rv.__dict__.update(self.__dict__)
-        return rv
+        return self._copy_as(RefTest)
 
     def to_RefTestNode(self):
         if type(self) == RefTestNode:
             return self
-        rv = RefTestNode.__new__(RefTestNode)
-        rv.__dict__.update(self.__dict__)
-        return rv
+        return self._copy_as(RefTestNode)
 
 
 class RefTest(RefTestNode):
+    __slots__ = ()
+
     item_type = "reftest"
 
 
 class ManualTest(URLManifestItem):
+    __slots__ = ()
+
     item_type = "manual"
 
 
 class ConformanceCheckerTest(URLManifestItem):
+    __slots__ = ()
+
     item_type = "conformancechecker"
 
 
 class VisualTest(URLManifestItem):
+    __slots__ = ()
+
     item_type = "visual"
 
 
 class Stub(URLManifestItem):
+    __slots__ = ()
+
     item_type = "stub"
 
 
 class WebdriverSpecTest(URLManifestItem):
+    __slots__ = ("timeout",)
+
     item_type = "wdspec"
 
     def __init__(self, source_file, url, url_base="/", timeout=None, manifest=None):
@@ -233,6 +291,8 @@ class WebdriverSpecTest(URLManifestItem):
 
 
 class SupportFile(ManifestItem):
+    __slots__ = ()
+
     item_type = "support"
 
     @property
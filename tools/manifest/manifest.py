@@ -1,12 +1,15 @@
 import json
+import multiprocessing
 import os
 import re
-from collections import defaultdict
-from six import iteritems, itervalues, viewkeys
+from bisect import bisect_left
+from collections import defaultdict, Mapping, MutableMapping
+from six import iteritems, itervalues
 
 from .item import ManualTest, WebdriverSpecTest, Stub, RefTestNode, RefTest, TestharnessTest, SupportFile, ConformanceCheckerTest, VisualTest
 from .log import get_logger
-from .utils import from_os_path, to_os_path, rel_path_to_url
+from .sourcefile import SourceFile
+from .utils import from_os_path, to_os_path, rel_path_to_url, replace_file
 
 
 CURRENT_VERSION = 4
@@ -20,20 +23,257 @@ class ManifestVersionMismatch(ManifestError):
     pass
 
 
+item_classes = {"testharness": TestharnessTest,
+                "reftest": RefTest,
+                "reftest_node": RefTestNode,
+                "manual": ManualTest,
+                "stub": Stub,
+                "wdspec": WebdriverSpecTest,
+                "conformancechecker": ConformanceCheckerTest,
+                "visual": VisualTest,
+                "support": SupportFile}
+
+sqlite_magic = b"SQLite format 3\0"
+
+
 def sourcefile_items(args):
-    tests_root, url_base, rel_path, status = args
+    tests_root, url_base, rel_path, contents = args
     source_file = SourceFile(tests_root,
                              rel_path,
-                             url_base)
-    return rel_path, source_file.manifest_items()
+                             url_base,
+                             contents=contents)
+    item_type, manifest_items = source_file.manifest_items()
+    dependencies = None
+    if item_type != "support":
+        dependencies = source_file.dependencies
+    return rel_path, (item_type, manifest_items), dependencies
+
+
+def compute_manifest_items(source_files, jobs):
+    """Compute the manifest items for a list of SourceFile objects using a pool
+    of worker processes.
+
+    :param source_files: List of SourceFile objects to compute items for
+    :param jobs: Number of worker processes to use
+    :returns: List of (item_type, manifest_items, dependencies) tuples in the
+              same order as source_files, where dependencies is None for
+              support files"""
+    args = [(source_file.tests_root, source_file.url_base, source_file.rel_path,
+             source_file.contents) for source_file in source_files]
+    chunksize = max(1, len(args) // (jobs * 4))
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        results = list(pool.imap(sourcefile_items, args, chunksize))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    rv = []
+    for source_file, (rel_path, (item_type, manifest_items), dependencies) in zip(source_files,
+                                                                                 results):
+        assert rel_path == source_file.rel_path
+        # Point the items back at the SourceFile from the tree rather than the
+        # copy that was unpickled from the worker, so that the result is
+        # indistinguishable from computing the items in this process
+        for manifest_item in manifest_items:
+            manifest_item.source_file = source_file
+        source_file.items_cache = (item_type, manifest_items)
+        rv.append((item_type, manifest_items, dependencies))
+    return rv
+
+
+class TypeData(MutableMapping):
+    """Mapping of path to the set of manifest items of a single type.
+
+    Items are stored in their JSON form until the path is first accessed, so
+    that loading a manifest doesn't require constructing an object for every
+    test.
+
+    :param manifest: The Manifest the items belong to
+    :param item_type: The item type of all the items in the mapping
+    :param json_data: Mapping of path to the list of serialized items for that
+                      path. This is never modified.
+    :param data: Dict of path to set of already constructed items"""
+
+    def __init__(self, manifest, item_type, json_data=None, data=None):
+        self.manifest = manifest
+        self.item_type = item_type
+        self._json_data = json_data if json_data is not None else {}
+        self._data = dict(data) if data is not None else {}
+        self._deleted = set()
+
+    def __getitem__(self, path):
+        if path in self._data:
+            return self._data[path]
+        if path in self._deleted:
+            raise KeyError(path)
+        json_tests = self._json_data[path]
+        test_cls = item_classes[self.item_type]
+        tests = set()
+        for test in json_tests:
+            tests.add(test_cls.from_json(self.manifest,
+                                         self.manifest.tests_root,
+                                         path,
+                                         test,
+                                         source_files=self.manifest._source_files))
+        self._data[path] = tests
+        return tests
+
+    def __setitem__(self, path, tests):
+        self._data[path] = tests
+
+    def __delitem__(self, path):
+        found = False
+        if path in self._data:
+            del self._data[path]
+            found = True
+        if path not in self._deleted and path in self._json_data:
+            self._deleted.add(path)
+            found = True
+        if not found:
+            raise KeyError(path)
+
+    def __contains__(self, path):
+        return (path in self._data or
+                (path not in self._deleted and path in self._json_data))
+
+    def __iter__(self):
+        for path in self._data:
+            yield path
+        for path in self._json_data:
+            if path not in self._data and path not in self._deleted:
+                yield path
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_json(self):
+        """Serialize the items, reusing the JSON form of any paths that haven't
+        been accessed"""
+        rv = {}
+        for path in self:
+            if path in self._data:
+                rv[from_os_path(path)] = [t for t in sorted(test.to_json()
+                                                            for test in self._data[path])]
+            else:
+                rv[from_os_path(path)] = self._json_data[path]
+        return rv
+
+
+class ManifestData(dict):
+    """Dict of item type to TypeData, creating an empty TypeData for any
+    missing type on access."""
+
+    def __init__(self, manifest):
+        dict.__init__(self)
+        self.manifest = manifest
+
+    def __missing__(self, item_type):
+        rv = TypeData(self.manifest, item_type)
+        self[item_type] = rv
+        return rv
+
+
+class SqliteMapping(Mapping):
+    """Read-only mapping of path to JSON data stored in a table of a sqlite
+    format manifest.
+
+    :param conn: sqlite3 connection to the manifest database
+    :param table: Name of the table containing (path, data) columns
+    :param item_type: Value of the type column to restrict the mapping to,
+                      or None if the table has no type column"""
+
+    def __init__(self, conn, table, item_type=None):
+        self.conn = conn
+        self.table = table
+        self.item_type = item_type
+
+    def _where(self, path=None):
+        clauses = []
+        params = []
+        if self.item_type is not None:
+            clauses.append("type = ?")
+            params.append(self.item_type)
+        if path is not None:
+            clauses.append("path = ?")
+            params.append(from_os_path(path))
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def __getitem__(self, path):
+        where, params = self._where(path)
+        row = self.conn.execute("SELECT data FROM %s%s" % (self.table, where), params).fetchone()
+        if row is None:
+            raise KeyError(path)
+        return json.loads(row[0])
+
+    def __contains__(self, path):
+        where, params = self._where(path)
+        return self.conn.execute("SELECT 1 FROM %s%s" % (self.table, where),
+                                 params).fetchone() is not None
+
+    def __iter__(self):
+        where, params = self._where()
+        for row in self.conn.execute("SELECT path FROM %s%s ORDER BY path" % (self.table, where),
+                                     params):
+            yield to_os_path(row[0])
+
+    def __len__(self):
+        where, params = self._where()
+        return self.conn.execute("SELECT COUNT(*) FROM %s%s" % (self.table, where),
+                                 params).fetchone()[0]
+
+    def to_dict(self):
+        """Read the whole mapping into a dict"""
+        where, params = self._where()
+        return {to_os_path(path): json.loads(data) for path, data in
+                self.conn.execute("SELECT path, data FROM %s%s" % (self.table, where), params)}
+
+
+class PathIndex(object):
+    """Index of the paths in a manifest, mapping each path to the item types
+    it has items for and allowing the paths under a directory to be found
+    without scanning every path.
+
+    :param data: Dict of item type to mapping of path to items"""
+
+    def __init__(self, data):
+        self.types = defaultdict(list)
+        for item_type, type_paths in iteritems(data):
+            for path in type_paths:
+                self.types[path].append(item_type)
+        self.paths = sorted(self.types.keys())
+
+    def path_types(self, path):
+        """List of item types that have items for path"""
+        return self.types.get(path, [])
+
+    def iterdir(self, dir_name):
+        """Iterator over the paths starting with dir_name, in sorted order"""
+        i = bisect_left(self.paths, dir_name)
+        while i < len(self.paths) and self.paths[i].startswith(dir_name):
+            yield self.paths[i]
+            i += 1
 
 
 class Manifest(object):
     def __init__(self, url_base="/"):
         assert url_base is not None
         self._path_hash = {}
-        self._data = defaultdict(dict)
+        self._data = ManifestData(self)
+        self._path_index = None
+        self._dependencies = {}
+        self._dependents = None
         self._reftest_nodes_by_url = None
+        self._source_files = {}
+        # Connection to the sqlite database the data is being read from, if any
+        self._sqlite_conn = None
+        self.tests_root = None
         self.url_base = url_base
 
     def __iter__(self):
@@ -43,22 +283,31 @@ class Manifest(object):
         if not types:
             types = sorted(self._data.keys())
         for item_type in types:
-            for path, tests in sorted(iteritems(self._data[item_type])):
-                yield item_type, path, tests
+            type_tests = self._data[item_type]
+            for path in sorted(type_tests):
+                yield item_type, path, type_tests[path]
+
+    @property
+    def path_index(self):
+        """PathIndex for the current contents of the manifest. This is built on
+        first use and discarded when the manifest is updated."""
+        if self._path_index is None:
+            self._path_index = PathIndex(self._data)
+        return self._path_index
 
     def iterpath(self, path):
-        for type_tests in self._data.values():
-            for test in type_tests.get(path, set()):
+        for item_type in self.path_index.path_types(path):
+            for test in self._data[item_type][path]:
                 yield test
 
     def iterdir(self, dir_name):
         if not dir_name.endswith(os.path.sep):
             dir_name = dir_name + os.path.sep
-        for type_tests in self._data.values():
-            for path, tests in type_tests.iteritems():
-                if path.startswith(dir_name):
-                    for test in tests:
-                        yield test
+        path_index = self.path_index
+        for path in path_index.iterdir(dir_name):
+            for item_type in path_index.path_types(path):
+                for test in self._data[item_type][path]:
+                    yield test
 
     @property
     def reftest_nodes_by_url(self):
@@ -73,64 +322,133 @@ class Manifest(object):
     def get_reference(self, url):
         return self.reftest_nodes_by_url.get(url)
 
-    def update(self, tree):
-        new_data = defaultdict(dict)
+    def path_hash(self, rel_path):
+        """Hash of the contents of the file at rel_path as of the last update
+        of the manifest, or None if the file isn't in the manifest"""
+        if rel_path not in self._path_hash:
+            return None
+        return self._path_hash[rel_path][0]
+
+    def has_dependencies(self, rel_path):
+        """Whether the dependencies of the test at rel_path are recorded in
+        the manifest. They are missing for tests in manifests written before
+        dependencies were recorded."""
+        return rel_path in self._dependencies
+
+    def dependents(self, url_path):
+        """Set of the paths of the tests that refer to url_path, a /-separated
+        path starting with /. This is built on first use and discarded when
+        the manifest is updated."""
+        if self._dependents is None:
+            dependents = defaultdict(set)
+            for rel_path, dependencies in iteritems(self._dependencies):
+                for dependency in dependencies:
+                    dependents[dependency].add(rel_path)
+            self._dependents = dependents
+        return self._dependents.get(url_path, set())
+
+    def update(self, tree, jobs=1):
+        """Update the manifest from an iterable of SourceFile objects.
+
+        :param tree: Iterable of SourceFile objects representing the current
+                     state of the tree
+        :param jobs: Number of processes to use when computing the manifest
+                     items of new or changed files
+        :returns: Boolean indicating whether the manifest changed"""
         new_hashes = {}
+        new_dependencies = {}
 
-        reftest_nodes = []
-        old_files = defaultdict(set, {k: set(viewkeys(v)) for k, v in iteritems(self._data)})
+        old_files = defaultdict(set, {k: set(v) for k, v in iteritems(self._data)})
 
         changed = False
         reftest_changes = False
 
+        # Files that need their manifest items computing by the process pool
+        to_update = []
+        # Unchanged tests that have no recorded dependencies
+        missing_dependencies = []
+
         for source_file in tree:
             rel_path = source_file.rel_path
             file_hash = source_file.hash
 
-            is_new = rel_path not in self._path_hash
-            hash_changed = False
-
-            if not is_new:
+            if rel_path in self._path_hash:
                 old_hash, old_type = self._path_hash[rel_path]
                 old_files[old_type].remove(rel_path)
-                if old_hash != file_hash:
-                    new_type, manifest_items = source_file.manifest_items()
-                    hash_changed = True
-                else:
-                    new_type, manifest_items = old_type, self._data[old_type][rel_path]
-            else:
-                new_type, manifest_items = source_file.manifest_items()
+                if old_hash == file_hash:
+                    # Unchanged files are left in place, so items that were
+                    # never accessed are never constructed
+                    new_hashes[rel_path] = (file_hash, old_type)
+                    if rel_path in self._dependencies:
+                        new_dependencies[rel_path] = self._dependencies[rel_path]
+                    elif old_type != "support":
+                        missing_dependencies.append(source_file)
+                    continue
+                del self._data[old_type][rel_path]
+                if old_type in ("reftest", "reftest_node"):
+                    reftest_changes = True
 
-            if new_type in ("reftest", "reftest_node"):
-                reftest_nodes.extend(manifest_items)
-                if is_new or hash_changed:
+            changed = True
+            if jobs > 1:
+                to_update.append(source_file)
+                continue
+            new_type, manifest_items = source_file.manifest_items()
+            if new_type != "support":
+                new_dependencies[rel_path] = sorted(source_file.dependencies)
+            if self._add_items(rel_path, file_hash, new_type, manifest_items, new_hashes):
+                reftest_changes = True
+
+        if to_update:
+            results = compute_manifest_items(to_update, jobs)
+            for source_file, (new_type, manifest_items, dependencies) in zip(to_update, results):
+                if dependencies is not None:
+                    new_dependencies[source_file.rel_path] = sorted(dependencies)
+                if self._add_items(source_file.rel_path, source_file.hash, new_type,
+                                   manifest_items, new_hashes):
                     reftest_changes = True
-            elif new_type:
-                new_data[new_type][rel_path] = set(manifest_items)
 
-            new_hashes[rel_path] = (file_hash, new_type)
+        for source_file in missing_dependencies:
+            new_dependencies[source_file.rel_path] = sorted(source_file.dependencies)
+            changed = True
 
-            if is_new or hash_changed:
+        for old_type, paths in iteritems(old_files):
+            for rel_path in paths:
+                del self._data[old_type][rel_path]
                 changed = True
+                if old_type in ("reftest", "reftest_node"):
+                    reftest_changes = True
 
-        if reftest_changes or old_files["reftest"] or old_files["reftest_node"]:
-            reftests, reftest_nodes, changed_hashes = self._compute_reftests(reftest_nodes)
-            new_data["reftest"] = reftests
-            new_data["reftest_node"] = reftest_nodes
+        if reftest_changes:
+            reftest_nodes = []
+            for item_type in ("reftest", "reftest_node"):
+                for tests in itervalues(self._data[item_type]):
+                    reftest_nodes.extend(tests)
+            reftests, reftest_nodes, changed_hashes = self._compute_reftests(reftest_nodes,
+                                                                             new_hashes)
+            self._data["reftest"] = TypeData(self, "reftest", data=reftests)
+            self._data["reftest_node"] = TypeData(self, "reftest_node", data=reftest_nodes)
             new_hashes.update(changed_hashes)
         else:
-            new_data["reftest"] = self._data["reftest"]
-            new_data["reftest_node"] = self._data["reftest_node"]
+            # Make sure that both reftest types always appear in the output
+            self._data["reftest"]
+            self._data["reftest_node"]
 
-        if any(itervalues(old_files)):
-            changed = True
-
-        self._data = new_data
         self._path_hash = new_hashes
+        self._path_index = None
+        self._dependencies = new_dependencies
+        self._dependents = None
 
         return changed
 
-    def _compute_reftests(self, reftest_nodes):
+    def _add_items(self, rel_path, file_hash, new_type, manifest_items, new_hashes):
+        """Add the manifest items for a new or changed file, returning a
+        boolean indicating whether the reftests need to be recomputed."""
+        if new_type:
+            self._data[new_type][rel_path] = set(manifest_items)
+        new_hashes[rel_path] = (file_hash, new_type)
+        return new_type in ("reftest", "reftest_node")
+
+    def _compute_reftests(self, reftest_nodes, hashes):
         self._reftest_nodes_by_url = {}
         has_inbound = set()
         for item in reftest_nodes:
@@ -146,31 +464,44 @@ class Manifest(object):
                 # This is a reference
                 if isinstance(item, RefTest):
                     item = item.to_RefTestNode()
-                    changed_hashes[item.source_file.rel_path] = (item.source_file.hash,
-                                                                 item.item_type)
+                    rel_path = item.source_file.rel_path
+                    changed_hashes[rel_path] = (hashes[rel_path][0], item.item_type)
                 references[item.source_file.rel_path].add(item)
                 self._reftest_nodes_by_url[item.url] = item
             else:
                 if isinstance(item, RefTestNode):
                     item = item.to_RefTest()
-                    changed_hashes[item.source_file.rel_path] = (item.source_file.hash,
-                                                                 item.item_type)
+                    rel_path = item.source_file.rel_path
+                    changed_hashes[rel_path] = (hashes[rel_path][0], item.item_type)
                 reftests[item.source_file.rel_path].add(item)
 
         return reftests, references, changed_hashes
 
+    def close_sqlite(self):
+        """Read any data that is still only in the sqlite database the manifest
+        was loaded from into memory, and close the database, so that the file
+        can be replaced."""
+        if self._sqlite_conn is None:
+            return
+        if isinstance(self._path_hash, SqliteMapping):
+            self._path_hash = self._path_hash.to_dict()
+        if isinstance(self._dependencies, SqliteMapping):
+            self._dependencies = self._dependencies.to_dict()
+        for type_data in itervalues(self._data):
+            if isinstance(type_data._json_data, SqliteMapping):
+                type_data._json_data = type_data._json_data.to_dict()
+        self._sqlite_conn.close()
+        self._sqlite_conn = None
+
     def to_json(self):
         out_items = {
-            test_type: {
-                from_os_path(path):
-                [t for t in sorted(test.to_json() for test in tests)]
-                for path, tests in iteritems(type_paths)
-            }
+            test_type: type_paths.to_json()
             for test_type, type_paths in iteritems(self._data)
         }
         rv = {"url_base": self.url_base,
               "paths": {from_os_path(k): v for k, v in iteritems(self._path_hash)},
               "items": out_items,
+              "dependencies": {from_os_path(k): v for k, v in iteritems(self._dependencies)},
               "version": CURRENT_VERSION}
         return rv
 
@@ -184,39 +515,62 @@ class Manifest(object):
         if not hasattr(obj, "items") and hasattr(obj, "paths"):
             raise ManifestError
 
+        self.tests_root = tests_root
         self._path_hash = {to_os_path(k): v for k, v in iteritems(obj["paths"])}
+        self._dependencies = {to_os_path(k): v
+                              for k, v in iteritems(obj.get("dependencies", {}))}
 
-        item_classes = {"testharness": TestharnessTest,
-                        "reftest": RefTest,
-                        "reftest_node": RefTestNode,
-                        "manual": ManualTest,
-                        "stub": Stub,
-                        "wdspec": WebdriverSpecTest,
-                        "conformancechecker": ConformanceCheckerTest,
-                        "visual": VisualTest,
-                        "support": SupportFile}
+        for test_type, type_paths in iteritems(obj["items"]):
+            if test_type not in item_classes:
+                raise ManifestError
+            json_data = {to_os_path(path): tests for path, tests in iteritems(type_paths)}
+            self._data[test_type] = TypeData(self, test_type, json_data=json_data)
+
+        return self
+
+    @classmethod
+    def from_sqlite(cls, tests_root, path):
+        """Load a manifest stored in the sqlite format written by write_sqlite.
 
-        source_files = {}
+        Only the metadata is read up front; paths and items are read from the
+        database as they are accessed."""
+        import sqlite3
 
-        for test_type, type_paths in iteritems(obj["items"]):
+        conn = sqlite3.connect(path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError:
+            raise ManifestError
+
+        if meta.get("version") != str(CURRENT_VERSION):
+            raise ManifestVersionMismatch
+
+        self = cls(url_base=meta.get("url_base", "/"))
+        self.tests_root = tests_root
+        self._sqlite_conn = conn
+        self._path_hash = SqliteMapping(conn, "paths")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND "
+                        "name = 'dependencies'").fetchone() is not None:
+            self._dependencies = SqliteMapping(conn, "dependencies")
+
+        for test_type in json.loads(meta["types"]):
             if test_type not in item_classes:
                 raise ManifestError
-            test_cls = item_classes[test_type]
-            tests = defaultdict(set)
-            for path, manifest_tests in iteritems(type_paths):
-                path = to_os_path(path)
-                for test in manifest_tests:
-                    manifest_item = test_cls.from_json(self,
-                                                       tests_root,
-                                                       path,
-                                                       test,
-                                                       source_files=source_files)
-                    tests[path].add(manifest_item)
-            self._data[test_type] = tests
+            self._data[test_type] = TypeData(self, test_type,
+                                             json_data=SqliteMapping(conn, "items", test_type))
 
         return self
 
 
+def is_sqlite(path):
+    """Check whether the file at path is a sqlite format manifest"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(sqlite_magic)) == sqlite_magic
+    except IOError:
+        return False
+
+
 def load(tests_root, manifest):
     logger = get_logger()
 
@@ -226,6 +580,8 @@ def load(tests_root, manifest):
             logger.debug("Opening manifest at %s" % manifest)
         else:
             logger.debug("Creating new manifest at %s" % manifest)
+        if is_sqlite(manifest):
+            return Manifest.from_sqlite(tests_root, manifest)
         try:
             with open(manifest) as f:
                 rv = Manifest.from_json(tests_root, json.load(f))
@@ -236,10 +592,73 @@ def load(tests_root, manifest):
     return Manifest.from_json(tests_root, json.load(manifest))
 
 
-def write(manifest, manifest_path):
+def write(manifest, manifest_path, format=None):
+    """Write a manifest to disk.
+
+    :param manifest: The Manifest to write
+    :param manifest_path: Path to write the manifest to
+    :param format: Either "json" or "sqlite", or None to use the format of any
+                   existing manifest at manifest_path, defaulting to JSON."""
+    if format is None:
+        format = "sqlite" if is_sqlite(manifest_path) else "json"
+    # The manifest may be reading its data from the file being overwritten
+    manifest.close_sqlite()
+    if format == "sqlite":
+        return write_sqlite(manifest, manifest_path)
+    assert format == "json"
     dir_name = os.path.dirname(manifest_path)
     if not os.path.exists(dir_name):
         os.makedirs(dir_name)
+    data = manifest.to_json()
     with open(manifest_path, "wb") as f:
-        json.dump(manifest.to_json(), f, sort_keys=True, indent=1, separators=(',', ': '))
+        json.dump(data, f, sort_keys=True, indent=1, separators=(',', ': '))
         f.write("\n")
+
+
+def write_sqlite(manifest, manifest_path):
+    """Write a manifest in the sqlite format, which allows paths and items to be
+    loaded individually rather than parsing the whole file.
+
+    The manifest is written to a temporary file which is then moved into
+    place, so other processes never see a partly written manifest. The
+    database of a manifest loaded from sqlite is closed first, so it's safe to
+    overwrite the manifest that the data is being read from."""
+    import sqlite3
+
+    dir_name = os.path.dirname(manifest_path)
+    if not os.path.exists(dir_name):
+        os.makedirs(dir_name)
+
+    manifest.close_sqlite()
+    data = manifest.to_json()
+
+    tmp_path = manifest_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE paths (path TEXT PRIMARY KEY, data TEXT)")
+            conn.execute("CREATE TABLE items (type TEXT, path TEXT, data TEXT, "
+                         "PRIMARY KEY (type, path))")
+            conn.execute("CREATE TABLE dependencies (path TEXT PRIMARY KEY, data TEXT)")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                             [("version", str(data["version"])),
+                              ("url_base", data["url_base"]),
+                              ("types", json.dumps(sorted(data["items"].keys())))])
+            conn.executemany("INSERT INTO paths VALUES (?, ?)",
+                             ((path, json.dumps(value))
+                              for path, value in sorted(iteritems(data["paths"]))))
+            conn.executemany("INSERT INTO items VALUES (?, ?, ?)",
+                             ((test_type, path, json.dumps(tests))
+                              for test_type, type_paths in sorted(iteritems(data["items"]))
+                              for path, tests in sorted(iteritems(type_paths))))
+            conn.executemany("INSERT INTO dependencies VALUES (?, ?)",
+                             ((path, json.dumps(value))
+                              for path, value in sorted(iteritems(data["dependencies"]))))
+    finally:
+        conn.close()
+
+    replace_file(tmp_path, manifest_path)
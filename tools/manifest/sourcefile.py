@@ -1,8 +1,9 @@
 import hashlib
+import posixpath
 import re
 import os
 from six import binary_type
-from six.moves.urllib.parse import urljoin
+from six.moves.urllib.parse import urljoin, urlsplit
 from fnmatch import fnmatch
 try:
     from xml.etree import cElementTree as ElementTree
@@ -23,6 +24,16 @@ reference_file_re = re.compile(r'(^|[\-_])(not)?ref[0-9]*([\-_]|$)')
 
 space_chars = u"".join(html5lib.constants.spaceCharacters)
 
+# Patterns for the places a test refers to another file: quoted strings
+# (attribute values, script and import specifiers), unquoted attribute
+# values, CSS url() values and META: lines in script tests
+dependency_res = [re.compile(r"""["']([^"'\s<>]+)["']"""),
+                  re.compile(r"""\b(?:src|href|data)\s*=\s*([^"'\s<>]+)"""),
+                  re.compile(r"""\burl\(\s*([^"'\s()]+)\s*\)"""),
+                  re.compile(r"""META:\s*\w+=\s*(\S+)""")]
+# Hosts in URLs that refer to the test server
+local_host_re = re.compile(r"{{|web-platform\.test|w3c-test\.org|localhost|127\.0\.0\.1")
+
 def replace_end(s, old, new):
     """
     Given a string `s` that ends with `old`, replace that occurrence of `old`
@@ -32,6 +43,15 @@ def replace_end(s, old, new):
     return s[:-len(old)] + new
 
 
+def blob_hash(content):
+    """
+    Git blob object id of the bytestring `content`, as reported by
+    ``git hash-object``.
+    """
+    data = b"".join((b"blob ", str(len(content)).encode("ascii"), b"\0", content))
+    return hashlib.sha1(data).hexdigest()
+
+
 def read_script_metadata(f, regexp):
     """
     Yields any metadata (pairs of bytestrings) from the file-like object `f`,
@@ -64,12 +84,14 @@ class SourceFile(object):
                          ("css", "CSS2", "archive"),
                          ("css", "common")}
 
-    def __init__(self, tests_root, rel_path, url_base, contents=None):
+    def __init__(self, tests_root, rel_path, url_base, hash=None, contents=None):
         """Object representing a file in a source tree.
 
         :param tests_root: Path to the root of the source tree
         :param rel_path: File path relative to tests_root
         :param url_base: Base URL used when converting file paths to urls
+        :param hash: Git blob object id of the file contents, if already known,
+                     or ``None``.
         :param contents: Byte array of the contents of the file or ``None``.
         """
 
@@ -84,6 +106,7 @@ class SourceFile(object):
             self.rel_path = rel_path
         self.url_base = url_base
         self.contents = contents
+        self._hash = hash
 
         self.dir_path, self.filename = os.path.split(self.rel_path)
         self.name, self.ext = os.path.splitext(self.filename)
@@ -142,10 +165,16 @@ class SourceFile(object):
     def url(self):
         return rel_path_to_url(self.rel_path, self.url_base)
 
-    @cached_property
+    @property
     def hash(self):
-        with self.open() as f:
-            return hashlib.sha1(f.read()).hexdigest()
+        """Git blob object id of the file contents. This is the same value as
+        reported by ``git hash-object`` so that it can be taken directly from
+        the git index rather than by reading the file."""
+        if not self._hash:
+            with self.open() as f:
+                self._hash = blob_hash(f.read())
+
+        return self._hash
 
     def in_non_test_dir(self):
         if self.dir_path == "":
@@ -468,6 +497,49 @@ class SourceFile(object):
                 rv.add(item.attrib["href"].strip(space_chars))
         return rv
 
+    @cached_property
+    def dependencies(self):
+        """Set of the repository paths of the files the file refers to, as
+        /-separated paths starting with /, found by looking for URL-like
+        strings in the contents. References that can only be resolved at
+        runtime aren't included."""
+        with self.open() as f:
+            data = f.read()
+        if data.startswith(b"\xfe\xff"):
+            data = data.decode("utf-16be", "replace")
+        elif data.startswith(b"\xff\xfe"):
+            data = data.decode("utf-16le", "replace")
+        else:
+            data = data.decode("utf8", "replace")
+
+        base = "/" + self.rel_path.replace(os.path.sep, "/")
+        rv = set()
+        for regexp in dependency_res:
+            for value in regexp.findall(data):
+                if "/" not in value and "." not in value:
+                    continue
+                try:
+                    parts = urlsplit(value)
+                except ValueError:
+                    continue
+                if parts.scheme and not parts.netloc:
+                    # e.g. data: or javascript: URLs
+                    continue
+                if parts.netloc and not local_host_re.search(parts.netloc):
+                    # URLs on other sites, e.g. links to specs
+                    continue
+                path = parts.path
+                if not path or path.endswith("/"):
+                    continue
+                if not path.startswith("/"):
+                    path = posixpath.join(posixpath.dirname(base), path)
+                path = posixpath.normpath(path)
+                if path.startswith("//") or path.startswith("/.."):
+                    continue
+                rv.add(path)
+        rv.discard(base)
+        return rv
+
     @cached_property
     def content_is_css_visual(self):
         """Boolean indicating whether the file content represents a
@@ -1,5 +1,7 @@
+import json
 import platform
 import os
+import sys
 
 import mock
 
@@ -12,13 +14,13 @@ from .. import manifest, item, sourcefile, utils
 
 
 def SourceFileWithTest(path, hash, cls, *args):
-    s = mock.Mock(rel_path=path, hash=hash)
+    s = mock.Mock(rel_path=path, hash=hash, dependencies=set())
     test = cls(s, utils.rel_path_to_url(path), *args)
     s.manifest_items = mock.Mock(return_value=(cls.item_type, [test]))
     return s
 
 def SourceFileWithTests(path, hash, cls, variants):
-    s = mock.Mock(rel_path=path, hash=hash)
+    s = mock.Mock(rel_path=path, hash=hash, dependencies=set())
     tests = [cls(s, item[0], *item[1:]) for item in variants]
     s.manifest_items = mock.Mock(return_value=(cls.item_type, tests))
     return s
@@ -50,7 +52,7 @@ def sourcefile_strategy(draw):
 
     path = draw(rel_dir_file_path())
     hash = draw(hs.text(alphabet="0123456789abcdef", min_size=40, max_size=40))
-    s = mock.Mock(rel_path=path, hash=hash)
+    s = mock.Mock(rel_path=path, hash=hash, dependencies=set())
 
     if cls in (item.RefTest, item.RefTestNode):
         ref_path = draw(rel_dir_file_path())
@@ -111,6 +113,9 @@ def test_manifest_to_json_forwardslash():
         'paths': {
             'a/b': ('0000000000000000000000000000000000000000', 'testharness')
         },
+        'dependencies': {
+            'a/b': []
+        },
         'version': 4,
         'url_base': '/',
         'items': {
@@ -135,6 +140,9 @@ def test_manifest_to_json_backslash():
             'paths': {
                 'a/b': ('0000000000000000000000000000000000000000', 'testharness')
             },
+            'dependencies': {
+                'a/b': []
+            },
             'version': 4,
             'url_base': '/',
             'items': {
@@ -246,3 +254,198 @@ def test_iterpath():
                                                                  "/test2-1.html",
                                                                  "/test2-2.html"])
     assert set(m.iterpath("missing")) == set()
+
+
+def test_iterdir():
+    m = manifest.Manifest()
+
+    sources = [SourceFileWithTest(os.path.join("a", "test1"), "0"*40, item.TestharnessTest),
+               SourceFileWithTest(os.path.join("a", "b", "test2"), "0"*40, item.RefTest,
+                                  [("/a/b/test2-ref", "==")]),
+               SourceFileWithTest(os.path.join("a-b", "test3"), "0"*40, item.TestharnessTest),
+               SourceFileWithTest(os.path.join("ab", "test4"), "0"*40, item.TestharnessTest),
+               SourceFileWithTest("test5", "0"*40, item.TestharnessTest)]
+    m.update(sources)
+
+    assert set(item.url for item in m.iterdir("a")) == {"/a/test1", "/a/b/test2"}
+    assert set(item.url for item in m.iterdir(os.path.join("a", "b"))) == {"/a/b/test2"}
+    assert set(item.url for item in m.iterdir("a-b")) == {"/a-b/test3"}
+    assert set(m.iterdir("test5")) == set()
+    assert set(m.iterdir("missing")) == set()
+
+    # The index is rebuilt after an update
+    m.update(sources[1:])
+    assert set(item.url for item in m.iterdir("a")) == {"/a/b/test2"}
+    assert set(item.url for item in m.iterpath(os.path.join("a", "test1"))) == set()
+
+
+def test_path_hash():
+    m = manifest.Manifest()
+
+    sources = [SourceFileWithTest("test1", "1"*40, item.TestharnessTest),
+               SourceFileWithTest("test2", "2"*40, item.RefTest, [("/test2-ref", "==")])]
+    m.update(sources)
+
+    assert m.path_hash("test1") == "1"*40
+    assert m.path_hash("test2") == "2"*40
+    assert m.path_hash("missing") is None
+
+    loaded = manifest.Manifest.from_json("/", m.to_json())
+    assert loaded.path_hash("test2") == "2"*40
+
+
+def test_update_parallel(tmpdir):
+    files = {
+        "test.html": b"<script src=/resources/testharness.js></script>",
+        "variants.html": (b"<meta name=variant content='?a'><meta name=variant content='?b'>"
+                          b"<script src=/resources/testharness.js></script>"),
+        "test.any.js": b"// META: timeout=long\n",
+        "ref.html": b"<link rel=match href=ref-ref.html>",
+        "ref-ref.html": b"<link rel=match href=ref-ref-ref.html>",
+        "ref-ref-ref.html": b"",
+        "support/helper.js": b"",
+    }
+    for rel_path, contents in files.items():
+        tmpdir.join(rel_path).write_binary(contents, ensure=True)
+    root = str(tmpdir)
+    rel_paths = sorted(os.path.join(*path.split("/")) for path in files)
+
+    def tree():
+        return [sourcefile.SourceFile(root, rel_path, "/") for rel_path in rel_paths]
+
+    m_serial = manifest.Manifest()
+    assert m_serial.update(tree()) is True
+
+    m_parallel = manifest.Manifest()
+    assert m_parallel.update(tree(), jobs=2) is True
+    assert m_parallel.to_json() == m_serial.to_json()
+
+    assert m_parallel.update(tree(), jobs=2) is False
+
+    tmpdir.join("test.html").write_binary(b"")
+    assert m_parallel.update(tree(), jobs=2) is True
+    assert m_serial.update(tree()) is True
+    assert m_parallel.to_json() == m_serial.to_json()
+
+
+def test_dependencies(tmpdir):
+    files = {
+        "a/test.html": b"<script src=/resources/testharness.js></script>"
+                       b"<script src=support/helper.js></script>",
+        "a/test.any.js": b"// META: script=/common/utils.js\n",
+        "a/support/helper.js": b"importScripts('/common/utils.js')",
+    }
+    for rel_path, contents in files.items():
+        tmpdir.join(rel_path).write_binary(contents, ensure=True)
+    root = str(tmpdir)
+    rel_paths = sorted(os.path.join(*path.split("/")) for path in files)
+    test_path = os.path.join("a", "test.html")
+    any_path = os.path.join("a", "test.any.js")
+
+    def tree():
+        return [sourcefile.SourceFile(root, rel_path, "/") for rel_path in rel_paths]
+
+    m = manifest.Manifest()
+    m.update(tree())
+    assert m.dependents("/a/support/helper.js") == {test_path}
+    assert m.dependents("/common/utils.js") == {any_path}
+    assert m.dependents("/missing.js") == set()
+    # Support files don't have their dependencies recorded
+    assert not m.has_dependencies(os.path.join("a", "support", "helper.js"))
+
+    tmpdir.join("a", "test.html").write_binary(b"<script src=/resources/testharness.js></script>"
+                                               b"<script src=/common/utils.js></script>")
+    m.update(tree())
+    assert m.dependents("/a/support/helper.js") == set()
+    assert m.dependents("/common/utils.js") == {test_path, any_path}
+
+    # Manifests without dependencies get them on the next update
+    data = m.to_json()
+    del data["dependencies"]
+    loaded = manifest.Manifest.from_json(root, data)
+    assert not loaded.has_dependencies(test_path)
+    assert loaded.update(tree()) is True
+    assert loaded.has_dependencies(test_path)
+    assert loaded.to_json() == m.to_json()
+
+
+def test_from_json_lazy():
+    m = manifest.Manifest()
+
+    sources = [SourceFileWithTest("test1", "0"*40, item.TestharnessTest),
+               SourceFileWithTest("test2", "0"*40, item.TestharnessTest)]
+    m.update(sources)
+
+    loaded = manifest.Manifest.from_json("/", m.to_json())
+    testharness = loaded._data["testharness"]
+    assert testharness._data == {}
+
+    assert set(item.url for item in loaded.iterpath("test1")) == {"/test1"}
+    assert list(testharness._data.keys()) == ["test1"]
+
+    # Unchanged files aren't constructed during update
+    assert loaded.update(sources) is False
+    assert list(testharness._data.keys()) == ["test1"]
+    assert loaded.to_json() == m.to_json()
+
+
+def test_sqlite_roundtrip(tmpdir):
+    m = manifest.Manifest()
+
+    sources = [SourceFileWithTest("a/test1", "0"*40, item.RefTest, [("/a/test1-ref", "==")]),
+               SourceFileWithTests("a/test2", "1"*40, item.TestharnessTest, [("/a/test2-1.html",),
+                                                                             ("/a/test2-2.html",)]),
+               SourceFileWithTest("b/test3", "2"*40, item.TestharnessTest)]
+    m.update(sources)
+
+    path = str(tmpdir.join("MANIFEST.json"))
+    manifest.write(m, path, format="sqlite")
+    assert manifest.is_sqlite(path)
+
+    loaded = manifest.load("/", path)
+    assert loaded.to_json() == json.loads(json.dumps(m.to_json()))
+    assert list(loaded) == list(m)
+    assert set(item.url for item in loaded.iterpath("a/test2")) == {"/a/test2-1.html",
+                                                                    "/a/test2-2.html"}
+    assert set(item.url for item in loaded.iterdir("b")) == {"/b/test3"}
+
+    # Writing without a format keeps the existing format
+    assert loaded.update(sources[1:]) is True
+    manifest.write(loaded, path)
+    assert manifest.is_sqlite(path)
+    reloaded = manifest.load("/", path)
+    assert list(reloaded) == list(loaded)
+
+    manifest.write(reloaded, path, format="json")
+    assert not manifest.is_sqlite(path)
+    assert list(manifest.load("/", path)) == list(loaded)
+
+
+def test_sqlite_overwrite_loaded(tmpdir):
+    m = manifest.Manifest()
+    sources = [SourceFileWithTest("a/test1", "0"*40, item.TestharnessTest),
+               SourceFileWithTest("b/test2", "1"*40, item.TestharnessTest)]
+    m.update(sources)
+    path = str(tmpdir.join("MANIFEST.json"))
+    manifest.write(m, path, format="sqlite")
+    expected = json.loads(json.dumps(m.to_json()))
+
+    loaded = manifest.load("/", path)
+    assert loaded._sqlite_conn is not None
+    with mock.patch("os.remove", wraps=os.remove) as remove:
+        manifest.write(loaded, path)
+    # The new manifest is renamed over the old one, without removing it first
+    assert not remove.called
+    # The manifest that was loaded no longer reads from the replaced file
+    assert loaded._sqlite_conn is None
+    assert loaded.to_json() == expected
+    assert set(item.url for item in loaded.iterpath("b/test2")) == {"/b/test2"}
+    assert manifest.load("/", path).to_json() == expected
+
+    # On Windows the old file has to be removed before the rename
+    loaded = manifest.load("/", path)
+    with mock.patch.object(sys, "platform", "win32"):
+        with mock.patch("os.remove", wraps=os.remove) as remove:
+            manifest.write(loaded, path)
+    assert remove.called
+    assert manifest.load("/", path).to_json() == expected
@@ -579,3 +579,47 @@ def test_spec_links_whitespace(url):
     content = b"<link rel=help href='%s'>" % url
     s = create("foo/test.html", content)
     assert s.spec_links == {"http://example.com/"}
+
+
+@pytest.mark.parametrize("contents,expected", [
+    (b"", "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"),
+    (b"test\n", "9daeafb9864cf43055ae93beb0afd6c7d144bfa4"),
+])
+def test_hash(contents, expected):
+    s = create("test.html", contents)
+    assert s.hash == expected
+
+
+def test_hash_provided():
+    s = SourceFile("/", "test.html", "/", hash="0" * 40, contents=b"")
+    assert s.hash == "0" * 40
+
+
+def test_dependencies():
+    s = create("a/b/test.html", b"""<script src="/resources/testharness.js"></script>
+<script src=../support/helper.js?pipe=sub></script>
+<link rel=stylesheet href='style.css'>
+<style>div { background: url(img/bg.png) }</style>
+<iframe src="data:text/html,x"></iframe>
+<script>
+import("./module.js");
+fetch("http://{{host}}:{{ports[http][0]}}/common/get-host-info.sub.js");
+var text = "not a path";
+</script>""")
+    assert s.dependencies == {"/resources/testharness.js",
+                              "/a/support/helper.js",
+                              "/a/b/style.css",
+                              "/a/b/img/bg.png",
+                              "/a/b/module.js",
+                              "/common/get-host-info.sub.js"}
+
+
+def test_dependencies_script_metadata():
+    s = create("a/test.any.js", b"""// META: global=window,worker
+// META: script=/common/utils.js
+// META: script=support/helper.js
+importScripts("../resources/other.js");
+""")
+    assert s.dependencies == {"/common/utils.js",
+                              "/a/support/helper.js",
+                              "/resources/other.js"}
@@ -0,0 +1,113 @@
+import os
+import subprocess
+
+import mock
+import pytest
+
+from .. import vcs
+from ..sourcefile import SourceFile
+
+
+def git(root, *args):
+    return subprocess.check_output(["git"] + list(args), cwd=root)
+
+
+@pytest.fixture
+def repo(tmpdir):
+    root = str(tmpdir)
+    git(root, "init", "-q")
+    git(root, "config", "user.email", "test@example.org")
+    git(root, "config", "user.name", "Test")
+    tmpdir.join("a.html").write_binary(b"<title>a</title>")
+    tmpdir.join("b", "c.js").write_binary(b"var c;", ensure=True)
+    git(root, "add", ".")
+    git(root, "commit", "-q", "-m", "Initial commit")
+    return tmpdir
+
+
+def test_git_hashes(repo):
+    root = str(repo)
+    tree = vcs.Git(root, "/")
+    files = {source_file.rel_path: source_file for source_file in tree}
+    assert sorted(files.keys()) == ["a.html", os.path.join("b", "c.js")]
+
+    for rel_path, source_file in files.items():
+        # The hash is taken from git without reading the file
+        assert "path" not in source_file.__dict__
+        assert source_file.hash == SourceFile(root, rel_path, "/").hash
+
+
+def test_git_local_changes(repo):
+    root = str(repo)
+    repo.join("a.html").write_binary(b"<title>changed</title>")
+    repo.join("b", "c.js").remove()
+
+    files = {source_file.rel_path: source_file for source_file in vcs.Git(root, "/")}
+
+    assert list(files.keys()) == ["a.html"]
+    assert files["a.html"].hash == SourceFile(root, "a.html", "/").hash
+
+
+def test_git_untracked_and_renamed(repo):
+    root = str(repo)
+    repo.join("a.html").write_binary(b"<title>changed</title>")
+    # Untracked directories are reported by git status as "newdir/"
+    repo.join("newdir", "d.html").write_binary(b"<title>d</title>", ensure=True)
+    repo.join("e.html").write_binary(b"<title>e</title>")
+    git(root, "mv", os.path.join("b", "c.js"), os.path.join("b", "renamed.js"))
+
+    files = {source_file.rel_path: source_file for source_file in vcs.Git(root, "/")}
+
+    assert list(files.keys()) == ["a.html"]
+    assert files["a.html"].hash == SourceFile(root, "a.html", "/").hash
+
+
+def test_filesystem_mtime_cache(tmpdir):
+    root = str(tmpdir.mkdir("root"))
+    cache_root = str(tmpdir.join("cache"))
+    tmpdir.join("root", "a.html").write_binary(b"<title>a</title>")
+    tmpdir.join("root", "b.html").write_binary(b"<title>b</title>")
+
+    tree = vcs.FileSystem(root, "/", cache_root=cache_root)
+    hashes = {source_file.rel_path: source_file.hash for source_file in tree}
+    tree.dump_caches()
+    assert os.path.exists(os.path.join(cache_root, "mtime.json"))
+
+    tmpdir.join("root", "b.html").write_binary(b"<title>changed</title>")
+    os.utime(os.path.join(root, "b.html"), (0, 0))
+
+    tree = vcs.FileSystem(root, "/", cache_root=cache_root)
+    files = {source_file.rel_path: source_file for source_file in tree}
+
+    a = os.path.join(".", "a.html")
+    b = os.path.join(".", "b.html")
+    # The unchanged file has its hash taken from the cache
+    assert files[a]._hash == hashes[a]
+    assert files[b]._hash is None
+    assert files[b].hash != hashes[b]
+
+    tree = vcs.FileSystem(root, "/", cache_root=cache_root, rebuild=True)
+    assert all(source_file._hash is None for source_file in tree)
+
+
+def test_filesystem_ignored_dir(tmpdir):
+    tmpdir.join(".gitignore").write_binary(b"build/\n")
+    tmpdir.join("a.html").write_binary(b"<title>a</title>")
+    tmpdir.join("build", "b.html").write_binary(b"<title>b</title>", ensure=True)
+    tmpdir.join("c", "build", "d.html").write_binary(b"<title>d</title>", ensure=True)
+
+    walked = set()
+    os_walk = os.walk
+
+    def walk(top, *args, **kwargs):
+        for item in os_walk(top, *args, **kwargs):
+            walked.add(os.path.relpath(item[0], str(tmpdir)).replace(os.path.sep, "/"))
+            yield item
+
+    with mock.patch("os.walk", walk):
+        paths = {source_file.rel_path.replace(os.path.sep, "/")
+                 for source_file in vcs.FileSystem(str(tmpdir), "/")}
+
+    assert paths == {"./.gitignore", "./a.html"}
+    # Ignored directories aren't walked at all
+    assert walked == {".", "c"}
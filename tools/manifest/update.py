@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import argparse
 import imp
+import multiprocessing
 import os
 import sys
 
@@ -15,15 +16,18 @@ wpt_root = os.path.abspath(os.path.join(here, os.pardir, os.pardir))
 
 logger = get_logger()
 
-def update(tests_root, manifest, working_copy=False):
+def update(tests_root, manifest, working_copy=False, jobs=1, cache_root=None, rebuild=False):
     logger.info("Updating manifest")
     tree = None
     if not working_copy:
         tree = vcs.Git.for_path(tests_root, manifest.url_base)
     if tree is None:
-        tree = vcs.FileSystem(tests_root, manifest.url_base)
+        tree = vcs.FileSystem(tests_root, manifest.url_base, cache_root=cache_root,
+                              rebuild=rebuild)
 
-    return manifest.update(tree)
+    changed = manifest.update(tree, jobs=jobs)
+    tree.dump_caches()
+    return changed
 
 
 def update_from_cli(**kwargs):
@@ -46,9 +50,20 @@ def update_from_cli(**kwargs):
     if m is None:
         m = manifest.Manifest(kwargs["url_base"])
 
+    jobs = kwargs["jobs"]
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+
+    cache_root = kwargs["cache_root"]
+    if cache_root is None:
+        cache_root = os.path.join(tests_root, ".wptcache")
+
     changed = update(tests_root,
                      m,
-                     working_copy=kwargs["work"])
+                     working_copy=kwargs["work"],
+                     jobs=jobs,
+                     cache_root=cache_root,
+                     rebuild=kwargs.get("rebuild", False))
     if changed:
         manifest.write(m, path)
 
@@ -75,6 +90,14 @@ def create_parser():
     parser.add_argument(
         "--no-download", dest="download", action="store_false", default=True,
         help="Never attempt to download the manifest.")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Number of processes to use when computing manifest items for new or "
+        "changed files, or 0 to use one per CPU.")
+    parser.add_argument(
+        "--cache-root", action="store", type=abs_path, default=None,
+        help="Path in which to store the cache of file hashes used when building "
+        "from the working tree (default: <tests-root>/.wptcache).")
     return parser
 
 
@@ -1,5 +1,6 @@
 import platform
 import os
+import sys
 
 from six import BytesIO
 
@@ -27,6 +28,16 @@ def to_os_path(path):
     return path.replace("/", os.path.sep)
 
 
+def replace_file(src, dst):
+    """Rename the file at src to dst, replacing any existing file at dst.
+
+    os.rename can't replace an existing file on Windows, so there the old
+    file is removed first; elsewhere the rename is atomic."""
+    if sys.platform == "win32" and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
 class ContextManagerBytesIO(BytesIO):
     def __enter__(self):
         return self
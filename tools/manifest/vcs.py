@@ -1,6 +1,9 @@
+import json
 import os
 import subprocess
 
+from six import iteritems
+
 from .sourcefile import SourceFile
 
 
@@ -26,6 +29,8 @@ class Git(object):
             return None
 
     def _local_changes(self):
+        """Dict of rel_path: (status, orig_path) for every file with changes
+        in the working copy, as reported by git status"""
         changes = {}
         cmd = ["status", "-z", "--ignore-submodules=all"]
         data = self.git(*cmd)
@@ -33,45 +38,147 @@ class Git(object):
         if data == "":
             return changes
 
-        rename_data = None
-        for entry in data.split("\0")[:-1]:
-            if rename_data is not None:
-                status, rel_path = entry.split(" ")
-                if status[0] == "R":
-                    rename_data = (rel_path, status)
-                else:
-                    changes[rel_path] = (status, None)
+        entries = iter(data.split("\0")[:-1])
+        for entry in entries:
+            status, rel_path = entry[:2], entry[3:]
+            if status[0] in ("R", "C"):
+                # Renames and copies are followed by the original path
+                orig_path = next(entries)
             else:
-                rel_path = entry
-                changes[rel_path] = rename_data
-                rename_data = None
+                orig_path = None
+            changes[rel_path] = (status, orig_path)
         return changes
 
-    def _show_file(self, path):
-        path = os.path.relpath(os.path.abspath(path), self.root)
-        return self.git("show", "HEAD:%s" % path)
+    def _hash_objects(self, rel_paths):
+        """Dict of rel_path: blob object id for the working copy version of
+        each of rel_paths, which must all be files"""
+        if not rel_paths:
+            return {}
+        # Pass the paths on stdin to avoid any limit on the command line length
+        cmd = ["git", "hash-object", "--stdin-paths"]
+        proc = subprocess.Popen(cmd, cwd=self.root, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = proc.communicate("".join("%s\n" % rel_path for rel_path in rel_paths))
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, output)
+        hashes = output.split()
+        assert len(hashes) == len(rel_paths)
+        return dict(zip(rel_paths, hashes))
 
     def __iter__(self):
-        cmd = ["ls-tree", "-r", "-z", "--name-only", "HEAD"]
+        cmd = ["ls-tree", "-r", "-z", "HEAD"]
         local_changes = self._local_changes()
-        for rel_path in self.git(*cmd).split("\0")[:-1]:
-            if not os.path.isdir(os.path.join(self.root, rel_path)):
-                if rel_path in local_changes:
-                    contents = self._show_file(rel_path)
-                else:
-                    contents = None
-                yield SourceFile(self.root,
-                                 rel_path,
-                                 self.url_base,
-                                 contents=contents)
+        # Tracked files that are modified in the working copy need to be
+        # hashed, but for everything else the object id in HEAD is the hash of
+        # the file contents, so we don't need to read the file at all.
+        # Untracked and ignored entries aren't in HEAD, and may be directories.
+        modified = [rel_path for rel_path, (status, _) in iteritems(local_changes)
+                    if status not in ("??", "!!") and "D" not in status and
+                    os.path.isfile(os.path.join(self.root, rel_path))]
+        local_hashes = self._hash_objects(modified)
+        # The original paths of renamed files are still listed in HEAD
+        removed = {orig_path for status, orig_path in local_changes.values()
+                   if status[0] == "R"}
+
+        for result in self.git(*cmd).split("\0")[:-1]:
+            # Each entry is "<mode> <type> <object id>\t<path>"
+            data, rel_path = result.split("\t", 1)
+            mode, obj_type, obj_id = data.split(" ")
+            if obj_type != "blob":
+                # Submodules
+                continue
+            if mode == "120000" and os.path.isdir(os.path.join(self.root, rel_path)):
+                # Symlinks to directories
+                continue
+            if rel_path in removed or not os.path.lexists(os.path.join(self.root, rel_path)):
+                # Renamed or deleted in the working copy
+                continue
+            if rel_path in local_changes:
+                if rel_path not in local_hashes:
+                    continue
+                obj_id = local_hashes[rel_path]
+            yield SourceFile(self.root,
+                             rel_path,
+                             self.url_base,
+                             hash=obj_id)
+
+    def dump_caches(self):
+        pass
+
+
+class MtimeCache(object):
+    """Persistent cache of the hashes of files in a tree, keyed by rel_path and
+    validated against the file's mtime, size and inode.
+
+    :param cache_root: Directory in which to store the cache, or None to
+                       disable caching
+    :param rebuild: Ignore any existing cache data"""
+
+    file_name = "mtime.json"
+
+    def __init__(self, cache_root, rebuild=False):
+        self.path = os.path.join(cache_root, self.file_name) if cache_root else None
+        self.data = {}
+        if self.path and not rebuild:
+            self.data = self._load()
+        self.new_data = {}
+        self.pending = []
+        self.modified = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    @staticmethod
+    def _stat_key(stat):
+        return [stat.st_mtime, stat.st_size, stat.st_ino]
+
+    def get(self, rel_path, stat):
+        """Return the cached hash for rel_path if the file is unchanged since
+        the hash was computed, or None otherwise"""
+        if self.path is None:
+            return None
+        entry = self.data.get(rel_path)
+        if entry is not None and entry[:3] == self._stat_key(stat):
+            self.new_data[rel_path] = entry
+            return entry[3]
+        return None
+
+    def add(self, source_file, stat):
+        """Record a file that isn't in the cache. The hash is read when the
+        cache is written so that it is only computed once."""
+        if self.path is not None:
+            self.pending.append((source_file, stat))
+
+    def dump(self):
+        if self.path is None:
+            return
+        for source_file, stat in self.pending:
+            self.new_data[source_file.rel_path] = self._stat_key(stat) + [source_file.hash]
+        self.pending = []
+        if self.new_data == self.data:
+            return
+        dir_name = os.path.dirname(self.path)
+        if not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+        with open(self.path, "w") as f:
+            json.dump(self.new_data, f)
+        self.data = self.new_data
 
 
 class FileSystem(object):
-    def __init__(self, root, url_base):
+    def __init__(self, root, url_base, cache_root=None, rebuild=False):
         self.root = root
         self.url_base = url_base
         from gitignore import gitignore
         self.path_filter = gitignore.PathFilter(self.root)
+        self.mtime_cache = MtimeCache(cache_root, rebuild=rebuild)
 
     def __iter__(self):
         is_root = True
@@ -80,12 +187,26 @@ class FileSystem(object):
 
             if is_root:
                 dir_names[:] = [item for item in dir_names if item not in
-                                ["tools", "resources", ".git"]]
+                                ["tools", "resources", ".git", ".wptcache"]]
                 is_root = False
 
             for filename in filenames:
                 rel_path = os.path.join(rel_root, filename)
                 if self.path_filter(rel_path):
-                    yield SourceFile(self.root,
-                                     rel_path,
-                                     self.url_base)
+                    stat = os.stat(os.path.join(dir_path, filename))
+                    file_hash = self.mtime_cache.get(rel_path, stat)
+                    source_file = SourceFile(self.root,
+                                             rel_path,
+                                             self.url_base,
+                                             hash=file_hash)
+                    if file_hash is None:
+                        self.mtime_cache.add(source_file, stat)
+                    yield source_file
+
+            # Don't walk into ignored directories
+            dir_names[:] = [item for item in dir_names if
+                            self.path_filter(os.path.relpath(os.path.join(dir_path, item),
+                                                             self.root) + "/")]
+
+    def dump_caches(self):
+        self.mtime_cache.dump()
@@ -1,6 +1,7 @@
 import argparse
 import itertools
 import logging
+import multiprocessing
 import os
 import re
 import subprocess
@@ -180,8 +181,148 @@ def _init_manifest_cache():
 load_manifest = _init_manifest_cache()
 
 
-def affected_testfiles(files_changed, skip_tests, manifest_path=None):
-    """Determine and return list of test files that reference changed files."""
+def trie_pattern(strings):
+    """Regexp pattern matching any of strings, with the alternatives arranged
+    as a trie so that matching at a position takes time proportional to the
+    length of the match rather than the number of strings. Where several of
+    the strings match at the same position the longest one is matched."""
+    trie = {}
+    for value in strings:
+        node = trie
+        for char in value:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def pattern(node):
+        branches = [re.escape(char) + pattern(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if "" in node:
+            return "(?:%s)?" % "|".join(branches)
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:%s)" % "|".join(branches)
+
+    return pattern(trie)
+
+
+class PathMatcher(object):
+    """Matcher for text that refers to any of a set of changed files, either
+    by the path from the root of the repository or by the path relative to
+    the directory containing the text.
+
+    All the paths end with the file name, so the text is searched once with a
+    single regexp of all the file names, and the full paths are only checked
+    where a file name is found.
+
+    :param changed_paths: Iterable of (full path, repo path) pairs, where the
+                          repo path is the /-separated path from the root of
+                          the repository starting with /."""
+
+    def __init__(self, changed_paths):
+        self.by_name = {}
+        for full_path, repo_path in changed_paths:
+            name = repo_path.rsplit("/", 1)[1]
+            self.by_name.setdefault(name, []).append((full_path, repo_path))
+
+        # The longest name is matched at each position, and any shorter name
+        # matching there is a prefix of it. The match is a lookahead so that
+        # names overlapping with an earlier match are also found.
+        names = sorted(self.by_name)
+        self.prefixes = {name: [other for other in names if name.startswith(other)]
+                         for name in names}
+        self.names_re = None
+        if names:
+            self.names_re = re.compile("(?=(%s))" % trie_pattern(names))
+        self._rel_paths = {}
+
+    def rel_path(self, full_path, dir_path):
+        key = (full_path, dir_path)
+        if key not in self._rel_paths:
+            self._rel_paths[key] = os.path.relpath(full_path, dir_path).replace(os.path.sep, "/")
+        return self._rel_paths[key]
+
+    def matches(self, text, dir_path):
+        """Check whether text refers to any of the changed paths.
+
+        :param text: Unicode text to search
+        :param dir_path: Directory that relative paths are relative to"""
+        if self.names_re is None:
+            return False
+        for m in self.names_re.finditer(text):
+            start = m.start()
+            for name in self.prefixes[m.group(1)]:
+                end = start + len(name)
+                for full_path, repo_path in self.by_name[name]:
+                    if (text.endswith(repo_path, 0, end) or
+                        text.endswith(self.rel_path(full_path, dir_path), 0, end)):
+                        return True
+        return False
+
+
+def read_text(path):
+    """Read the file at path as unicode, using the BOM to detect UTF-16 and
+    otherwise decoding as UTF-8"""
+    with open(path, "rb") as fh:
+        file_contents = fh.read()
+    if file_contents.startswith("\xfe\xff"):
+        return file_contents.decode("utf-16be", "replace")
+    elif file_contents.startswith("\xff\xfe"):
+        return file_contents.decode("utf-16le", "replace")
+    return file_contents.decode("utf8", "replace")
+
+
+_scan_matcher = None
+
+
+def _init_scan(changed_paths):
+    global _scan_matcher
+    _scan_matcher = PathMatcher(changed_paths)
+
+
+def _scan_file(test_full_path):
+    return _scan_matcher.matches(read_text(test_full_path), os.path.dirname(test_full_path))
+
+
+def scan_testfiles(test_files, changed_paths, jobs=1):
+    """Find the test files that refer to any of the changed paths by searching
+    their contents.
+
+    :param test_files: List of full paths of the test files to search
+    :param changed_paths: Iterable of (full path, repo path) pairs of the
+                          changed files
+    :param jobs: Number of processes to use to search the files
+    :returns: Set of the full paths of the test files that refer to a
+              changed path"""
+    changed_paths = list(changed_paths)
+    if not test_files or not changed_paths:
+        return set()
+
+    if jobs > 1:
+        chunksize = max(1, len(test_files) // (jobs * 4))
+        pool = multiprocessing.Pool(jobs, _init_scan, (changed_paths,))
+        try:
+            results = list(pool.imap(_scan_file, test_files, chunksize))
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        matcher = PathMatcher(changed_paths)
+        results = [matcher.matches(read_text(test_full_path), os.path.dirname(test_full_path))
+                   for test_full_path in test_files]
+
+    return {test_full_path for test_full_path, affected in zip(test_files, results) if affected}
+
+
+def affected_testfiles(files_changed, skip_tests, manifest_path=None, jobs=1):
+    """Determine and return list of test files that reference changed files.
+
+    :param jobs: Number of processes to use when searching test files that
+                 don't have their dependencies recorded in the manifest"""
     affected_testfiles = set()
     # Exclude files that are in the repo root, because
     # they are not part of any test.
@@ -215,49 +356,46 @@ def affected_testfiles(files_changed, skip_tests, manifest_path=None):
             full_path = os.path.join(wpt_root, repo_path[1:].replace("/", os.path.sep))
         nontest_changed_paths.add((full_path, repo_path))
 
-    def affected_by_wdspec(test):
-        affected = False
-        if test in wdspec_test_files:
-            for support_full_path, _ in nontest_changed_paths:
-                # parent of support file or of "support" directory
-                parent = os.path.dirname(support_full_path)
-                if os.path.basename(parent) == "support":
-                    parent = os.path.dirname(parent)
-                relpath = os.path.relpath(test, parent)
-                if not relpath.startswith(os.pardir):
-                    # testfile is in subtree of support file
-                    affected = True
-                    break
-        return affected
-
-    for root, dirs, fnames in os.walk(wpt_root):
-        # Walk top_level_subdir looking for test files containing either the
-        # relative filepath or absolute filepath to the changed files.
-        if root == wpt_root:
-            for dir_name in skip_tests:
-                dirs.remove(dir_name)
-        for fname in fnames:
-            test_full_path = os.path.join(root, fname)
-            # Skip any file that's not a test file.
-            if test_full_path not in test_files:
-                continue
-            if affected_by_wdspec(test_full_path):
+    # wdspec tests are affected by changes to any support file in their
+    # directory or a parent directory, so look these up using the manifest's
+    # directory index rather than checking each test against each change
+    wdspec_affected = set()
+    for support_full_path, _ in nontest_changed_paths:
+        # parent of support file or of "support" directory
+        parent = os.path.dirname(support_full_path)
+        if os.path.basename(parent) == "support":
+            parent = os.path.dirname(parent)
+        rel_parent = os.path.relpath(parent, wpt_root)
+        if rel_parent == os.curdir:
+            wdspec_affected |= wdspec_test_files
+            break
+        for test in wpt_manifest.iterdir(rel_parent):
+            if test.item_type == "wdspec":
+                wdspec_affected.add(os.path.join(wpt_root, test.path))
+
+    def in_skipped_dir(test_full_path):
+        rel_path = os.path.relpath(test_full_path, wpt_root)
+        return rel_path.split(os.sep)[0] in skip_tests
+
+    affected_testfiles |= {test_full_path for test_full_path in wdspec_affected
+                           if not in_skipped_dir(test_full_path)}
+
+    # The manifest records the files each test refers to, so the tests that
+    # refer to a changed file can be looked up directly
+    for full_path, repo_path in nontest_changed_paths:
+        for rel_path in wpt_manifest.dependents(repo_path):
+            test_full_path = os.path.join(wpt_root, rel_path)
+            if test_full_path in test_files and not in_skipped_dir(test_full_path):
                 affected_testfiles.add(test_full_path)
-                continue
 
-            with open(test_full_path, "rb") as fh:
-                file_contents = fh.read()
-                if file_contents.startswith("\xfe\xff"):
-                    file_contents = file_contents.decode("utf-16be", "replace")
-                elif file_contents.startswith("\xff\xfe"):
-                    file_contents = file_contents.decode("utf-16le", "replace")
-                else:
-                    file_contents = file_contents.decode("utf8", "replace")
-                for full_path, repo_path in nontest_changed_paths:
-                    rel_path = os.path.relpath(full_path, root).replace(os.path.sep, "/")
-                    if rel_path in file_contents or repo_path in file_contents:
-                        affected_testfiles.add(test_full_path)
-                        continue
+    # Tests without recorded dependencies, e.g. from a manifest written by an
+    # older version of the manifest tool, are searched for references to the
+    # changed files instead
+    to_scan = [test_full_path for test_full_path in sorted(test_files)
+               if not (test_full_path in affected_testfiles or
+                       wpt_manifest.has_dependencies(os.path.relpath(test_full_path, wpt_root)) or
+                       in_skipped_dir(test_full_path))]
+    affected_testfiles |= scan_testfiles(to_scan, nontest_changed_paths, jobs)
 
     return tests_changed, affected_testfiles
 
@@ -289,6 +427,9 @@ def get_parser_affected():
                         action="store",
                         default=wpt_root,
                         help="Directory that will contain MANIFEST.json")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processes to use when searching test files for "
+                        "references to the changed files, or 0 to use one per CPU")
     return parser
 
 
@@ -314,10 +455,14 @@ def run_tests_affected(**kwargs):
                                include_uncommitted=kwargs["modified"],
                                include_new=kwargs["new"])
     manifest_path = os.path.join(kwargs["metadata_root"], "MANIFEST.json")
+    jobs = kwargs["jobs"]
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
     tests_changed, dependents = affected_testfiles(
         changed,
         set(["conformance-checkers", "docs", "tools"]),
-        manifest_path=manifest_path
+        manifest_path=manifest_path,
+        jobs=jobs
     )
 
     message = "{path}"
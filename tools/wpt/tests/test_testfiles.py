@@ -0,0 +1,81 @@
+import os
+
+import mock
+import pytest
+
+from tools.manifest import manifest, sourcefile
+from tools.wpt import testfiles
+
+
+files = {
+    "a/test.html": (b"<script src=/resources/testharness.js></script>"
+                    b"<script src=support/helper.js></script>"),
+    "a/other.html": b"<script src=/resources/testharness.js></script>",
+    "a/test.any.js": b"// META: script=/common/utils.js\n",
+    "a/support/helper.js": b"",
+    "common/utils.js": b"",
+    "docs/test.html": b"<script src=/resources/testharness.js></script><script src=/common/utils.js>",
+    "resources/testharness.js": b"",
+}
+
+
+@pytest.fixture
+def wpt_root(tmpdir):
+    for rel_path, contents in files.items():
+        tmpdir.join(rel_path).write_binary(contents, ensure=True)
+    return str(tmpdir)
+
+
+def build_manifest(root):
+    m = manifest.Manifest()
+    m.update([sourcefile.SourceFile(root, os.path.join(*rel_path.split("/")), "/")
+              for rel_path in sorted(files)])
+    return m
+
+
+def affected(root, m, changed, jobs=1):
+    with mock.patch.object(testfiles, "wpt_root", root):
+        with mock.patch.object(testfiles, "load_manifest", return_value=m):
+            tests_changed, dependents = testfiles.affected_testfiles(
+                [os.path.join(root, *path.split("/")) for path in changed],
+                {"docs"}, jobs=jobs)
+    return ({os.path.relpath(path, root).replace(os.path.sep, "/") for path in tests_changed},
+            {os.path.relpath(path, root).replace(os.path.sep, "/") for path in dependents})
+
+
+@pytest.mark.parametrize("with_index,jobs", [(True, 1), (False, 1), (False, 2)])
+def test_affected_testfiles(wpt_root, with_index, jobs):
+    m = build_manifest(wpt_root)
+    if not with_index:
+        # Tests without recorded dependencies are scanned instead
+        data = m.to_json()
+        del data["dependencies"]
+        m = manifest.Manifest.from_json(wpt_root, data)
+        assert not m.has_dependencies(os.path.join("a", "test.html"))
+
+    assert affected(wpt_root, m, ["a/support/helper.js"], jobs) == (set(), {"a/test.html"})
+    assert affected(wpt_root, m, ["common/utils.js"], jobs) == (set(), {"a/test.any.js"})
+    assert affected(wpt_root, m, ["a/other.html", "resources/testharness.js"], jobs) == (
+        {"a/other.html"}, {"a/test.html", "a/other.html"})
+
+
+def test_path_matcher():
+    root = os.path.join(os.sep, "wpt")
+    changed = ["a/b.js", "a/b.js.map", "c/ab.js", "c/d/b.js"]
+    matcher = testfiles.PathMatcher([(os.path.join(root, *path.split("/")), "/" + path)
+                                     for path in changed])
+    a_dir = os.path.join(root, "a")
+    c_dir = os.path.join(root, "c")
+
+    assert matcher.matches(u"<script src=/a/b.js>", c_dir)
+    assert matcher.matches(u"<script src=b.js>", a_dir)
+    assert not matcher.matches(u"<script src=b.js>", c_dir)
+    # Names that are prefixes of, or overlap with, other names
+    assert matcher.matches(u"<script src=b.js.map>", a_dir)
+    assert matcher.matches(u"<script src=d/b.js>", c_dir)
+    assert matcher.matches(u"<script src=../c/ab.js>", a_dir)
+    assert matcher.matches(u"/c/ab.js.mapx", a_dir)
+    assert not matcher.matches(u"<script src=/c/d.js>", a_dir)
+    assert not matcher.matches(u"", a_dir)
+
+    assert not testfiles.PathMatcher([]).matches(u"/a/b.js", a_dir)
@@ -35,6 +35,7 @@ setup(name=PACKAGE_NAME,
           'console_scripts': [
               'wptrunner = wptrunner.wptrunner:main',
               'wptupdate = wptrunner.update:main',
+              'wpttimings = wptrunner.timings:main',
           ]
       },
       zip_safe=False,
@@ -24,7 +24,7 @@ def browser_kwargs(test_type, run_info_data, **kwargs):
     return {"webdriver_binary": kwargs["webdriver_binary"],
             "webdriver_args": kwargs.get("webdriver_args")}
 
-def executor_kwargs(test_type, server_config, cache_manager, run_info_data,
+def executor_kwargs(test_type, server_config, run_info_data,
                     **kwargs):
     from selenium.webdriver import DesiredCapabilities
 
@@ -32,8 +32,7 @@ def executor_kwargs(test_type, server_config, cache_manager, run_info_data,
     ieOptions["requireWindowFocus"] = True
     capabilities = {}
     capabilities["se:ieOptions"] = ieOptions
-    executor_kwargs = base_executor_kwargs(test_type, server_config,
-                                           cache_manager, **kwargs)
+    executor_kwargs = base_executor_kwargs(test_type, server_config, **kwargs)
     executor_kwargs["close_after_done"] = True
     executor_kwargs["capabilities"] = capabilities
     return executor_kwargs
@@ -98,10 +98,9 @@ def browser_kwargs(test_type, run_info_data, **kwargs):
     return {"sauce_config": sauce_config}
 
 
-def executor_kwargs(test_type, server_config, cache_manager, run_info_data,
+def executor_kwargs(test_type, server_config, run_info_data,
                     **kwargs):
-    executor_kwargs = base_executor_kwargs(test_type, server_config,
-                                           cache_manager, **kwargs)
+    executor_kwargs = base_executor_kwargs(test_type, server_config, **kwargs)
 
     executor_kwargs["capabilities"] = get_capabilities(**kwargs)
 
@@ -37,10 +37,9 @@ def browser_kwargs(test_type, run_info_data, **kwargs):
     }
 
 
-def executor_kwargs(test_type, server_config, cache_manager, run_info_data,
+def executor_kwargs(test_type, server_config, run_info_data,
                     **kwargs):
-    rv = base_executor_kwargs(test_type, server_config,
-                              cache_manager, **kwargs)
+    rv = base_executor_kwargs(test_type, server_config, **kwargs)
     rv["pause_after_test"] = kwargs["pause_after_test"]
     return rv
 
@@ -47,9 +47,8 @@ def browser_kwargs(test_type, run_info_data, **kwargs):
     }
 
 
-def executor_kwargs(test_type, server_config, cache_manager, run_info_data, **kwargs):
-    rv = base_executor_kwargs(test_type, server_config,
-                              cache_manager, **kwargs)
+def executor_kwargs(test_type, server_config, run_info_data, **kwargs):
+    rv = base_executor_kwargs(test_type, server_config, **kwargs)
     return rv
 
 
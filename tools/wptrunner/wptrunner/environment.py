@@ -1,6 +1,5 @@
 import json
 import os
-import multiprocessing
 import signal
 import socket
 import sys
@@ -89,7 +88,6 @@ class TestEnvironment(object):
         self.debug_info = debug_info
         self.options = options if options is not None else {}
 
-        self.cache_manager = multiprocessing.Manager()
         self.stash = serve.stash.StashServer()
         self.env_extras = env_extras
 
@@ -97,7 +95,6 @@ class TestEnvironment(object):
     def __enter__(self):
         self.stash.__enter__()
         self.ssl_env.__enter__()
-        self.cache_manager.__enter__()
         for cm in self.env_extras:
             cm.__enter__(self.options)
         self.setup_server_logging()
@@ -118,7 +115,6 @@ class TestEnvironment(object):
                 server.kill()
         for cm in self.env_extras:
             cm.__exit__(exc_type, exc_val, exc_tb)
-        self.cache_manager.__exit__(exc_type, exc_val, exc_tb)
         self.ssl_env.__exit__(exc_type, exc_val, exc_tb)
         self.stash.__exit__()
 
@@ -7,6 +7,7 @@ import socket
 import urlparse
 from abc import ABCMeta, abstractmethod
 
+from ..screenshotcache import ScreenshotHashStore, ScreenshotLRU
 from ..testrunner import Stop
 
 here = os.path.split(__file__)[0]
@@ -16,7 +17,7 @@ here = os.path.split(__file__)[0]
 extra_timeout = 5 # seconds
 
 
-def executor_kwargs(test_type, server_config, cache_manager, **kwargs):
+def executor_kwargs(test_type, server_config, **kwargs):
     timeout_multiplier = kwargs["timeout_multiplier"]
     if timeout_multiplier is None:
         timeout_multiplier = 1
@@ -26,7 +27,7 @@ def executor_kwargs(test_type, server_config, cache_manager, **kwargs):
                        "debug_info": kwargs["debug_info"]}
 
     if test_type == "reftest":
-        executor_kwargs["screenshot_cache"] = cache_manager.dict()
+        executor_kwargs["screenshot_cache"] = ScreenshotHashStore()
 
     if test_type == "wdspec":
         executor_kwargs["binary"] = kwargs.get("binary")
@@ -103,6 +104,7 @@ class TestExecutor(object):
     test_type = None
     convert_result = None
     supports_testdriver = False
+    supports_batching = False
 
     def __init__(self, browser, server_config, timeout_multiplier=1,
                  debug_info=None, **kwargs):
@@ -169,6 +171,71 @@ class TestExecutor(object):
 
         self.runner.send_message("test_ended", test, result)
 
+    @classmethod
+    def can_batch(cls, test):
+        """Whether test can be run as part of a batch of tests"""
+        return cls.supports_batching
+
+    def run_tests(self, tests):
+        """Run a batch of tests that share an environment.
+
+        Messages are sent to the manager as the tests start and end, as for
+        single tests. The batch stops early after any test that crashed,
+        errored, timed out, or had an unexpected result, since the browser
+        may need a restart; in that case a batch_ended message with the
+        number of tests that ran is sent.
+
+        :param tests: List of tests to run"""
+        if tests[0].environment != self.last_environment:
+            self.on_environment_change(tests[0].environment)
+        self.last_environment = tests[0].environment
+
+        count = 0
+        self.runner.send_message("test_started", tests[0])
+        results = self.do_tests(tests)
+        while count < len(tests):
+            test = tests[count]
+            try:
+                result = next(results)
+            except StopIteration:
+                break
+            except Exception as e:
+                result = self.result_from_exception(test, e)
+            if result is Stop:
+                return result
+            count += 1
+
+            if result[0].status == "ERROR":
+                self.logger.debug(result[0].message)
+            self.runner.send_message("test_ended", test, result)
+
+            if count == len(tests) or not self.continue_batch(test, result):
+                break
+            self.runner.send_message("test_started", tests[count])
+
+        if count < len(tests):
+            results.close()
+            self.runner.send_message("batch_ended", count)
+
+    def do_tests(self, tests):
+        """Generator running a batch of tests and yielding the result of
+        each test in turn. Executors that set supports_batching override this
+        to run several tests per round trip to the browser.
+
+        :param tests: List of tests to run"""
+        for test in tests:
+            yield self.do_test(test)
+
+    def continue_batch(self, test, result):
+        harness_result, subtest_results = result
+        if harness_result.status in ("ERROR", "TIMEOUT", "CRASH", "EXTERNAL-TIMEOUT"):
+            return False
+        if harness_result.status != test.expected():
+            return False
+        return all(subtest.status == test.expected(subtest.name)
+                   for subtest in subtest_results
+                   if not test.disabled(subtest.name))
+
     def server_url(self, protocol):
         return "%s://%s:%s" % (protocol,
                                self.server_config["host"],
@@ -220,11 +287,13 @@ class RefTestImplementation(object):
     def __init__(self, executor):
         self.timeout_multiplier = executor.timeout_multiplier
         self.executor = executor
-        # Cache of url:(screenshot hash, screenshot). Typically the
-        # screenshot is None, but we set this value if a test fails
-        # and the screenshot was taken from the cache so that we may
-        # retrieve the screenshot from the cache directly in the future
+        # Store of (url, viewport_size, dpi):screenshot hash shared between
+        # all the test runner processes
         self.screenshot_cache = self.executor.screenshot_cache
+        # Screenshots retaken in this process after a failure where the
+        # hash was taken from the cache, so that we don't need to take them
+        # again for later failures
+        self.screenshots = ScreenshotLRU()
         self.message = None
 
     def setup(self):
@@ -241,7 +310,8 @@ class RefTestImplementation(object):
         timeout = test.timeout * self.timeout_multiplier
         key = (test.url, viewport_size, dpi)
 
-        if key not in self.screenshot_cache:
+        hash_value = self.screenshot_cache.get(key)
+        if hash_value is None:
             success, data = self.executor.screenshot(test, viewport_size, dpi)
 
             if not success:
@@ -250,11 +320,11 @@ class RefTestImplementation(object):
             screenshot = data
             hash_value = hashlib.sha1(screenshot).hexdigest()
 
-            self.screenshot_cache[key] = (hash_value, None)
+            self.screenshot_cache[key] = hash_value
 
             rv = (hash_value, screenshot)
         else:
-            rv = self.screenshot_cache[key]
+            rv = (hash_value, self.screenshots.get(key))
 
         self.message.append("%s %s" % (test.url, rv[0]))
         return True, rv
@@ -315,8 +385,7 @@ class RefTestImplementation(object):
             return False, data
 
         key = (node.url, viewport_size, dpi)
-        hash_val, _ = self.screenshot_cache[key]
-        self.screenshot_cache[key] = hash_val, data
+        self.screenshots[key] = data
         return True, data
 
 
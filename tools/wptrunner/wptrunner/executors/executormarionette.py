@@ -1,9 +1,11 @@
 import os
 import socket
 import threading
+import json
 import traceback
 import urlparse
 import uuid
+from collections import deque
 
 errors = None
 marionette = None
@@ -365,6 +367,8 @@ class ExecuteAsyncScriptRun(object):
 
 
 class MarionetteTestharnessExecutor(TestharnessExecutor):
+    supports_batching = True
+
     def __init__(self, browser, server_config, timeout_multiplier=1,
                  close_after_done=True, debug_info=None, capabilities=None,
                  **kwargs):
@@ -375,6 +379,10 @@ class MarionetteTestharnessExecutor(TestharnessExecutor):
 
         self.protocol = MarionetteProtocol(self, browser, capabilities, timeout_multiplier)
         self.script = open(os.path.join(here, "testharness_marionette.js")).read()
+        with open(os.path.join(here, "testharness_marionette_batch.js")) as f:
+            self.script_batch = f.read()
+        with open(os.path.join(here, "testharness_marionette_batch_resume.js")) as f:
+            self.script_batch_resume = f.read()
         self.close_after_done = close_after_done
         self.window_id = str(uuid.uuid4())
 
@@ -406,6 +414,50 @@ class MarionetteTestharnessExecutor(TestharnessExecutor):
 
         return (test.result_cls(*data), [])
 
+    @classmethod
+    def can_batch(cls, test):
+        # Storage is cleared before each test that uses it
+        return "/storage/" not in test.url
+
+    def do_tests(self, tests):
+        marionette = self.protocol.marionette
+        urls = [self.test_url(test) for test in tests]
+        timeouts = [test.timeout * self.timeout_multiplier for test in tests]
+
+        if self.close_after_done:
+            marionette.execute_script("if (window.wrappedJSObject.win) {window.wrappedJSObject.win.close()}")
+            self.protocol.close_old_windows(self.protocol)
+
+        batch = [[url, strip_server(url), timeout * 1000]
+                 for url, timeout in zip(urls, timeouts)]
+        marionette.execute_script(self.script_batch % {"tests": json.dumps(batch),
+                                                       "window_id": self.window_id,
+                                                       "timeout_multiplier": self.timeout_multiplier},
+                                  new_sandbox=False)
+
+        # Each round trip returns the results of all the tests that completed
+        # since the last one, and each test gets its own timeout
+        results = deque()
+        for test, url, timeout in zip(tests, urls, timeouts):
+            if not results:
+                rv = ExecuteAsyncScriptRun(self.logger,
+                                           self.do_batch_resume,
+                                           self.protocol,
+                                           url,
+                                           timeout).run()
+                if rv is Stop:
+                    yield rv
+                    return
+                success, data = rv
+                if not success:
+                    yield (test.result_cls(*data), [])
+                    return
+                results.extend(data)
+            yield self.convert_result(test, results.popleft())
+
+    def do_batch_resume(self, marionette, url, timeout):
+        return marionette.execute_async_script(self.script_batch_resume, new_sandbox=False)
+
     def do_testharness(self, marionette, url, timeout):
         if self.close_after_done:
             marionette.execute_script("if (window.wrappedJSObject.win) {window.wrappedJSObject.win.close()}")
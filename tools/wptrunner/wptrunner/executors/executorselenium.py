@@ -7,6 +7,7 @@ import time
 import traceback
 import urlparse
 import uuid
+from collections import deque
 
 from .base import (Protocol,
                    RefTestExecutor,
@@ -161,6 +162,7 @@ class SeleniumRun(object):
 
 class SeleniumTestharnessExecutor(TestharnessExecutor):
     supports_testdriver = True
+    supports_batching = True
 
     def __init__(self, browser, server_config, timeout_multiplier=1,
                  close_after_done=True, capabilities=None, debug_info=None,
@@ -174,6 +176,10 @@ class SeleniumTestharnessExecutor(TestharnessExecutor):
             self.script = f.read()
         with open(os.path.join(here, "testharness_webdriver_resume.js")) as f:
             self.script_resume = f.read()
+        with open(os.path.join(here, "testharness_webdriver_batch.js")) as f:
+            self.script_batch = f.read()
+        with open(os.path.join(here, "testharness_webdriver_batch_resume.js")) as f:
+            self.script_batch_resume = f.read()
         self.close_after_done = close_after_done
         self.window_id = str(uuid.uuid4())
 
@@ -197,13 +203,43 @@ class SeleniumTestharnessExecutor(TestharnessExecutor):
 
         return (test.result_cls(*data), [])
 
-    def do_testharness(self, webdriver, url, timeout):
-        format_map = {"abs_url": url,
-                      "url": strip_server(url),
-                      "window_id": self.window_id,
-                      "timeout_multiplier": self.timeout_multiplier,
-                      "timeout": timeout * 1000}
-
+    @classmethod
+    def can_batch(cls, test):
+        # testdriver actions need a round trip for each action
+        return not test.testdriver
+
+    def do_tests(self, tests):
+        webdriver = self.protocol.webdriver
+        urls = [self.test_url(test) for test in tests]
+        timeouts = [test.timeout * self.timeout_multiplier for test in tests]
+
+        self.close_test_windows(webdriver)
+        batch = [[url, strip_server(url), timeout * 1000]
+                 for url, timeout in zip(urls, timeouts)]
+        webdriver.execute_script(self.script_batch % {"tests": json.dumps(batch),
+                                                      "window_id": self.window_id,
+                                                      "timeout_multiplier": self.timeout_multiplier})
+
+        # Each round trip returns the results of all the tests that completed
+        # since the last one, and each test gets its own timeout
+        results = deque()
+        for test, url, timeout in zip(tests, urls, timeouts):
+            if not results:
+                rv = SeleniumRun(self.do_batch_resume, webdriver, url, timeout).run()
+                if rv is Stop:
+                    yield rv
+                    return
+                success, data = rv
+                if not success:
+                    yield (test.result_cls(*data), [])
+                    return
+                results.extend(data)
+            yield self.convert_result(test, results.popleft())
+
+    def do_batch_resume(self, webdriver, url, timeout):
+        return webdriver.execute_async_script(self.script_batch_resume)
+
+    def close_test_windows(self, webdriver):
         parent = webdriver.current_window_handle
         handles = [item for item in webdriver.window_handles if item != parent]
         for handle in handles:
@@ -213,6 +249,16 @@ class SeleniumTestharnessExecutor(TestharnessExecutor):
             except exceptions.NoSuchWindowException:
                 pass
         webdriver.switch_to_window(parent)
+        return parent
+
+    def do_testharness(self, webdriver, url, timeout):
+        format_map = {"abs_url": url,
+                      "url": strip_server(url),
+                      "window_id": self.window_id,
+                      "timeout_multiplier": self.timeout_multiplier,
+                      "timeout": timeout * 1000}
+
+        parent = self.close_test_windows(webdriver)
 
         webdriver.execute_script(self.script % format_map)
         try:
@@ -1,6 +1,10 @@
 window.wrappedJSObject.timeout_multiplier = %(timeout_multiplier)d;
 window.wrappedJSObject.explicit_timeout = %(explicit_timeout)d;
 
+if (window.stop_batch) {
+    window.stop_batch();
+}
+
 window.wrappedJSObject.addEventListener("message", function listener(event) {
     if (event.data.type != "complete") {
         return;
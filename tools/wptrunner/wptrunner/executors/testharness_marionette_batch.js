@@ -0,0 +1,59 @@
+window.wrappedJSObject.timeout_multiplier = %(timeout_multiplier)d;
+window.wrappedJSObject.explicit_timeout = false;
+
+if (window.stop_batch) {
+    window.stop_batch();
+}
+
+window.batch = {results: [], callback: null};
+
+(function(batch) {
+    var tests = %(tests)s;
+    var index = -1;
+    var timer = null;
+
+    function send(result) {
+        batch.results.push(result);
+        if (batch.callback) {
+            var callback = batch.callback;
+            batch.callback = null;
+            callback(batch.results.splice(0));
+        }
+    }
+
+    function next() {
+        index++;
+        if (index < tests.length) {
+            window.wrappedJSObject.win = window.open(tests[index][0], "%(window_id)s");
+            timer = setTimeout(function() {
+                window.wrappedJSObject.win.timeout();
+            }, tests[index][2]);
+        }
+    }
+
+    function listener(event) {
+        if (event.data.type != "complete") {
+            return;
+        }
+        clearTimeout(timer);
+        var subtest_results = event.data.tests.map(function(x) {
+            return [x.name, x.status, x.message, x.stack];
+        });
+        send([tests[index][1],
+              event.data.status.status,
+              event.data.status.message,
+              event.data.status.stack,
+              subtest_results]);
+        next();
+    }
+
+    window.wrappedJSObject.addEventListener("message", listener, false);
+
+    window.stop_batch = function() {
+        clearTimeout(timer);
+        window.wrappedJSObject.removeEventListener("message", listener);
+        window.stop_batch = null;
+    };
+
+    next();
+})(window.batch);
@@ -0,0 +1,5 @@
+if (window.batch.results.length) {
+    marionetteScriptFinished(window.batch.results.splice(0));
+} else {
+    window.batch.callback = marionetteScriptFinished;
+}
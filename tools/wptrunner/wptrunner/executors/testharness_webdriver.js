@@ -1,5 +1,9 @@
 window.timeout_multiplier = %(timeout_multiplier)d;
 
+if (window.stop_batch) {
+  window.stop_batch();
+}
+
 window.message_queue = [];
 
 window.setMessageListener = function(func) {
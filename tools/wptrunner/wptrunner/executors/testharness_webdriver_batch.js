@@ -0,0 +1,59 @@
+window.timeout_multiplier = %(timeout_multiplier)d;
+
+if (window.stop_batch) {
+  window.stop_batch();
+}
+
+window.batch = {results: [], callback: null};
+
+(function(batch) {
+  var tests = %(tests)s;
+  var index = -1;
+  var timer = null;
+
+  function send(result) {
+    batch.results.push(result);
+    if (batch.callback) {
+      var callback = batch.callback;
+      batch.callback = null;
+      callback(batch.results.splice(0));
+    }
+  }
+
+  function next() {
+    index++;
+    if (index < tests.length) {
+      window.win = window.open(tests[index][0], "%(window_id)s");
+      timer = setTimeout(function() {
+        window.win.timeout();
+      }, tests[index][2]);
+    }
+  }
+
+  function listener(event) {
+    var data = event.data;
+    if (data.type !== "complete") {
+      return;
+    }
+    clearTimeout(timer);
+    var subtest_results = data.tests.map(function(x) {
+      return [x.name, x.status, x.message, x.stack];
+    });
+    send([tests[index][1],
+          data.status.status,
+          data.status.message,
+          data.status.stack,
+          subtest_results]);
+    next();
+  }
+
+  window.addEventListener("message", listener, false);
+
+  window.stop_batch = function() {
+    clearTimeout(timer);
+    window.removeEventListener("message", listener);
+    window.stop_batch = null;
+  };
+
+  next();
+})(window.batch);
@@ -0,0 +1,7 @@
+var callback = arguments[arguments.length - 1];
+
+if (window.batch.results.length) {
+  callback(window.batch.results.splice(0));
+} else {
+  window.batch.callback = callback;
+}
@@ -0,0 +1,13 @@
+import os
+import sys
+
+
+def replace_file(src, dst):
+    """Rename the file at src to dst, replacing any existing file at dst.
+
+    This is used to write files by writing a temporary file and renaming
+    it. os.rename can't replace an existing file on Windows, so there the
+    old file is removed first; elsewhere the rename is atomic."""
+    if sys.platform == "win32" and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
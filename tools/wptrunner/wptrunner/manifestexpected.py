@@ -3,6 +3,7 @@ import urlparse
 
 from wptmanifest.backends import static
 from wptmanifest.backends.static import ManifestItem
+from wptmanifest.parser import parse
 
 import expected
 
@@ -224,7 +225,7 @@ class SubtestNode(TestNode):
         return True
 
 
-def get_manifest(metadata_root, test_path, url_base, run_info):
+def get_manifest(metadata_root, test_path, url_base, run_info, metadata_cache=None):
     """Get the ExpectedManifest for a particular test path, or None if there is no
     metadata stored for that test path.
 
@@ -233,30 +234,38 @@ def get_manifest(metadata_root, test_path, url_base, run_info):
     :param url_base: Base url for serving the tests in this manifest
     :param run_info: Dictionary of properties of the test run for which the expectation
                      values should be computed.
+    :param metadata_cache: Optional MetadataCache to get the parsed file from
     """
     manifest_path = expected.expected_path(metadata_root, test_path)
     try:
-        with open(manifest_path) as f:
-            return static.compile(f,
-                                  run_info,
-                                  data_cls_getter=data_cls_getter,
-                                  test_path=test_path,
-                                  url_base=url_base)
+        ast = load_ast(manifest_path, metadata_cache)
     except IOError:
         return None
+    return static.compile_ast(ast,
+                              run_info,
+                              data_cls_getter=data_cls_getter,
+                              test_path=test_path,
+                              url_base=url_base)
 
-def get_dir_manifest(path, run_info):
+def get_dir_manifest(path, run_info, metadata_cache=None):
     """Get the ExpectedManifest for a particular test path, or None if there is no
     metadata stored for that test path.
 
     :param path: Full path to the ini file
     :param run_info: Dictionary of properties of the test run for which the expectation
                      values should be computed.
+    :param metadata_cache: Optional MetadataCache to get the parsed file from
     """
     try:
-        with open(path) as f:
-            return static.compile(f,
-                                  run_info,
-                                  data_cls_getter=lambda x,y: DirectoryManifest)
+        ast = load_ast(path, metadata_cache)
     except IOError:
         return None
+    return static.compile_ast(ast,
+                              run_info,
+                              data_cls_getter=lambda x,y: DirectoryManifest)
+
+def load_ast(path, metadata_cache=None):
+    if metadata_cache is not None:
+        return metadata_cache.get_ast(path)
+    with open(path) as f:
+        return parse(f)
@@ -1,3 +1,5 @@
+import json
+import multiprocessing
 import os
 import shutil
 import sys
@@ -6,7 +8,6 @@ import types
 import uuid
 from collections import defaultdict
 
-from mozlog import reader
 from mozlog import structuredlog
 
 import expected
@@ -30,12 +31,15 @@ def load_test_manifests(serve_root, test_paths):
 def update_expected(test_paths, serve_root, log_file_names,
                     rev_old=None, rev_new="HEAD", ignore_existing=False,
                     sync_root=None, property_order=None, boolean_properties=None,
-                    stability=None):
+                    stability=None, processes=None):
     """Update the metadata files for web-platform-tests based on
     the results obtained in a previous run or runs
 
     If stability is not None, assume log_file_names refers to logs from repeated
-    test jobs, disable tests that don't behave as expected on all runs"""
+    test jobs, disable tests that don't behave as expected on all runs
+
+    The log files are parsed in parallel using up to processes processes,
+    defaulting to the number of CPUs"""
 
     manifests = load_test_manifests(serve_root, test_paths)
 
@@ -54,7 +58,8 @@ def update_expected(test_paths, serve_root, log_file_names,
                                                 ignore_existing=ignore_existing,
                                                 property_order=property_order,
                                                 boolean_properties=boolean_properties,
-                                                stability=stability)
+                                                stability=stability,
+                                                processes=processes)
 
     for test_manifest, expected_map in expected_map_by_manifest.iteritems():
         url_base = manifests[test_manifest]["url_base"]
@@ -144,6 +149,7 @@ def update_from_logs(manifests, *log_filenames, **kwargs):
     property_order = kwargs.get("property_order")
     boolean_properties = kwargs.get("boolean_properties")
     stability = kwargs.get("stability")
+    processes = kwargs.get("processes")
 
     expected_map = {}
     id_test_map = {}
@@ -159,9 +165,7 @@ def update_from_logs(manifests, *log_filenames, **kwargs):
 
     updater = ExpectedUpdater(manifests, expected_map, id_test_map,
                               ignore_existing=ignore_existing)
-    for log_filename in log_filenames:
-        with open(log_filename) as f:
-            updater.update_from_log(f)
+    updater.update_from_log_files(log_filenames, processes=processes)
 
     for manifest_expected in expected_map.itervalues():
         for tree in manifest_expected.itervalues():
@@ -223,6 +227,58 @@ def write_new_expected(metadata_path, expected_map):
                 f.write(manifest_str)
 
 
+# Actions that are read from the raw logs when updating the expectations
+update_actions = frozenset(["suite_start", "test_start", "test_status", "test_end"])
+
+
+def read_log_results(log_file):
+    """Read the test results from a raw log into compact tables.
+
+    Only the actions needed to update the expectations are decoded; lines
+    for other actions are skipped without being parsed. Repeated strings
+    are shared between rows, so the tables pickle compactly when they are
+    returned from a worker process.
+
+    :param log_file: File object containing a raw log
+    :returns: List of (run_info, rows) tuples, one for each suite in the log.
+              Each row is a (test id, subtest, status) tuple; the subtest is
+              None for the overall result of the test and the status is None
+              for the start of the test."""
+    rv = []
+    rows = None
+    strings = {}
+    intern_str = lambda value: strings.setdefault(value, value)
+
+    for line in log_file:
+        if '"test_' not in line and '"suite_start"' not in line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            continue
+        action = data.get("action")
+        if action not in update_actions:
+            continue
+        if action == "suite_start":
+            rows = []
+            rv.append((data["run_info"], rows))
+        elif rows is None:
+            continue
+        elif action == "test_start":
+            rows.append((intern_str(data["test"]), None, None))
+        elif action == "test_status":
+            rows.append((intern_str(data["test"]), intern_str(data["subtest"]),
+                         intern_str(data["status"])))
+        elif data["status"] != "SKIP":
+            rows.append((intern_str(data["test"]), None, intern_str(data["status"])))
+    return rv
+
+
+def read_log_file_results(log_filename):
+    with open(log_filename) as f:
+        return read_log_results(f)
+
+
 class ExpectedUpdater(object):
     def __init__(self, test_manifests, expected_tree, id_path_map, ignore_existing=False):
         self.test_manifests = test_manifests
@@ -230,77 +286,92 @@ class ExpectedUpdater(object):
         self.id_path_map = id_path_map
         self.ignore_existing = ignore_existing
         self.run_info = None
-        self.action_map = {"suite_start": self.suite_start,
-                           "test_start": self.test_start,
-                           "test_status": self.test_status,
-                           "test_end": self.test_end}
         self.tests_visited = {}
 
         self.test_cache = {}
 
     def update_from_log(self, log_file):
-        self.run_info = None
-        log_reader = reader.read(log_file)
-        reader.each_log(log_reader, self.action_map)
-
-    def suite_start(self, data):
-        self.run_info = data["run_info"]
-
-    def test_type(self, path):
-        for manifest in self.test_manifests.iterkeys():
-            tests = list(manifest.iterpath(path))
-            if len(tests):
-                assert all(test.item_type == tests[0].item_type for test in tests)
-                return tests[0].item_type
-        assert False
-
-    def test_start(self, data):
-        test_id = data["test"]
+        self.update_from_results(read_log_results(log_file))
+
+    def update_from_log_files(self, log_filenames, processes=None):
+        """Update the expectations from some raw log files.
+
+        The logs are parsed in a pool of processes, and the results are then
+        merged into the expectations in the order that the log files are
+        given, so the outcome is the same as updating from each log in turn.
+
+        :param log_filenames: Paths to raw logs
+        :param processes: Number of processes to use for parsing the logs,
+                          defaulting to the number of CPUs"""
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = min(processes, len(log_filenames))
+
+        if processes <= 1:
+            for log_filename in log_filenames:
+                self.update_from_results(read_log_file_results(log_filename))
+            return
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            for results in pool.imap(read_log_file_results, log_filenames):
+                self.update_from_results(results)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def update_from_results(self, results):
+        """Merge the results from a single log into the expectations.
+
+        :param results: List of (run_info, rows) tables, as returned by
+                        read_log_results"""
+        for run_info, rows in results:
+            self.run_info = run_info
+            for test_id, subtest, status in rows:
+                if status is None:
+                    self.test_start(test_id)
+                elif subtest is None:
+                    self.test_end(test_id, status)
+                else:
+                    self.test_status(test_id, subtest, status)
+
+    def test_start(self, test_id):
         try:
             test_manifest, test = self.id_path_map[test_id]
             expected_node = self.expected_tree[test_manifest][test].get_test(test_id)
         except KeyError:
             print "Test not found %s, skipping" % test_id
             return
-        self.test_cache[test_id] = expected_node
+        # The type of each test is known from the manifest item, so it doesn't
+        # have to be looked up in the manifest for every result
+        test_cls = wpttest.manifest_test_cls[test.item_type]
+        self.test_cache[test_id] = (expected_node, test_cls)
 
         if test_id not in self.tests_visited:
             if self.ignore_existing:
                 expected_node.clear_expected()
             self.tests_visited[test_id] = set()
 
-    def test_status(self, data):
-        test = self.test_cache.get(data["test"])
-        if test is None:
+    def test_status(self, test_id, subtest_name, status):
+        if test_id not in self.test_cache:
             return
-        test_cls = wpttest.manifest_test_cls[self.test_type(test.root.test_path)]
+        test, test_cls = self.test_cache[test_id]
 
-        subtest = test.get_subtest(data["subtest"])
+        subtest = test.get_subtest(subtest_name)
 
-        self.tests_visited[test.id].add(data["subtest"])
+        self.tests_visited[test_id].add(subtest_name)
 
-        result = test_cls.subtest_result_cls(
-            data["subtest"],
-            data["status"],
-            data.get("message"))
+        result = test_cls.subtest_result_cls(subtest_name, status, None)
 
         subtest.set_result(self.run_info, result)
 
-    def test_end(self, data):
-        test_id = data["test"]
-        test = self.test_cache.get(test_id)
-        if test is None:
-            return
-        test_cls = wpttest.manifest_test_cls[self.test_type(test.root.test_path)]
-
-        if data["status"] == "SKIP":
+    def test_end(self, test_id, status):
+        if test_id not in self.test_cache:
             return
+        test, test_cls = self.test_cache.pop(test_id)
 
-        result = test_cls.result_cls(
-            data["status"],
-            data.get("message"))
+        result = test_cls.result_cls(status, None)
         test.set_result(self.run_info, result)
-        del self.test_cache[test_id]
 
 
 def create_test_tree(metadata_path, test_manifest, property_order=None,
@@ -0,0 +1,120 @@
+import hashlib
+import marshal
+import os
+from StringIO import StringIO
+
+from fileutil import replace_file
+from wptmanifest import node as wptnode
+from wptmanifest.parser import parse
+
+node_classes = {cls.__name__: cls for cls in vars(wptnode).itervalues()
+                if isinstance(cls, type) and issubclass(cls, wptnode.Node)}
+
+
+def encode_ast(ast):
+    """Serialize an AST as nested (class name, data, children) tuples, which
+    marshal can store and load much faster than pickle can the nodes."""
+    return marshal.dumps(ast_to_tuple(ast))
+
+
+def decode_ast(data):
+    return tuple_to_ast(marshal.loads(data))
+
+
+def ast_to_tuple(ast):
+    return (ast.__class__.__name__, ast.data, tuple(ast_to_tuple(child) for child in ast.children))
+
+
+def tuple_to_ast(value, parent=None):
+    cls_name, data, children = value
+    cls = node_classes[cls_name]
+    # Not all the node classes share a constructor signature, and the
+    # children are already in the order that append would give
+    rv = cls.__new__(cls)
+    rv.data = data
+    rv.parent = parent
+    rv.children = [tuple_to_ast(child, rv) for child in children]
+    return rv
+
+
+class MetadataCache(object):
+    """Parsed expectation metadata files, persisted across runs.
+
+    Parsing the .ini files is the bulk of the cost of loading the metadata,
+    so the ASTs are kept on disk and only the evaluation of the conditions
+    against the run_info is done on startup.
+
+    Each entry is keyed by the path of the file and records its mtime, size
+    and sha1 hash. The mtime and size are checked first; when they have
+    changed but the contents haven't, e.g. after a checkout, the entry is
+    kept and its mtime and size are updated.
+
+    :param path: Path to the cache file
+    :param entries: Dictionary of {path: (mtime, size, hash, encoded AST)}. Each
+                    AST is kept as a marshalled string and only decoded when
+                    it's used, so loading the cache creates few objects."""
+
+    version = 1
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries if entries is not None else {}
+        self.modified = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path):
+        """Load the cache from path, returning an empty cache if the file
+        doesn't exist or has an incompatible format."""
+        try:
+            with open(path, "rb") as f:
+                data = marshal.load(f)
+        except (IOError, EOFError, ValueError, TypeError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get("version") != cls.version:
+            return cls(path)
+        return cls(path, data["entries"])
+
+    def save(self):
+        if not self.modified:
+            return
+        data = {"version": self.version,
+                "entries": self.entries}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump(data, f)
+        replace_file(tmp_path, self.path)
+        self.modified = False
+
+    def get_ast(self, path):
+        """Get the AST of the metadata file at path.
+
+        :raises IOError: if the file can't be read"""
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            if self.entries.pop(path, None) is not None:
+                self.modified = True
+            raise IOError(e.errno, e.strerror, path)
+
+        entry = self.entries.get(path)
+        if entry is not None and entry[:2] == (stat.st_mtime, stat.st_size):
+            return decode_ast(entry[3])
+
+        with open(path, "rb") as f:
+            data = f.read()
+        file_hash = hashlib.sha1(data).hexdigest()
+        if entry is not None and entry[2] == file_hash:
+            encoded = entry[3]
+            ast = decode_ast(encoded)
+        else:
+            stream = StringIO(data)
+            # Used in parse errors
+            stream.name = path
+            ast = parse(stream)
+            encoded = encode_ast(ast)
+        self.entries[path] = (stat.st_mtime, stat.st_size, file_hash, encoded)
+        self.modified = True
+        return ast
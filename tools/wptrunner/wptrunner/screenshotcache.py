@@ -0,0 +1,310 @@
+import binascii
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import struct
+import urllib
+import urlparse
+from collections import OrderedDict
+
+from fileutil import replace_file
+
+# Files that are scanned for the urls of further subresources
+scan_extensions = frozenset([".html", ".htm", ".xhtml", ".xht", ".svg", ".xml", ".css"])
+
+subresource_re = re.compile(r"""\b(?:src|href|data|poster)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))|"""
+                            r"""\burl\(\s*(?:"([^"]*)"|'([^']*)'|([^)\s"']*))\s*\)|"""
+                            r"""@import\s+(?:"([^"]*)"|'([^']*)')""",
+                            re.IGNORECASE)
+
+
+def browser_build_id(product, binary, run_info):
+    """Identifier for the build of the browser at binary, changing whenever the
+    binary is replaced or the run info, which includes the browser version and
+    configuration, changes, or None if there's no local binary."""
+    if binary is None or not os.path.exists(binary):
+        return None
+    stat = os.stat(binary)
+    return "%s %s %i %i %s" % (product, os.path.realpath(binary), stat.st_size,
+                               int(stat.st_mtime), json.dumps(run_info, sort_keys=True))
+
+
+def reference_keys(tests):
+    """Set of the (url, viewport_size, dpi) screenshot keys of all the
+    references, direct or indirect, of some reftests."""
+    rv = set()
+    for test in tests:
+        stack = [test]
+        while stack:
+            node = stack.pop()
+            for reference, _ in node.references:
+                key = (reference.url, test.viewport_size, test.dpi)
+                if key not in rv:
+                    rv.add(key)
+                    stack.append(reference)
+    return rv
+
+
+class ScreenshotHashStore(object):
+    """Screenshot hashes shared between the test runner processes, keyed by
+    (url, viewport_size, dpi).
+
+    The hashes are kept in a fixed size hash table in shared memory, so
+    lookups don't need a round trip to a manager process. Each slot holds the
+    sha1 digest of the key followed by the binary sha1 screenshot hash. A key
+    is only looked for in the max_probes slots following the one its digest
+    maps to, so lookups stay short however full the table gets; when those
+    slots are all taken new hashes are dropped, which just means that those
+    screenshots are taken again.
+
+    The store must be created before the test runner processes are started,
+    and passed to them as an argument.
+
+    :param size: Number of slots in the table"""
+
+    digest_size = 20
+    slot_size = 2 * digest_size
+    empty = b"\0" * digest_size
+    max_probes = 32
+
+    def __init__(self, size=65536):
+        self.size = size
+        self._data = multiprocessing.RawArray("c", size * self.slot_size)
+        self._lock = multiprocessing.Lock()
+
+    def _key_digest(self, key):
+        return hashlib.sha1((u"%s\n%s\n%s" % key).encode("utf8")).digest()
+
+    def _find(self, digest):
+        """Offset of the slot for digest, or of the empty slot where it
+        would be added, or None if all the slots it can use are taken."""
+        data = self._data
+        start = struct.unpack("<Q", digest[:8])[0] % self.size
+        for i in xrange(min(self.max_probes, self.size)):
+            offset = ((start + i) % self.size) * self.slot_size
+            slot_key = data[offset:offset + self.digest_size]
+            if slot_key == digest or slot_key == self.empty:
+                return offset
+        return None
+
+    def get(self, key, default=None):
+        digest = self._key_digest(key)
+        with self._lock:
+            offset = self._find(digest)
+            if offset is None or self._data[offset:offset + self.digest_size] != digest:
+                return default
+            value = self._data[offset + self.digest_size:offset + self.slot_size]
+        return binascii.hexlify(value)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        rv = self.get(key)
+        if rv is None:
+            raise KeyError(key)
+        return rv
+
+    def __setitem__(self, key, hash_value):
+        digest = self._key_digest(key)
+        value = binascii.unhexlify(hash_value)
+        with self._lock:
+            offset = self._find(digest)
+            if offset is not None:
+                self._data[offset:offset + self.slot_size] = digest + value
+
+    def update(self, values):
+        for key, hash_value in values.iteritems():
+            self[key] = hash_value
+
+
+class ScreenshotLRU(object):
+    """Most recently used screenshots, kept by a single process so that
+    screenshots aren't copied between processes.
+
+    :param max_size: Maximum number of screenshots to keep"""
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key):
+        screenshot = self._data.pop(key, None)
+        if screenshot is not None:
+            self._data[key] = screenshot
+        return screenshot
+
+    def __setitem__(self, key, screenshot):
+        self._data.pop(key, None)
+        self._data[key] = screenshot
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+
+def iter_subresources(data):
+    for match in subresource_re.finditer(data):
+        value = next(item for item in match.groups() if item is not None).strip()
+        if value and not value.startswith("#"):
+            yield value
+
+
+class ScreenshotHashCache(object):
+    """Hashes of reftest screenshots from previous runs, persisted across runs.
+
+    Each entry is keyed by (url, viewport_size, dpi), like the screenshot cache
+    used within a run, and records a key for the source of the page; the hash
+    of the file and of all the local subresources it loads (found by scanning
+    the markup and CSS for urls), as recorded in the manifest. Entries are
+    only used while the source key is unchanged, and the whole cache is
+    discarded when the browser build changes.
+
+    Pages that depend on the server, i.e. python handlers, files using the
+    sub pipe, or urls with a pipe query, are never cached.
+
+    :param path: Path to the cache file
+    :param build_id: Identifier of the browser build
+    :param test_manifests: Dictionary of {manifest: {"url_base", "tests_path", ...}},
+                           as returned by ManifestLoader.load"""
+
+    version = 1
+
+    def __init__(self, path, build_id, test_manifests, entries=None):
+        self.path = path
+        self.build_id = build_id
+        self.url_bases = sorted(((paths["url_base"], manifest, paths["tests_path"])
+                                 for manifest, paths in test_manifests.iteritems()),
+                                key=lambda x: -len(x[0]))
+        self.entries = entries if entries is not None else {}
+        self._source_keys = {}
+        self._resources = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path, build_id, test_manifests):
+        """Load the cache from path, returning an empty cache if the file
+        doesn't exist, has an incompatible format or is for a different
+        browser build."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return cls(path, build_id, test_manifests)
+        if data.get("version") != cls.version or data.get("build") != build_id:
+            return cls(path, build_id, test_manifests)
+        entries = {(url, viewport_size, dpi): (source_key, hash_value)
+                   for url, viewport_size, dpi, source_key, hash_value in data["entries"]}
+        return cls(path, build_id, test_manifests, entries)
+
+    def save(self):
+        data = {"version": self.version,
+                "build": self.build_id,
+                "entries": sorted(list(key) + list(value)
+                                  for key, value in self.entries.iteritems())}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=0)
+        replace_file(tmp_path, self.path)
+
+    def populate(self, screenshot_cache, keys):
+        """Add the screenshot hashes that are still valid to the screenshot
+        hash store used by the executors.
+
+        :param screenshot_cache: ScreenshotHashStore to add the hashes to
+        :param keys: Set of (url, viewport_size, dpi) keys to add hashes for
+        :returns: The number of hashes added"""
+        valid = {}
+        for key, (source_key, hash_value) in self.entries.iteritems():
+            if key in keys and self.source_key(key[0]) == source_key:
+                valid[key] = hash_value
+        screenshot_cache.update(valid)
+        return len(valid)
+
+    def update(self, screenshot_cache, keys):
+        """Record the hashes of the screenshots with the given keys taken in
+        a run.
+
+        :returns: The number of hashes recorded"""
+        count = 0
+        for key in keys:
+            hash_value = screenshot_cache.get(key)
+            if hash_value is None:
+                continue
+            source_key = self.source_key(key[0])
+            if source_key is not None:
+                self.entries[key] = (source_key, hash_value)
+                count += 1
+        return count
+
+    def source_key(self, url):
+        """Hash of the source files of the page at url, or None if the
+        rendering of the page can't be cached."""
+        if url not in self._source_keys:
+            self._source_keys[url] = self._get_source_key(url)
+        return self._source_keys[url]
+
+    def _get_source_key(self, url):
+        hashes = {}
+        stack = [url]
+        while stack:
+            resource_url = stack.pop()
+            if resource_url in hashes:
+                continue
+            if resource_url not in self._resources:
+                self._resources[resource_url] = self._load_resource(resource_url)
+            resource = self._resources[resource_url]
+            if resource is None:
+                return None
+            hashes[resource_url], subresources = resource
+            stack.extend(subresources)
+        data = u"\n".join(u"%s %s" % item for item in sorted(hashes.iteritems()))
+        return hashlib.sha1(data.encode("utf8")).hexdigest()
+
+    def _load_resource(self, url):
+        """Get a (hash, [subresource url]) tuple for the resource at url, or
+        None if the response depends on the server."""
+        parts = urlparse.urlsplit(url)
+        if "pipe=" in parts.query:
+            return None
+        path = urllib.unquote(parts.path)
+        name = path.rsplit("/", 1)[-1]
+        if name.endswith(".py") or ".sub." in name:
+            return None
+
+        for url_base, manifest, tests_path in self.url_bases:
+            if path.startswith(url_base):
+                break
+        else:
+            return None
+        rel_path = path[len(url_base):].replace("/", os.path.sep)
+
+        file_hash = manifest.path_hash(rel_path)
+        if file_hash is None:
+            # The response is a 404 (or a directory listing) until a file is
+            # added, which changes the hash
+            return "missing", []
+
+        # Headers files can change the way the file is rendered
+        dir_headers = os.path.join(os.path.dirname(rel_path), "__dir__.headers")
+        hashes = [file_hash] + [manifest.path_hash(item)
+                                for item in [rel_path + ".headers", dir_headers]]
+        file_hash = " ".join(item for item in hashes if item is not None)
+
+        subresources = []
+        if os.path.splitext(rel_path)[1] in scan_extensions:
+            try:
+                with open(os.path.join(tests_path, rel_path), "rb") as f:
+                    data = f.read().decode("utf8", "replace")
+            except IOError:
+                return None
+            for value in iter_subresources(data):
+                resource_parts = urlparse.urlsplit(urlparse.urljoin(path, value))
+                if resource_parts.scheme or resource_parts.netloc:
+                    # Resources from elsewhere aren't part of the tests
+                    continue
+                subresources.append(urlparse.urlunsplit(("", "", resource_parts.path,
+                                                         resource_parts.query, "")))
+        return file_hash, subresources
@@ -1,14 +1,13 @@
 import copy
 import functools
 import imp
-import io
 import os
+import threading
 from collections import OrderedDict, defaultdict
 from datetime import datetime
 
 from mozlog import reader
-from mozlog.formatters import JSONFormatter
-from mozlog.handlers import BaseHandler, StreamHandler, LogLevelFilter
+from mozlog.handlers import BaseHandler, LogLevelFilter
 
 here = os.path.dirname(__file__)
 localpaths = imp.load_source("localpaths", os.path.abspath(os.path.join(here, os.pardir, os.pardir, "localpaths.py")))
@@ -41,10 +40,24 @@ class LogHandler(reader.LogHandler):
 
     """Handle updating test and subtest status in log.
 
-    Subclasses reader.LogHandler.
+    Subclasses reader.LogHandler. The handler can be added to a logger, so
+    that the results are collected as the tests run rather than read back
+    from a log afterwards.
+
+    :param on_inconsistent: Function called the first time a test or subtest
+                            gets a different status to a previous run. It's
+                            called while the logger is locked, so it must not
+                            log anything itself.
+
+    .. attribute:: diverged
+
+       (test name, subtest name) tuple for the first test or subtest that got
+       different statuses, or None if there's no such test yet.
     """
-    def __init__(self):
+    def __init__(self, on_inconsistent=None):
         self.results = OrderedDict()
+        self.on_inconsistent = on_inconsistent
+        self.diverged = None
 
     def find_or_create_test(self, data):
         test_name = data["test"]
@@ -78,10 +91,19 @@ class LogHandler(reader.LogHandler):
         subtest["status"][data["status"]] += 1
         if data.get("message"):
             subtest["messages"].add(data["message"])
+        self.check_diverged(data["test"], data["subtest"], subtest["status"])
 
     def test_end(self, data):
         test = self.find_or_create_test(data)
         test["status"][data["status"]] += 1
+        self.check_diverged(data["test"], None, test["status"])
+
+    def check_diverged(self, test_name, subtest_name, results_dict):
+        if self.diverged or len(results_dict) < 2 or "SKIP" in results_dict:
+            return
+        self.diverged = (test_name, subtest_name)
+        if self.on_inconsistent is not None:
+            self.on_inconsistent()
 
 
 def is_inconsistent(results_dict, iterations):
@@ -93,17 +115,30 @@ def is_inconsistent(results_dict, iterations):
 
 def process_results(log, iterations):
     """Process test log and return overall results and list of inconsistent tests."""
-    inconsistent = []
     handler = LogHandler()
     reader.handle_log(reader.read(log), handler)
     results = handler.results
+    return results, find_inconsistent(results, iterations)
+
+
+def find_inconsistent(results, iterations, complete=True):
+    """Return the list of inconsistent tests in some results.
+
+    If complete is False the iterations were stopped early, so tests that
+    are only missing results aren't reported as inconsistent."""
+    def check(results_dict):
+        if complete:
+            return is_inconsistent(results_dict, iterations)
+        return len(results_dict) > 1 and "SKIP" not in results_dict
+
+    inconsistent = []
     for test_name, test in results.iteritems():
-        if is_inconsistent(test["status"], iterations):
+        if check(test["status"]):
             inconsistent.append((test_name, None, test["status"], []))
         for subtest_name, subtest in test["subtests"].iteritems():
-            if is_inconsistent(subtest["status"], iterations):
+            if check(subtest["status"]):
                 inconsistent.append((test_name, subtest_name, subtest["status"], subtest["messages"]))
-    return results, inconsistent
+    return inconsistent
 
 
 def err_string(results_dict, iterations):
@@ -190,10 +225,12 @@ def run_step(logger, iterations, restart_after_iteration, kwargs_extras, **kwarg
     logger._state.handlers = [wrap_handler(handler)
                               for handler in initial_handlers]
 
-    log = io.BytesIO()
-    # Setup logging for wptrunner that keeps process output and
-    # warning+ level logs only
-    logger.add_handler(StreamHandler(log, JSONFormatter()))
+    # Collect the results as they are logged, and stop the remaining
+    # iterations as soon as any test gives different results
+    stop_flag = threading.Event()
+    handler = LogHandler(on_inconsistent=stop_flag.set)
+    logger.add_handler(handler)
+    kwargs["stop_flag"] = stop_flag
 
     wptrunner.run_tests(**kwargs)
 
@@ -201,8 +238,13 @@ def run_step(logger, iterations, restart_after_iteration, kwargs_extras, **kwarg
     logger._state.running_tests = set()
     logger._state.suite_started = False
 
-    log.seek(0)
-    results, inconsistent = process_results(log, iterations)
+    if handler.diverged is not None:
+        test_name, subtest_name = handler.diverged
+        logger.info("Stopped early after inconsistent results for %s%s" %
+                    (test_name, " | %s" % subtest_name if subtest_name else ""))
+
+    results = handler.results
+    inconsistent = find_inconsistent(results, iterations, complete=handler.diverged is None)
     return results, inconsistent, iterations
 
 
@@ -1,6 +1,7 @@
 import hashlib
 import json
 import os
+import threading
 import urlparse
 from abc import ABCMeta, abstractmethod
 from Queue import Empty
@@ -27,9 +28,10 @@ def do_delayed_imports():
 
 
 class TestChunker(object):
-    def __init__(self, total_chunks, chunk_number):
+    def __init__(self, total_chunks, chunk_number, timings=None):
         self.total_chunks = total_chunks
         self.chunk_number = chunk_number
+        self.timings = timings
         assert self.chunk_number <= self.total_chunks
         self.logger = structured.get_default_logger()
         assert self.logger
@@ -97,14 +99,20 @@ class EqualTimeChunker(TestChunker):
                 by_dir[test_dir] = PathData(test_dir)
 
             data = by_dir[test_dir]
-            time = sum(test.default_timeout if test.timeout !=
-                       "long" else test.long_timeout for test in tests)
+            time = sum(self._test_time(test) for test in tests)
             data.time += time
             total_time += time
             data.tests.append((test_type, test_path, tests))
 
         return by_dir, total_time
 
+    def _test_time(self, test):
+        """Estimated runtime of a single test, from the timing data if any
+        is available, otherwise from the test timeout."""
+        if self.timings:
+            return self.timings.estimate(test.id)
+        return test.default_timeout if test.timeout != "long" else test.long_timeout
+
     def _maybe_remove(self, chunks, i, direction):
         """Trial removing a chunk from one chunk to an adjacent one.
 
@@ -461,7 +469,9 @@ class TestLoader(object):
                  total_chunks=1,
                  chunk_number=1,
                  include_https=True,
-                 skip_timeout=False):
+                 skip_timeout=False,
+                 timings=None,
+                 metadata_cache=None):
 
         self.test_types = test_types
         self.run_info = run_info
@@ -474,6 +484,8 @@ class TestLoader(object):
         self.disabled_tests = None
         self.include_https = include_https
         self.skip_timeout = skip_timeout
+        self.timings = timings
+        self.metadata_cache = metadata_cache
 
         self.chunk_type = chunk_type
         self.total_chunks = total_chunks
@@ -483,7 +495,8 @@ class TestLoader(object):
                         "hash": HashChunker,
                         "dir_hash": DirectoryHashChunker,
                         "equal_time": EqualTimeChunker}[chunk_type](total_chunks,
-                                                                    chunk_number)
+                                                                    chunk_number,
+                                                                    timings=timings)
 
         self._test_ids = None
 
@@ -513,8 +526,8 @@ class TestLoader(object):
         for i in xrange(1,len(path_parts) + 1):
             path = os.path.join(metadata_path, os.path.sep.join(path_parts[:i]), "__dir__.ini")
             if path not in self.directory_manifests:
-                self.directory_manifests[path] = manifestexpected.get_dir_manifest(path,
-                                                                                   self.run_info)
+                self.directory_manifests[path] = manifestexpected.get_dir_manifest(
+                    path, self.run_info, metadata_cache=self.metadata_cache)
             manifest = self.directory_manifests[path]
             if manifest is not None:
                 rv.append(manifest)
@@ -523,7 +536,8 @@ class TestLoader(object):
     def load_metadata(self, test_manifest, metadata_path, test_path):
         inherit_metadata = self.load_dir_metadata(test_manifest, metadata_path, test_path)
         test_metadata = manifestexpected.get_manifest(
-            metadata_path, test_path, test_manifest.url_base, self.run_info)
+            metadata_path, test_path, test_manifest.url_base, self.run_info,
+            metadata_cache=self.metadata_cache)
         return inherit_metadata, test_metadata
 
     def iter_tests(self):
@@ -613,36 +627,146 @@ class GroupedSource(TestSource):
         state = {}
 
         for test in tests:
-            if cls.new_group(state, test, **kwargs):
+            # Tests of different types are never in the same group, since they
+            # need a different executor
+            if (cls.new_group(state, test, **kwargs) or
+                test.test_type != state.get("prev_test_type")):
                 groups.append((deque(), {}))
+            state["prev_test_type"] = test.test_type
 
             group, metadata = groups[-1]
             group.append(test)
             test.update_metadata(metadata)
 
+        timings = kwargs.get("timings")
+        if timings:
+            # Start the longest groups first, so that they don't run on their
+            # own at the end
+            groups.sort(key=lambda item: -sum(timings.estimate(test.id) for test in item[0]))
+
         for item in groups:
             test_queue.put(item)
         return test_queue
 
 
+class SharedTestQueue(object):
+    """Queue of tests shared between the TestRunnerManagers in a ManagerGroup.
+
+    Each manager has its own deque of tests, created by add_group. When
+    that is empty, fill moves the next batch of tests from the shared
+    queue into it. Once the shared queue is exhausted, idle managers steal
+    half of the tests remaining at the back of the busiest manager's deque,
+    so that one manager with a run of slow tests doesn't hold up the end of
+    the run while the others are idle.
+
+    Tests of different types are queued separately, and each batch contains
+    tests of a single type. Managers keep taking tests of the type they
+    last ran for as long as there are any, since switching type means
+    restarting the browser.
+
+    This relies on the managers being threads in a single process."""
+
+    def __init__(self, tests, metadata, batch_size):
+        self._lock = threading.Lock()
+        self._tests = OrderedDict()
+        for test in tests:
+            if test.test_type not in self._tests:
+                self._tests[test.test_type] = deque()
+            self._tests[test.test_type].append(test)
+        self._groups = []
+        self.metadata = metadata
+        self.batch_size = batch_size
+
+    def empty(self):
+        with self._lock:
+            return not self._tests and not any(self._groups)
+
+    def add_group(self):
+        group = deque()
+        with self._lock:
+            self._groups.append(group)
+        return group
+
+    @staticmethod
+    def _last_type(group):
+        try:
+            return group[-1].test_type
+        except IndexError:
+            return None
+
+    def fill(self, group, test_type=None):
+        """Add tests to an empty group, either from the shared queue or by
+        stealing them from another group.
+
+        :param test_type: The type of test to prefer.
+        :returns: The type of the tests added, or None if there are no tests
+                  left to run."""
+        with self._lock:
+            if self._tests:
+                if test_type not in self._tests:
+                    test_type = next(iter(self._tests))
+                tests = self._tests[test_type]
+                while tests and len(group) < self.batch_size:
+                    group.append(tests.popleft())
+                if not tests:
+                    del self._tests[test_type]
+                return test_type
+
+            # Prefer stealing tests that don't require a restart
+            victims = [item for item in self._groups
+                       if test_type is not None and self._last_type(item) == test_type]
+            if not victims:
+                victims = self._groups
+            victim = max(victims, key=len)
+            stolen = []
+            # The owner of the victim group takes tests from the front without
+            # the lock, so it may get the last test first
+            for _ in xrange((len(victim) + 1) // 2):
+                try:
+                    stolen.append(victim.pop())
+                except IndexError:
+                    break
+            if not stolen:
+                return None
+            group.extend(reversed(stolen))
+            return stolen[0].test_type
+
+
 class SingleTestSource(TestSource):
+    """Source in which all the tests run by a manager belong to a single group,
+    with tests assigned to managers on demand from a SharedTestQueue.
+
+    The group metadata is computed over all the tests, since any of them may
+    end up being run by any manager."""
+
+    batch_size = 5
+
+    def __init__(self, test_queue):
+        TestSource.__init__(self, test_queue)
+        self.current_group = test_queue.add_group()
+        self.current_metadata = test_queue.metadata
+        self.current_type = None
+
     @classmethod
     def make_queue(cls, tests, **kwargs):
-        test_queue = Queue()
-        processes = kwargs["processes"]
-        queues = [deque([]) for _ in xrange(processes)]
-        metadatas = [{} for _ in xrange(processes)]
+        tests = list(tests)
+        timings = kwargs.get("timings")
+        if timings:
+            # Start the longest tests first, so that they don't run on their
+            # own at the end
+            tests.sort(key=lambda test: -timings.estimate(test.id))
+        metadata = {}
         for test in tests:
-            idx = hash(test.id) % processes
-            group = queues[idx]
-            metadata = metadatas[idx]
-            group.append(test)
             test.update_metadata(metadata)
+        return SharedTestQueue(tests, metadata, kwargs.get("batch_size", cls.batch_size))
 
-        for item in zip(queues, metadatas):
-            test_queue.put(item)
-
-        return test_queue
+    def group(self):
+        if len(self.current_group) == 0:
+            test_type = self.test_queue.fill(self.current_group, self.current_type)
+            if test_type is None:
+                return None, None
+            self.current_type = test_type
+        return self.current_group, self.current_metadata
 
 
 class PathGroupedSource(GroupedSource):
@@ -5,7 +5,7 @@ import sys
 import threading
 import traceback
 from Queue import Empty
-from collections import namedtuple
+from collections import deque, namedtuple
 from multiprocessing import Process, current_process, Queue
 
 from mozlog import structuredlog
@@ -83,6 +83,7 @@ class TestRunner(object):
         the associated methods"""
         self.setup()
         commands = {"run_test": self.run_test,
+                    "run_tests": self.run_tests,
                     "stop": self.stop,
                     "wait": self.wait}
         while True:
@@ -107,6 +108,13 @@ class TestRunner(object):
             self.logger.critical(traceback.format_exc())
             raise
 
+    def run_tests(self, tests):
+        try:
+            return self.executor.run_tests(tests)
+        except Exception:
+            self.logger.critical(traceback.format_exc())
+            raise
+
     def wait(self):
         self.executor.protocol.wait()
         self.send_message("wait_finished")
@@ -247,10 +255,17 @@ class _RunnerManagerState(object):
 RunnerManagerState = _RunnerManagerState()
 
 
+# The classes and arguments used to run tests of a single type
+TestImplementation = namedtuple("TestImplementation",
+                                ["executor_cls", "executor_kwargs",
+                                 "browser_cls", "browser_kwargs"])
+
+
 class TestRunnerManager(threading.Thread):
-    def __init__(self, suite_name, test_queue, test_source_cls, browser_cls, browser_kwargs,
-                 executor_cls, executor_kwargs, stop_flag, rerun=1, pause_after_test=False,
-                 pause_on_unexpected=False, restart_on_unexpected=True, debug_info=None):
+    def __init__(self, suite_name, test_queue, test_source_cls, test_implementations,
+                 stop_flag, rerun=1, pause_after_test=False,
+                 pause_on_unexpected=False, restart_on_unexpected=True, debug_info=None,
+                 batch_size=1):
         """Thread that owns a single TestRunner process and any processes required
         by the TestRunner (e.g. the Firefox binary).
 
@@ -265,16 +280,25 @@ class TestRunnerManager(threading.Thread):
         * Log the test results
         * Take any remedial action required e.g. restart crashed or hung
           processes
+
+        :param test_implementations: Dictionary of {test_type: TestImplementation}
+                                     for the types of test in the queue. When the
+                                     type of the next test differs from that of the
+                                     previous test, the runner is restarted with the
+                                     executor for the new type.
+        :param batch_size: Maximum number of tests to send to the TestRunner at
+                           once, for executors that support running tests in
+                           batches.
         """
         self.suite_name = suite_name
 
         self.test_source = test_source_cls(test_queue)
 
-        self.browser_cls = browser_cls
-        self.browser_kwargs = browser_kwargs
+        self.test_implementations = test_implementations
+        self.test_type = None
 
-        self.executor_cls = executor_cls
-        self.executor_kwargs = executor_kwargs
+        self.executor_cls = None
+        self.executor_kwargs = None
 
         # Flags used to shut down this thread if we get a sigint
         self.parent_stop_flag = stop_flag
@@ -286,6 +310,10 @@ class TestRunnerManager(threading.Thread):
         self.pause_on_unexpected = pause_on_unexpected
         self.restart_on_unexpected = restart_on_unexpected
         self.debug_info = debug_info
+        self.batch_size = batch_size
+        # Tests of the current batch that haven't ended yet; the first is
+        # the test that is running
+        self.batch = deque()
 
         self.manager_number = next_manager_number()
 
@@ -316,55 +344,76 @@ class TestRunnerManager(threading.Thread):
         that the manager should shut down the next time the event loop
         spins."""
         self.logger = structuredlog.StructuredLogger(self.suite_name)
-        with self.browser_cls(self.logger, **self.browser_kwargs) as browser:
-            self.browser = BrowserManager(self.logger,
-                                          browser,
-                                          self.command_queue,
-                                          no_timeout=self.debug_info is not None)
-            dispatch = {
-                RunnerManagerState.before_init: self.start_init,
-                RunnerManagerState.initializing: self.init,
-                RunnerManagerState.running: self.run_test,
-                RunnerManagerState.restarting: self.restart_runner
-            }
+        dispatch = {
+            RunnerManagerState.before_init: self.start_init,
+            RunnerManagerState.initializing: self.init,
+            RunnerManagerState.running: self.run_test,
+            RunnerManagerState.restarting: self.restart_runner
+        }
 
-            self.state = RunnerManagerState.before_init()
-            end_states = (RunnerManagerState.stop,
-                          RunnerManagerState.error)
+        self.state = RunnerManagerState.before_init()
+        end_states = (RunnerManagerState.stop,
+                      RunnerManagerState.error)
 
-            try:
-                while not isinstance(self.state, end_states):
-                    f = dispatch.get(self.state.__class__)
-                    while f:
-                        self.logger.debug("Dispatch %s" % f.__name__)
-                        if self.should_stop():
-                            return
-                        new_state = f()
-                        if new_state is None:
-                            break
-                        self.state = new_state
-                        self.logger.debug("new state: %s" % self.state.__class__.__name__)
-                        if isinstance(self.state, end_states):
-                            return
-                        f = dispatch.get(self.state.__class__)
-
-                    new_state = None
-                    while new_state is None:
-                        new_state = self.wait_event()
-                        if self.should_stop():
-                            return
+        try:
+            while not isinstance(self.state, end_states):
+                f = dispatch.get(self.state.__class__)
+                while f:
+                    self.logger.debug("Dispatch %s" % f.__name__)
+                    if self.should_stop():
+                        return
+                    new_state = f()
+                    if new_state is None:
+                        break
                     self.state = new_state
                     self.logger.debug("new state: %s" % self.state.__class__.__name__)
-            except Exception as e:
-                self.logger.error(traceback.format_exc(e))
-                raise
-            finally:
-                self.logger.debug("TestRunnerManager main loop terminating, starting cleanup")
-                clean = isinstance(self.state, RunnerManagerState.stop)
-                self.stop_runner(force=not clean)
-                self.teardown()
+                    if isinstance(self.state, end_states):
+                        return
+                    f = dispatch.get(self.state.__class__)
+
+                new_state = None
+                while new_state is None:
+                    new_state = self.wait_event()
+                    if self.should_stop():
+                        return
+                self.state = new_state
+                self.logger.debug("new state: %s" % self.state.__class__.__name__)
+        except Exception as e:
+            self.logger.error(traceback.format_exc(e))
+            raise
+        finally:
+            self.logger.debug("TestRunnerManager main loop terminating, starting cleanup")
+            clean = isinstance(self.state, RunnerManagerState.stop)
+            self.stop_runner(force=not clean)
+            self.teardown()
+            if self.browser is not None:
+                self.browser.cleanup()
         self.logger.debug("TestRunnerManager main loop terminated")
 
+    def set_test_type(self, test_type):
+        """Use the executor and browser for tests of type test_type.
+
+        The existing browser is kept if the new type uses the same browser
+        class and arguments; otherwise it is cleaned up and a new one set
+        up. The browser process must already have been stopped."""
+        implementation = self.test_implementations[test_type]
+        current = self.test_implementations.get(self.test_type)
+        if (self.browser is None or
+            current.browser_cls != implementation.browser_cls or
+            current.browser_kwargs != implementation.browser_kwargs):
+            if self.browser is not None:
+                self.browser.cleanup()
+            browser = implementation.browser_cls(self.logger, **implementation.browser_kwargs)
+            browser.setup()
+            self.browser = BrowserManager(self.logger,
+                                          browser,
+                                          self.command_queue,
+                                          no_timeout=self.debug_info is not None)
+
+        self.executor_cls = implementation.executor_cls
+        self.executor_kwargs = implementation.executor_kwargs
+        self.test_type = test_type
+
     def wait_event(self):
         dispatch = {
             RunnerManagerState.before_init: {},
@@ -375,7 +424,9 @@ class TestRunnerManager(threading.Thread):
             },
             RunnerManagerState.running:
             {
+                "test_started": self.test_started,
                 "test_ended": self.test_ended,
+                "batch_ended": self.batch_ended,
                 "wait_finished": self.wait_finished,
             },
             RunnerManagerState.restarting: {},
@@ -442,6 +493,9 @@ class TestRunnerManager(threading.Thread):
             self.logger.error("Max restarts exceeded")
             return RunnerManagerState.error()
 
+        if self.state.test.test_type != self.test_type:
+            self.set_test_type(self.state.test.test_type)
+
         self.browser.update_settings(self.state.test)
 
         result = self.browser.init()
@@ -504,7 +558,11 @@ class TestRunnerManager(threading.Thread):
                 if test_group is None:
                     self.logger.info("No more tests")
                     return None, None, None
-            test = test_group.popleft()
+            try:
+                test = test_group.popleft()
+            except IndexError:
+                # Another manager took the remaining tests in the group
+                continue
         self.run_count = 0
         return test, test_group, group_metadata
 
@@ -512,18 +570,87 @@ class TestRunnerManager(threading.Thread):
         assert isinstance(self.state, RunnerManagerState.running)
         assert self.state.test is not None
 
+        if self.batch:
+            # The test is part of a batch that the runner is already running
+            return
+
         if self.browser.update_settings(self.state.test):
             self.logger.info("Restarting browser for new test environment")
             return RunnerManagerState.restarting(self.state.test,
                                                  self.state.test_group,
                                                  self.state.group_metadata)
 
+        batch = self.get_batch()
+        if len(batch) > 1:
+            self.batch.extend(batch)
+            self.run_count = 1
+            self.send_message("run_tests", batch)
+            return
+
         self.logger.test_start(self.state.test.id)
         if self.rerun > 1:
             self.logger.info("Run %d/%d" % (self.run_count, self.rerun))
         self.run_count += 1
         self.send_message("run_test", self.state.test)
 
+    def can_batch(self, test):
+        return (self.executor_cls.can_batch(test) and
+                not test.restart_after and
+                test.expected() != "CRASH")
+
+    def get_batch(self):
+        """Get a list of tests to run in a single batch, starting with the
+        current test and followed by the next tests in the group that can run
+        in the same browser without a restart."""
+        test = self.state.test
+        batch = [test]
+        if (self.batch_size < 2 or self.rerun > 1 or self.pause_after_test or
+            self.pause_on_unexpected or self.debug_info is not None or
+            not self.can_batch(test)):
+            return batch
+
+        test_group = self.state.test_group
+        browser_settings = self.browser.browser_settings
+        while len(batch) < self.batch_size:
+            if not test_group and self.test_source.group()[0] is not test_group:
+                # The source doesn't add more tests to this group
+                break
+            try:
+                next_test = test_group.popleft()
+            except IndexError:
+                break
+            if (next_test.test_type != test.test_type or
+                next_test.environment != test.environment or
+                self.browser.browser.settings(next_test) != browser_settings or
+                not self.can_batch(next_test)):
+                test_group.appendleft(next_test)
+                break
+            batch.append(next_test)
+        return batch
+
+    def test_started(self, test):
+        assert isinstance(self.state, RunnerManagerState.running)
+        assert test == self.state.test
+        self.logger.test_start(test.id)
+
+    def batch_ended(self, count):
+        """Handle the runner stopping a batch before all its tests ran."""
+        assert isinstance(self.state, RunnerManagerState.running)
+        if not self.batch:
+            return
+        # The current test didn't start, so the rest of the batch goes back
+        # to the group, and a new batch is started from the current test
+        self.return_batch(skip=1)
+        return RunnerManagerState.running(self.state.test,
+                                          self.state.test_group,
+                                          self.state.group_metadata)
+
+    def return_batch(self, skip=0):
+        """Put the tests of the current batch back at the start of the test
+        group"""
+        self.state.test_group.extendleft(reversed(list(self.batch)[skip:]))
+        self.batch.clear()
+
     def test_ended(self, test, results):
         """Handle the end of a test.
 
@@ -597,6 +724,15 @@ class TestRunnerManager(threading.Thread):
 
     def after_test_end(self, test, restart):
         assert isinstance(self.state, RunnerManagerState.running)
+        if self.batch:
+            ended = self.batch.popleft()
+            assert ended == test
+            if self.batch:
+                if not restart:
+                    return RunnerManagerState.running(self.batch[0],
+                                                      self.state.test_group,
+                                                      self.state.group_metadata)
+                self.return_batch()
         if self.run_count == self.rerun:
             test, test_group, group_metadata = self.get_next_test()
             if test is None:
@@ -604,6 +740,9 @@ class TestRunnerManager(threading.Thread):
             if test_group != self.state.test_group:
                 # We are starting a new group of tests, so force a restart
                 restart = True
+            elif test.test_type != self.state.test.test_type:
+                # The runner has to be restarted with a different executor
+                restart = True
         else:
             test = test
             test_group = self.state.test_group
@@ -676,9 +815,12 @@ class TestRunnerManager(threading.Thread):
             self.browser.cleanup()
         while True:
             try:
-                self.logger.warning(" ".join(map(repr, self.command_queue.get_nowait())))
+                message = self.command_queue.get_nowait()
             except Empty:
                 break
+            # The runner ends a batch early whenever a test needs a restart
+            if message[0] != "batch_ended":
+                self.logger.warning(" ".join(map(repr, message)))
 
 
 def make_test_queue(tests, test_source_cls, **test_source_kwargs):
@@ -687,53 +829,65 @@ def make_test_queue(tests, test_source_cls, **test_source_kwargs):
     # There is a race condition that means sometimes we continue
     # before the tests have been written to the underlying pipe.
     # Polling the pipe for data here avoids that
-    queue._reader.poll(10)
+    if hasattr(queue, "_reader"):
+        queue._reader.poll(10)
     assert not queue.empty()
     return queue
 
 
 class ManagerGroup(object):
     def __init__(self, suite_name, size, test_source_cls, test_source_kwargs,
-                 browser_cls, browser_kwargs,
-                 executor_cls, executor_kwargs,
+                 test_implementations,
                  rerun=1,
                  pause_after_test=False,
                  pause_on_unexpected=False,
                  restart_on_unexpected=True,
-                 debug_info=None):
-        """Main thread object that owns all the TestManager threads."""
+                 debug_info=None,
+                 batch_size=1,
+                 stop_flag=None):
+        """Main thread object that owns all the TestManager threads.
+
+        :param test_implementations: Dictionary of {test_type: TestImplementation}
+                                     for the test types that may be run.
+        :param batch_size: Maximum number of tests each TestRunner runs at once
+        :param stop_flag: Optional threading.Event that stops the managers when
+                          it's set, so other threads can end the run early"""
         self.suite_name = suite_name
         self.size = size
         self.test_source_cls = test_source_cls
         self.test_source_kwargs = test_source_kwargs
-        self.browser_cls = browser_cls
-        self.browser_kwargs = browser_kwargs
-        self.executor_cls = executor_cls
-        self.executor_kwargs = executor_kwargs
+        self.test_implementations = test_implementations
         self.pause_after_test = pause_after_test
         self.pause_on_unexpected = pause_on_unexpected
         self.restart_on_unexpected = restart_on_unexpected
         self.debug_info = debug_info
         self.rerun = rerun
+        self.batch_size = batch_size
 
         self.pool = set()
         # Event that is polled by threads so that they can gracefully exit in the face
         # of sigint
-        self.stop_flag = threading.Event()
+        self.stop_flag = stop_flag if stop_flag is not None else threading.Event()
         self.logger = structuredlog.StructuredLogger(suite_name)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.stop()
-
-    def run(self, test_type, tests):
-        """Start all managers in the group"""
+        # The stop flag may be shared with later groups, so it's only set if
+        # the managers haven't finished
+        if self.is_alive():
+            self.stop()
+
+    def run(self, test_types, tests):
+        """Start all managers in the group, running the tests of all the
+        types in test_types from a single queue"""
         self.logger.debug("Using %i processes" % self.size)
-        type_tests = tests[test_type]
+        type_tests = []
+        for test_type in test_types:
+            type_tests.extend(tests[test_type])
         if not type_tests:
-            self.logger.info("No %s tests to run" % test_type)
+            self.logger.info("No %s tests to run" % ", ".join(test_types))
             return
 
         test_queue = make_test_queue(type_tests, self.test_source_cls, **self.test_source_kwargs)
@@ -742,16 +896,14 @@ class ManagerGroup(object):
             manager = TestRunnerManager(self.suite_name,
                                         test_queue,
                                         self.test_source_cls,
-                                        self.browser_cls,
-                                        self.browser_kwargs,
-                                        self.executor_cls,
-                                        self.executor_kwargs,
+                                        self.test_implementations,
                                         self.stop_flag,
                                         self.rerun,
                                         self.pause_after_test,
                                         self.pause_on_unexpected,
                                         self.restart_on_unexpected,
-                                        self.debug_info)
+                                        self.debug_info,
+                                        self.batch_size)
             manager.start()
             self.pool.add(manager)
         self.wait()
@@ -8,6 +8,7 @@ import pytest
 sys.path.insert(0, join(dirname(__file__), "..", ".."))
 
 from wptrunner.testloader import EqualTimeChunker
+from wptrunner.timings import TimingData
 
 structured.set_default_logger(structured.structuredlog.StructuredLogger("TestChunker"))
 
@@ -24,9 +25,10 @@ def make_mock_manifest(*items):
     rv = []
     for test_type, dir_path, num_tests in items:
         for i in range(num_tests):
+            test_path = dir_path + "/%i.test" % i
             rv.append((test_type,
-                       dir_path + "/%i.test" % i,
-                       set([MockTest(i)])))
+                       test_path,
+                       set([MockTest(test_path)])))
     return rv
 
 
@@ -80,6 +82,23 @@ class TestEqualTimeChunker(unittest.TestCase):
         self.assertEquals(tests[1:101], chunk_2)
         self.assertEquals(tests[101:102], chunk_3)
 
+    def test_timings(self):
+        tests = make_mock_manifest(("test", "a", 10), ("test", "b", 10),
+                                   ("test", "c", 10))
+        # Tests in c take as long as all the others put together
+        timings = TimingData({"c/%i.test" % i: 2.0 for i in range(10)})
+        timings.durations.update({"%s/%i.test" % (dir_path, i): 0.5
+                                  for dir_path in "ab" for i in range(10)})
+
+        chunk_1 = list(EqualTimeChunker(2, 1, timings=timings)(tests))
+        chunk_2 = list(EqualTimeChunker(2, 2, timings=timings)(tests))
+
+        self.assertEquals(tests[:20], chunk_1)
+        self.assertEquals(tests[20:], chunk_2)
+
+        # Without timing data, the directories are assumed to take equal time
+        self.assertEquals(tests[:10], list(EqualTimeChunker(2, 1)(tests)))
+
     def test_too_few_dirs(self):
         with self.assertRaises(ValueError):
             tests = make_mock_manifest(("test", "a", 1), ("test", "a/b", 100),
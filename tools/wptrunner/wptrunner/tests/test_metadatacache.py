@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from wptrunner import manifestexpected, metadatacache
+from wptrunner.wptmanifest.parser import parse
+
+ini = """[test.html]
+  expected:
+    if os == "linux" and not debug: TIMEOUT
+    if (os == "win") and (version == "10.0"): ERROR
+  [subtest]
+    expected: [FAIL, PASS]
+    disabled: @False
+    max-asserts: 1.5
+"""
+
+
+@pytest.fixture
+def tmp_dir(request):
+    path = tempfile.mkdtemp()
+    request.addfinalizer(lambda: shutil.rmtree(path))
+    return path
+
+
+def write(path, data):
+    with open(path, "w") as f:
+        f.write(data)
+
+
+def test_encode_ast():
+    ast = parse(ini)
+    decoded = metadatacache.decode_ast(metadatacache.encode_ast(ast))
+    assert decoded == ast
+    assert decoded.children[0].parent is decoded
+
+
+def test_get_ast(tmp_dir):
+    path = os.path.join(tmp_dir, "test.html.ini")
+    write(path, ini)
+    cache = metadatacache.MetadataCache(os.path.join(tmp_dir, "cache"))
+
+    assert cache.get_ast(path) == parse(ini)
+    assert cache.modified
+    cache.save()
+
+    # Unchanged files aren't parsed again, even if the mtime changes
+    cache = metadatacache.MetadataCache.load(os.path.join(tmp_dir, "cache"))
+    assert len(cache) == 1
+    with mock.patch.object(metadatacache, "parse") as parse_mock:
+        assert cache.get_ast(path) == parse(ini)
+        os.utime(path, (0, 0))
+        assert cache.get_ast(path) == parse(ini)
+        assert not parse_mock.called
+
+    write(path, ini.replace("TIMEOUT", "CRASH"))
+    assert cache.get_ast(path) == parse(ini.replace("TIMEOUT", "CRASH"))
+
+    os.unlink(path)
+    with pytest.raises(IOError):
+        cache.get_ast(path)
+    assert len(cache) == 0
+
+
+def test_load_invalid(tmp_dir):
+    path = os.path.join(tmp_dir, "cache")
+    assert len(metadatacache.MetadataCache.load(path)) == 0
+    write(path, "not a cache")
+    assert len(metadatacache.MetadataCache.load(path)) == 0
+
+
+def test_get_manifest(tmp_dir):
+    write(os.path.join(tmp_dir, "test.html.ini"), ini)
+    cache = metadatacache.MetadataCache(os.path.join(tmp_dir, "cache"))
+    run_info = {"os": "linux", "debug": False, "version": "1"}
+
+    for metadata_cache in [None, cache, cache]:
+        manifest = manifestexpected.get_manifest(tmp_dir, "test.html", "/", run_info,
+                                                 metadata_cache=metadata_cache)
+        test = manifest.get_test("/test.html")
+        assert test.get("expected") == "TIMEOUT"
+        assert test.get_subtest("subtest").get("expected") == ["FAIL", "PASS"]
+        assert manifestexpected.get_manifest(tmp_dir, "missing.html", "/", run_info,
+                                             metadata_cache=metadata_cache) is None
@@ -0,0 +1,226 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from wptrunner.screenshotcache import (ScreenshotHashCache, ScreenshotHashStore, ScreenshotLRU,
+                                       browser_build_id, reference_keys)
+
+
+class MockManifest(object):
+    def __init__(self, tests_path):
+        self.tests_path = tests_path
+        self.hashes = {}
+
+    def add(self, rel_path, data):
+        path = os.path.join(self.tests_path, rel_path)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(data)
+        self.hashes[rel_path] = hashlib.sha1(data).hexdigest()
+
+    def path_hash(self, rel_path):
+        return self.hashes.get(rel_path)
+
+
+class MockTest(object):
+    def __init__(self, url, references=None, viewport_size=None, dpi=None):
+        self.url = url
+        self.references = references if references is not None else []
+        self.viewport_size = viewport_size
+        self.dpi = dpi
+
+
+class CountingArray(object):
+    """Wrapper counting the reads from a shared array"""
+    def __init__(self, data):
+        self.data = data
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return self.data[index]
+
+
+def set_hashes(store, start, count):
+    for i in xrange(start, start + count):
+        store[("/%i.html" % i, None, None)] = "%040x" % i
+
+
+def make_cache(path, build_id="build"):
+    tmp_dir = tempfile.mkdtemp()
+    manifest = MockManifest(tmp_dir)
+    test_manifests = {manifest: {"url_base": "/", "tests_path": tmp_dir}}
+    return manifest, ScreenshotHashCache.load(path, build_id, test_manifests)
+
+
+def test_reference_keys():
+    ref_ref = MockTest("/ref-ref.html")
+    ref = MockTest("/ref.html", [(ref_ref, "==")])
+    tests = [MockTest("/a.html", [(ref, "==")]),
+             MockTest("/b.html", [(ref, "!="), (MockTest("/other.html"), "==")]),
+             MockTest("/c.html", [(ref, "==")], viewport_size="800x600", dpi=2)]
+    assert reference_keys(tests) == {("/ref.html", None, None),
+                                     ("/ref-ref.html", None, None),
+                                     ("/other.html", None, None),
+                                     ("/ref.html", "800x600", 2),
+                                     ("/ref-ref.html", "800x600", 2)}
+
+
+def test_browser_build_id():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        binary = os.path.join(tmp_dir, "browser")
+        with open(binary, "w") as f:
+            f.write("browser")
+        run_info = {"product": "firefox", "browser_version": "60.0"}
+        build_id = browser_build_id("firefox", binary, run_info)
+        assert build_id == browser_build_id("firefox", binary, dict(run_info))
+        assert build_id != browser_build_id("firefox", binary, dict(run_info, browser_version="61.0"))
+        assert browser_build_id("firefox", os.path.join(tmp_dir, "missing"), run_info) is None
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_hash_store():
+    store = ScreenshotHashStore(size=64)
+    key = ("/a.html", None, None)
+    assert key not in store
+    assert store.get(key) is None
+
+    store[key] = "1" * 40
+    assert store[key] == "1" * 40
+    store[key] = "2" * 40
+    assert store[key] == "2" * 40
+    assert ("/a.html", "800x600", None) not in store
+
+    # Once the table is full further hashes are dropped
+    set_hashes(store, 0, 100)
+    assert store[key] == "2" * 40
+    assert sum(1 for i in xrange(100) if ("/%i.html" % i, None, None) in store) == 63
+
+
+def test_hash_store_full():
+    store = ScreenshotHashStore(size=256)
+    set_hashes(store, 0, 1000)
+
+    stored = [i for i in xrange(1000) if ("/%i.html" % i, None, None) in store]
+    used = sum(1 for slot in xrange(store.size)
+               if store._data[slot * store.slot_size:
+                              slot * store.slot_size + store.digest_size] != store.empty)
+    assert len(stored) == used
+    assert used > store.size * 3 // 4
+    for i in stored:
+        assert store[("/%i.html" % i, None, None)] == "%040x" % i
+
+    # Keys are only looked for in a limited number of slots, so lookups in a
+    # full table don't scan the whole table
+    assert store.max_probes < store.size
+    store._data = CountingArray(store._data)
+    assert ("/missing.html", None, None) not in store
+    assert store._data.reads <= store.max_probes
+
+
+def test_hash_store_processes():
+    store = ScreenshotHashStore(size=1024)
+    procs = [multiprocessing.Process(target=set_hashes, args=(store, i * 100, 100))
+             for i in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    for i in xrange(400):
+        assert store[("/%i.html" % i, None, None)] == "%040x" % i
+
+
+def test_screenshot_lru():
+    screenshots = ScreenshotLRU(max_size=2)
+    screenshots["a"] = "data a"
+    screenshots["b"] = "data b"
+    assert screenshots.get("a") == "data a"
+    screenshots["c"] = "data c"
+    assert screenshots.get("b") is None
+    assert screenshots.get("a") == "data a"
+    assert screenshots.get("c") == "data c"
+
+
+def test_source_key():
+    manifest, cache = make_cache("unused")
+    try:
+        manifest.add("ref.html", '<link rel=stylesheet href="support/ref.css">'
+                     '<link rel=author href="http://example.org/">'
+                     '<img src=support/img.png><a href="#x"></a>')
+        manifest.add(os.path.join("support", "ref.css"), "@import 'imported.css';")
+        manifest.add(os.path.join("support", "imported.css"),
+                     "div { background: url(img.png) }")
+        manifest.add(os.path.join("support", "img.png"), "png")
+        manifest.add("other.html", "")
+        manifest.add("sub.sub.html", "")
+        manifest.add("uses-sub.html", "<iframe src=sub.sub.html></iframe>")
+        manifest.add("uses-handler.html", "<img src=support/img.py>")
+
+        key = cache.source_key("/ref.html")
+        assert key is not None
+        assert cache.source_key("/other.html") not in (None, key)
+        for url in ["/sub.sub.html", "/uses-sub.html", "/uses-handler.html",
+                    "/other.html?pipe=trickle(d1)"]:
+            assert cache.source_key(url) is None
+
+        # Changing a subresource found through the CSS changes the key
+        manifest.add(os.path.join("support", "img.png"), "changed")
+        test_manifests = {manifest: {"url_base": "/", "tests_path": manifest.tests_path}}
+        cache = ScreenshotHashCache("unused", "build", test_manifests)
+        assert cache.source_key("/ref.html") not in (None, key)
+    finally:
+        shutil.rmtree(manifest.tests_path)
+
+
+def test_save_load():
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, "screenshots.json")
+    manifest, cache = make_cache(path)
+    try:
+        manifest.add("ref.html", "<img src=img.png>")
+        manifest.add("img.png", "png")
+        manifest.add("ref2.html", "")
+        manifest.add("test.html", "")
+        keys = {("/ref.html", None, None), ("/ref2.html", "800x600", 2),
+                ("/ref2.html", None, None)}
+
+        screenshot_cache = {("/ref.html", None, None): "1" * 40,
+                            ("/ref2.html", "800x600", 2): "2" * 40,
+                            ("/test.html", None, None): "3" * 40}
+        assert cache.update(screenshot_cache, keys) == 2
+        cache.save()
+
+        test_manifests = {manifest: {"url_base": "/", "tests_path": manifest.tests_path}}
+        loaded = ScreenshotHashCache.load(path, "build", test_manifests)
+        assert len(loaded) == 2
+
+        screenshot_cache = {}
+        assert loaded.populate(screenshot_cache, keys) == 2
+        assert screenshot_cache == {("/ref.html", None, None): "1" * 40,
+                                    ("/ref2.html", "800x600", 2): "2" * 40}
+
+        # Only the keys in the run are used
+        screenshot_cache = ScreenshotHashStore(size=16)
+        assert loaded.populate(screenshot_cache, {("/ref2.html", "800x600", 2)}) == 1
+        assert screenshot_cache[("/ref2.html", "800x600", 2)] == "2" * 40
+
+        # Entries for changed files aren't used
+        manifest.add("img.png", "changed")
+        loaded = ScreenshotHashCache.load(path, "build", test_manifests)
+        screenshot_cache = {}
+        assert loaded.populate(screenshot_cache, keys) == 1
+        assert screenshot_cache.keys() == [("/ref2.html", "800x600", 2)]
+
+        # A different browser build invalidates the cache
+        assert len(ScreenshotHashCache.load(path, "other build", test_manifests)) == 0
+    finally:
+        shutil.rmtree(tmp_dir)
+        shutil.rmtree(manifest.tests_path)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from wptrunner import stability
+
+
+def log_run(handler, statuses):
+    for test_name, subtest_status, status in statuses:
+        handler({"action": "test_start", "test": test_name})
+        if subtest_status is not None:
+            handler({"action": "test_status", "test": test_name, "subtest": "sub",
+                     "status": subtest_status, "message": None})
+        handler({"action": "test_end", "test": test_name, "status": status})
+
+
+def test_log_handler_diverged():
+    calls = []
+    handler = stability.LogHandler(on_inconsistent=lambda: calls.append(handler.diverged))
+    log_run(handler, [("/a.html", "PASS", "OK"), ("/b.html", None, "SKIP")])
+    log_run(handler, [("/a.html", "PASS", "OK"), ("/b.html", None, "SKIP")])
+    assert handler.diverged is None
+
+    log_run(handler, [("/a.html", "FAIL", "TIMEOUT"), ("/b.html", None, "SKIP")])
+    # Only the first divergence is reported
+    assert calls == [("/a.html", "sub")]
+    assert handler.diverged == ("/a.html", "sub")
+    assert handler.results["/a.html"]["status"] == {"OK": 2, "TIMEOUT": 1}
+
+
+def test_find_inconsistent():
+    handler = stability.LogHandler()
+    log_run(handler, [("/a.html", "PASS", "OK"), ("/b.html", "PASS", "OK")])
+    log_run(handler, [("/a.html", "FAIL", "OK")])
+
+    # Tests that didn't run in every iteration are only inconsistent if all
+    # the iterations were run
+    inconsistent = stability.find_inconsistent(handler.results, 3)
+    assert [item[:2] for item in inconsistent] == [("/a.html", None), ("/a.html", "sub"),
+                                                   ("/b.html", None), ("/b.html", "sub")]
+    inconsistent = stability.find_inconsistent(handler.results, 3, complete=False)
+    assert [item[:2] for item in inconsistent] == [("/a.html", "sub")]
@@ -3,11 +3,13 @@ from __future__ import unicode_literals
 import os
 import sys
 import tempfile
+import threading
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from mozlog import structured
-from wptrunner.testloader import TestFilter as Filter
+from wptrunner.testloader import PathGroupedSource, SingleTestSource, TestFilter as Filter
+from wptrunner.timings import TimingData
 from .test_chunker import make_mock_manifest
 
 structured.set_default_logger(structured.structuredlog.StructuredLogger("TestLoader"))
@@ -28,3 +30,118 @@ def test_filter_unicode():
         f.flush()
 
         Filter(manifest_path=f.name, test_manifests=tests)
+
+
+class MockTest(object):
+    def __init__(self, id, test_type="testharness"):
+        self.id = id
+        self.test_type = test_type
+
+    def update_metadata(self, metadata):
+        metadata["count"] = metadata.get("count", 0) + 1
+        return metadata
+
+
+def test_single_test_source_batches():
+    tests = [MockTest(i) for i in range(12)]
+    queue = SingleTestSource.make_queue(tests, processes=2, batch_size=5)
+    assert not queue.empty()
+
+    sources = [SingleTestSource(queue) for _ in range(2)]
+    groups = []
+    for source in sources:
+        group, metadata = source.group()
+        assert metadata == {"count": 12}
+        groups.append(group)
+    assert [test.id for test in groups[0]] == [0, 1, 2, 3, 4]
+    assert [test.id for test in groups[1]] == [5, 6, 7, 8, 9]
+
+    # The group is the same object each time, so managers don't restart
+    groups[0].clear()
+    assert sources[0].group()[0] is groups[0]
+    assert [test.id for test in groups[0]] == [10, 11]
+
+
+def test_single_test_source_steal():
+    tests = [MockTest(i) for i in range(5)]
+    queue = SingleTestSource.make_queue(tests, processes=2, batch_size=5)
+    sources = [SingleTestSource(queue) for _ in range(2)]
+
+    busy, _ = sources[0].group()
+    busy.popleft()
+    idle, _ = sources[1].group()
+    assert [test.id for test in idle] == [3, 4]
+    assert [test.id for test in busy] == [1, 2]
+
+    busy.clear()
+    idle.popleft()
+    assert [test.id for test in sources[0].group()[0]] == [4]
+    sources[0].current_group.clear()
+    assert sources[0].group() == (None, None)
+    assert queue.empty()
+
+
+def test_single_test_source_threads():
+    tests = [MockTest(i) for i in range(1000)]
+    queue = SingleTestSource.make_queue(tests, processes=4, batch_size=3)
+    seen = []
+
+    def run(source):
+        while True:
+            group, _ = source.group()
+            if group is None:
+                break
+            try:
+                seen.append(group.popleft().id)
+            except IndexError:
+                continue
+
+    threads = [threading.Thread(target=run, args=(SingleTestSource(queue),))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(seen) == list(range(1000))
+
+
+def test_single_test_source_longest_first():
+    tests = [MockTest(i) for i in range(4)]
+    timings = TimingData({0: 1.0, 1: 5.0, 3: 2.0})
+    queue = SingleTestSource.make_queue(tests, processes=1, timings=timings)
+    group, _ = SingleTestSource(queue).group()
+    # Test 2 has no timing data so is estimated at the mean duration
+    assert [test.id for test in group] == [1, 2, 3, 0]
+
+
+def test_single_test_source_test_types():
+    tests = ([MockTest(i, "testharness") for i in range(4)] +
+             [MockTest(i, "reftest") for i in range(4, 10)])
+    queue = SingleTestSource.make_queue(tests, processes=2, batch_size=3)
+    sources = [SingleTestSource(queue) for _ in range(2)]
+
+    group_0, _ = sources[0].group()
+    group_1, _ = sources[1].group()
+    assert [test.id for test in group_0] == [0, 1, 2]
+    assert [test.id for test in group_1] == [3]
+
+    # Each source keeps to the same type while there are tests of that type
+    group_1.clear()
+    assert [test.id for test in sources[1].group()[0]] == [4, 5, 6]
+    group_0.clear()
+    assert [test.id for test in sources[0].group()[0]] == [7, 8, 9]
+
+
+class PathTest(MockTest):
+    def __init__(self, id, test_type):
+        MockTest.__init__(self, id, test_type)
+        self.url = "/a/%s" % id
+
+
+def test_path_grouped_source_test_types():
+    tests = [PathTest("1.html", "testharness"), PathTest("2.html", "testharness"),
+             PathTest("3.html", "reftest")]
+    queue = PathGroupedSource.make_queue(tests, depth=None)
+    groups = [[test.id for test in queue.get(True, 10)[0]] for _ in range(2)]
+    assert groups == [["1.html", "2.html"], ["3.html"]]
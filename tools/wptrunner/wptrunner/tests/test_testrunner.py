@@ -0,0 +1,223 @@
+import os
+import sys
+import threading
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import pytest
+from mozlog import structured
+from mozlog.handlers import BaseHandler
+
+from wptrunner import testrunner, wpttest
+from wptrunner.browsers.base import NullBrowser
+from wptrunner.executors import base as executor_base
+from wptrunner.testloader import SingleTestSource
+
+structured.set_default_logger(structured.structuredlog.StructuredLogger("TestRunner"))
+
+Result = namedtuple("Result", ["status", "message", "extra"])
+
+
+class MockTest(object):
+    restart_after = False
+    result_cls = wpttest.TestharnessResult
+
+    def __init__(self, id, test_type, status="OK"):
+        self.id = id
+        self.test_type = test_type
+        # Status the test gets when it runs
+        self.status = status
+        self.environment = {"protocol": "http", "prefs": {}}
+
+    def __eq__(self, other):
+        return self.id == other.id
+
+    def update_metadata(self, metadata):
+        return metadata
+
+    def expected(self, subtest=None):
+        return "OK"
+
+    def disabled(self, subtest=None):
+        return False
+
+
+class MockBrowser(NullBrowser):
+    instances = []
+
+    def setup(self):
+        self.instances.append(self)
+
+
+class MockExecutor(object):
+    def __init__(self, browser, name, **kwargs):
+        self.name = name
+
+    def setup(self, runner):
+        self.runner = runner
+        runner.send_message("init_succeeded")
+
+    def teardown(self):
+        pass
+
+    def run_test(self, test):
+        # Report the executor that ran the test in the message
+        self.runner.send_message("test_ended", test,
+                                 (Result("OK", "%s %s" % (self.name, test.test_type), None), []))
+
+
+class MockBatchExecutor(executor_base.TestExecutor):
+    supports_batching = True
+
+    def __init__(self, browser, **kwargs):
+        executor_base.TestExecutor.__init__(self, browser, {})
+
+    def setup(self, runner):
+        self.runner = runner
+        runner.send_message("init_succeeded")
+
+    def do_test(self, test):
+        return (test.result_cls(test.status, "single"), [])
+
+    def do_tests(self, tests):
+        # Report the size of the batch that ran the test in the message
+        for test in tests:
+            yield (test.result_cls(test.status, "batch of %i" % len(tests)), [])
+
+
+class ResultHandler(BaseHandler):
+    def __init__(self):
+        BaseHandler.__init__(self, None)
+        self.messages = {}
+        self.actions = []
+
+    def __call__(self, data):
+        if data["action"] in ("test_start", "test_end"):
+            self.actions.append((data["action"], data["test"]))
+        if data["action"] == "test_end":
+            self.messages[data["test"]] = data["message"]
+
+
+def test_mixed_test_types():
+    logger = structured.structuredlog.StructuredLogger("MixedTypes")
+    handler = ResultHandler()
+    logger.add_handler(handler)
+
+    tests = {"testharness": [MockTest("/t%i.html" % i, "testharness") for i in range(20)],
+             "reftest": [MockTest("/r%i.html" % i, "reftest") for i in range(20)]}
+    implementations = {test_type: testrunner.TestImplementation(MockExecutor,
+                                                                {"name": test_type},
+                                                                MockBrowser, {})
+                       for test_type in tests}
+    del MockBrowser.instances[:]
+
+    logger.suite_start([test.id for item in tests.itervalues() for test in item])
+    try:
+        with testrunner.ManagerGroup("MixedTypes", 2, SingleTestSource, {"processes": 2},
+                                     implementations) as manager_group:
+            manager_group.run(["testharness", "reftest"], tests)
+    finally:
+        logger.suite_end()
+        logger.remove_handler(handler)
+
+    assert manager_group.unexpected_count() == 0
+    expected = {test.id: "%s %s" % (test.test_type, test.test_type)
+                for item in tests.itervalues() for test in item}
+    assert handler.messages == expected
+    # The browser arguments are the same for both types, so each manager
+    # sets up a single browser
+    assert len(MockBrowser.instances) == 2
+
+
+def run_batched(tests, batch_size, restart_on_unexpected=True):
+    logger = structured.structuredlog.StructuredLogger("Batches")
+    handler = ResultHandler()
+    logger.add_handler(handler)
+
+    implementations = {"testharness": testrunner.TestImplementation(MockBatchExecutor, {},
+                                                                    MockBrowser, {})}
+    logger.suite_start([test.id for test in tests])
+    try:
+        with testrunner.ManagerGroup("Batches", 1, SingleTestSource, {"processes": 1},
+                                     implementations,
+                                     restart_on_unexpected=restart_on_unexpected,
+                                     batch_size=batch_size) as manager_group:
+            manager_group.run(["testharness"], {"testharness": tests})
+    finally:
+        logger.suite_end()
+        logger.remove_handler(handler)
+    return manager_group, handler
+
+
+def expected_actions(tests):
+    rv = []
+    for test in tests:
+        rv.extend([("test_start", test.id), ("test_end", test.id)])
+    return rv
+
+
+def test_batches():
+    tests = [MockTest("/t%i.html" % i, "testharness") for i in range(10)]
+    manager_group, handler = run_batched(tests, 4)
+
+    assert manager_group.unexpected_count() == 0
+    # Each test is still logged as starting and ending in turn
+    assert handler.actions == expected_actions(tests)
+    assert [handler.messages[test.id] for test in tests] == ["batch of 4"] * 8 + ["batch of 2"] * 2
+
+
+@pytest.mark.parametrize("restart_on_unexpected", [True, False])
+def test_batch_unexpected(restart_on_unexpected):
+    tests = [MockTest("/t%i.html" % i, "testharness", "ERROR" if i == 2 else "OK")
+             for i in range(8)]
+    manager_group, handler = run_batched(tests, 4, restart_on_unexpected)
+
+    assert manager_group.unexpected_count() == 1
+    assert handler.actions == expected_actions(tests)
+    # The batch stops after the unexpected result, and the remaining tests
+    # run in a new batch
+    assert [handler.messages[test.id] for test in tests] == (["batch of 4"] * 7 + ["single"])
+
+
+class StopHandler(BaseHandler):
+    """Handler that sets a stop flag after some tests have ended"""
+    def __init__(self, stop_flag, count):
+        BaseHandler.__init__(self, None)
+        self.stop_flag = stop_flag
+        self.count = count
+        self.ended = 0
+
+    def __call__(self, data):
+        if data["action"] == "test_end":
+            self.ended += 1
+            if self.ended == self.count:
+                self.stop_flag.set()
+
+
+@pytest.mark.parametrize("stop_after", [None, 3])
+def test_stop_flag(stop_after):
+    logger = structured.structuredlog.StructuredLogger("StopFlag")
+    stop_flag = threading.Event()
+    handler = StopHandler(stop_flag, stop_after)
+    logger.add_handler(handler)
+
+    tests = [MockTest("/t%i.html" % i, "testharness") for i in range(20)]
+    implementations = {"testharness": testrunner.TestImplementation(MockExecutor,
+                                                                    {"name": "testharness"},
+                                                                    MockBrowser, {})}
+    logger.suite_start([test.id for test in tests])
+    try:
+        with testrunner.ManagerGroup("StopFlag", 1, SingleTestSource, {"processes": 1},
+                                     implementations, stop_flag=stop_flag) as manager_group:
+            manager_group.run(["testharness"], {"testharness": tests})
+    finally:
+        logger.suite_end()
+        logger.remove_handler(handler)
+
+    if stop_after is None:
+        # The flag is left clear when the group finishes normally
+        assert handler.ended == 20
+        assert not stop_flag.is_set()
+    else:
+        assert handler.ended == stop_after
@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from StringIO import StringIO
+
+import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from wptrunner.timings import TimingData
+
+
+def make_log(*entries):
+    lines = [{"action": "suite_start", "time": 0, "tests": []}]
+    for test, start, end, status in entries:
+        lines.append({"action": "test_start", "time": start, "test": test})
+        lines.append({"action": "test_end", "time": end, "test": test, "status": status})
+    lines.append({"action": "suite_end", "time": 100000})
+    return StringIO("\n".join(json.dumps(item) for item in lines))
+
+
+def test_update_from_logs():
+    timings = TimingData({"/c.html": 5.0})
+    count = timings.update_from_logs(make_log(("/a.html", 1000, 3000, "OK"),
+                                              ("/b.html", 1000, 1500, "TIMEOUT"),
+                                              ("/skip.html", 1000, 1001, "SKIP")),
+                                     make_log(("/a.html", 1000, 2000, "OK")))
+    assert count == 2
+    assert timings.durations == {"/a.html": 1.5, "/b.html": 0.5, "/c.html": 5.0}
+    assert timings.estimate("/a.html") == 1.5
+    assert timings.estimate("/new.html") == 7.0 / 3
+
+
+def test_save_load():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, "timings.json")
+        assert len(TimingData.load(path)) == 0
+
+        TimingData({"/a.html": 1.5}).save(path)
+        assert TimingData.load(path).durations == {"/a.html": 1.5}
+
+        # Saving again replaces the file, including on Windows where
+        # os.rename doesn't replace existing files
+        with mock.patch.object(sys, "platform", "win32"):
+            TimingData({"/a.html": 2.5}).save(path)
+        assert TimingData.load(path).durations == {"/a.html": 2.5}
+
+        with open(path, "w") as f:
+            json.dump({"version": -1, "durations": {"/a.html": 1.5}}, f)
+        assert len(TimingData.load(path)) == 0
+
+        # Corrupt files are ignored
+        for data in ['{"version": 1, "dura', '[]', '{"version": 1, "durations": []}']:
+            with open(path, "w") as f:
+                f.write(data)
+            assert len(TimingData.load(path)) == 0
+    finally:
+        shutil.rmtree(tmp_dir)
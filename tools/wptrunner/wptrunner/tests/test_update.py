@@ -1,9 +1,12 @@
+import os
+import shutil
+import tempfile
 import unittest
 import StringIO
 
 import pytest
 
-from .. import metadata, manifestupdate
+from .. import metadata, manifestupdate, wptmanifest
 from mozlog import structuredlog, handlers, formatters
 
 
@@ -326,3 +329,94 @@ class TestExpectedUpdater(unittest.TestCase):
             "expected", {"debug": True, "os": "osx"}), "FAIL")
         self.assertEquals(new_manifest.get_test(test_id).children[0].get(
             "expected", {"debug": False, "os": "osx"}), "FAIL")
+
+
+class MockManifestItem(object):
+    item_type = "testharness"
+
+    def __init__(self, id):
+        self.id = id
+
+
+def write_log(path, runs):
+    logger = structuredlog.StructuredLogger("expected_test")
+    with open(path, "w") as f:
+        handler = handlers.StreamHandler(f, formatters.JSONFormatter())
+        logger.add_handler(handler)
+        for run_info, statuses in runs:
+            logger.suite_start([], run_info=run_info)
+            for test_id, subtest_status, status in statuses:
+                logger.test_start(test_id)
+                logger.info("running %s" % test_id)
+                logger.test_status(test_id, "test1", subtest_status, expected="PASS")
+                logger.test_end(test_id, status, expected="OK")
+            logger.suite_end()
+        logger.remove_handler(handler)
+
+
+def test_read_log_results():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, "log.json")
+        write_log(path, [({"os": "linux"}, [("/a.html", "PASS", "OK"),
+                                            ("/b.html", "FAIL", "SKIP")]),
+                         ({"os": "mac"}, [("/a.html", "FAIL", "OK")])])
+        with open(path) as f:
+            results = metadata.read_log_results(f)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    assert results == [({"os": "linux"}, [("/a.html", None, None),
+                                          ("/a.html", "test1", "PASS"),
+                                          ("/a.html", None, "OK"),
+                                          ("/b.html", None, None),
+                                          ("/b.html", "test1", "FAIL")]),
+                       ({"os": "mac"}, [("/a.html", None, None),
+                                        ("/a.html", "test1", "FAIL"),
+                                        ("/a.html", None, "OK")])]
+    # Repeated strings are shared between the rows
+    assert results[0][1][0][0] is results[1][1][0][0]
+
+
+def updated_manifest(log_filenames, processes):
+    test_manifest = object()
+    test = MockManifestItem("/path/to/test.htm")
+    expected = manifestupdate.compile(StringIO.StringIO("""[test.htm]
+  [test1]
+    expected: FAIL
+"""), "path/to/test.htm", "/")
+    updater = metadata.ExpectedUpdater({test_manifest: {}},
+                                       {test_manifest: {test: expected}},
+                                       {test.id: (test_manifest, test)})
+    updater.update_from_log_files(log_filenames, processes=processes)
+    for test_node in expected.iterchildren():
+        for subtest in test_node.iterchildren():
+            subtest.coalesce_expected()
+        test_node.coalesce_expected()
+    return wptmanifest.serialize(expected.node)
+
+
+def test_update_from_log_files():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        log_filenames = []
+        for i, (os_name, status) in enumerate([("linux", "PASS"), ("mac", "FAIL"),
+                                               ("win", "PASS"), ("win", "PASS")]):
+            path = os.path.join(tmp_dir, "log%i.json" % i)
+            write_log(path, [({"os": os_name}, [("/path/to/test.htm", status, "OK"),
+                                                ("/path/to/missing.htm", "PASS", "OK")])])
+            log_filenames.append(path)
+
+        serial = updated_manifest(log_filenames, 1)
+        assert updated_manifest(log_filenames, 3) == serial
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    assert serial == """[test.htm]
+  [test1]
+    expected:
+      if os == "linux": PASS
+      if os == "win": PASS
+      FAIL
+
+"""
@@ -0,0 +1,121 @@
+import argparse
+import json
+from collections import defaultdict
+
+from mozlog import reader
+
+from fileutil import replace_file
+
+
+class DurationHandler(reader.LogHandler):
+    """Log handler collecting the time between the test_start and test_end
+    messages for each test.
+
+    .. attribute:: durations
+
+       Dictionary of {test id: [duration in seconds]}, with one entry for
+       each time the test ran."""
+
+    def __init__(self):
+        self.start_times = {}
+        self.durations = defaultdict(list)
+
+    def suite_start(self, data):
+        self.start_times = {}
+
+    def test_start(self, data):
+        self.start_times[data["test"]] = data["time"]
+
+    def test_end(self, data):
+        start_time = self.start_times.pop(data["test"], None)
+        if start_time is None or data["status"] == "SKIP":
+            return
+        self.durations[data["test"]].append((data["time"] - start_time) / 1000.)
+
+
+class TimingData(object):
+    """Historical durations of tests, in seconds, keyed by test id.
+
+    The data is persisted as JSON and updated from the raw logs of previous
+    runs; each update replaces the duration of a test with the mean of the
+    durations in the new logs."""
+
+    version = 1
+
+    def __init__(self, durations=None):
+        self.durations = durations if durations is not None else {}
+        self._mean = None
+
+    def __len__(self):
+        return len(self.durations)
+
+    @classmethod
+    def load(cls, path):
+        """Load the timing data from path, returning an empty database if the
+        file doesn't exist, is corrupt or has an incompatible format."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return cls()
+        if (not isinstance(data, dict) or
+            data.get("version") != cls.version or
+            not isinstance(data.get("durations"), dict)):
+            return cls()
+        return cls(data["durations"])
+
+    def save(self, path):
+        data = {"version": self.version,
+                "durations": self.durations}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=0, sort_keys=True)
+        replace_file(tmp_path, path)
+
+    def update_from_logs(self, *log_files):
+        """Add the durations of the tests in some raw mozlog logs.
+
+        :param log_files: File objects containing raw logs
+        :returns: The number of tests updated"""
+        handler = DurationHandler()
+        for log_file in log_files:
+            reader.handle_log(reader.read(log_file), handler)
+        for test_id, durations in handler.durations.iteritems():
+            self.durations[test_id] = sum(durations) / len(durations)
+        self._mean = None
+        return len(handler.durations)
+
+    def get(self, test_id, default=None):
+        return self.durations.get(test_id, default)
+
+    def mean(self):
+        """Mean duration of all the tests with timing data."""
+        if self._mean is None and self.durations:
+            self._mean = sum(self.durations.itervalues()) / len(self.durations)
+        return self._mean
+
+    def estimate(self, test_id):
+        """Expected duration of a test, using the mean duration for tests
+        that haven't run before."""
+        duration = self.durations.get(test_id)
+        if duration is None:
+            duration = self.mean()
+        return duration
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description="Update a test timing database from raw logs of previous runs")
+    parser.add_argument("timing_db", action="store",
+                        help="Path to the timing database, created if it doesn't exist")
+    parser.add_argument("log_files", nargs="+", type=argparse.FileType("r"),
+                        help="Raw mozlog logs to read durations from")
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    timings = TimingData.load(args.timing_db)
+    count = timings.update_from_logs(*args.log_files)
+    timings.save(args.timing_db)
+    print("Updated durations of %i tests, %i tests in total" % (count, len(timings)))
@@ -88,6 +88,7 @@ class UpdateMetadata(Step):
             state.run_log = kwargs["run_log"]
             state.ignore_existing = kwargs["ignore_existing"]
             state.stability = kwargs["stability"]
+            state.processes = kwargs["processes"]
             state.patch = kwargs["patch"]
             state.suite_name = kwargs["suite_name"]
             state.product = kwargs["product"]
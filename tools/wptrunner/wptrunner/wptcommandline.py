@@ -62,6 +62,14 @@ scheme host and port.""")
                         "directory")
     parser.add_argument("--processes", action="store", type=int, default=None,
                         help="Number of simultaneous processes to use")
+    parser.add_argument("--mix-test-types", action="store_true", default=False,
+                        help="Run tests of all types from a single queue, rather than "
+                        "running each type in turn. The browser is restarted whenever a "
+                        "process switches to a different type of test")
+    parser.add_argument("--batch-size", action="store", type=int, default=1,
+                        help="Maximum number of tests to send to the browser at once, for "
+                        "executors that support running tests in batches (testharness tests "
+                        "with WebDriver or Marionette). The default of 1 disables batching")
 
     parser.add_argument("--no-capture-stdio", action="store_true", default=False,
                         help="Don't capture stdio and write to logging")
@@ -155,6 +163,16 @@ scheme host and port.""")
                               help="Allow the wptrunner to install fonts on your system")
     config_group.add_argument("--font-dir", action="store", type=abs_path, dest="font_dir",
                               help="Path to local font installation directory", default=None)
+    config_group.add_argument("--metadata-cache", action="store", type=abs_path, default=None,
+                              help="Path to a file storing the parsed expectation metadata "
+                              "files across runs, so that unchanged files aren't parsed again")
+    config_group.add_argument("--screenshot-cache", action="store", type=abs_path, default=None,
+                              help="Path to a file storing the hashes of reftest reference "
+                              "screenshots across runs, so that unchanged references aren't "
+                              "rendered again. Not used when tests are repeated or rerun")
+    config_group.add_argument("--screenshot-cache-build", action="store", default=None,
+                              help="Identifier of the browser build, used to invalidate the "
+                              "screenshot cache (defaults to one based on --binary)")
 
     build_type = parser.add_mutually_exclusive_group()
     build_type.add_argument("--debug-build", dest="debug", action="store_true",
@@ -172,6 +190,10 @@ scheme host and port.""")
                                 help="Chunk number to run")
     chunking_group.add_argument("--chunk-type", action="store", choices=["none", "equal_time", "hash", "dir_hash"],
                                 default=None, help="Chunking type to use")
+    chunking_group.add_argument("--timing-db", action="store", type=abs_path, default=None,
+                                help="Path to a database of test durations from previous runs, "
+                                "created by wpttimings. Used by equal_time chunking, and to "
+                                "start the longest tests first")
 
     ssl_group = parser.add_argument_group("SSL/TLS")
     ssl_group.add_argument("--ssl-type", action="store", default=None,
@@ -483,6 +505,9 @@ def create_parser_update(product_choices=None):
     parser.add_argument("--stability", nargs="?", action="store", const="unstable", default=None,
         help=("Reason for disabling tests. When updating test results, disable tests that have "
               "inconsistent results across many runs with the given reason."))
+    parser.add_argument("--processes", action="store", type=int, default=None,
+                        help="Number of processes to use for reading the log files, "
+                        "defaulting to the number of CPUs")
     parser.add_argument("--continue", action="store_true", help="Continue a previously started run of the update script")
     parser.add_argument("--abort", action="store_true", help="Clear state from a previous incomplete run of the update script")
     parser.add_argument("--exclude", action="store", nargs="*",
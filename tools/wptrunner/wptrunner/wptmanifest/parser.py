@@ -14,6 +14,7 @@
 
 from __future__ import unicode_literals
 
+import re
 import types
 from cStringIO import StringIO
 
@@ -63,6 +64,20 @@ class TokenTypes(object):
 token_types = TokenTypes()
 
 
+# Runs of characters that need no special handling in each tokenizer
+# state; the states only look at the characters that end these runs
+whitespace_re = re.compile(" *")
+heading_re = re.compile(r"[^\\\]]*")
+key_re = re.compile(r"[^\\: ]*")
+list_value_re = re.compile(r"[^\\#, \]]*")
+value_re = re.compile(r"[^\\# ]*")
+string_res = {"'": re.compile(r"[^\\']*"),
+              '"': re.compile(r'[^\\"]*')}
+operator_re = re.compile(r"[=!]*")
+number_re = re.compile(r"[0-9.]*")
+ident_re = re.compile(r"[^.\[\]()=! :]*")
+
+
 class Tokenizer(object):
     def __init__(self):
         self.reset()
@@ -88,14 +103,11 @@ class Tokenizer(object):
             assert isinstance(line, str)
             self.state = self.next_line_state
             assert self.state is not None
-            states = []
             self.next_line_state = None
             self.line_number = i + 1
             self.index = 0
             self.line = line.decode('utf-8').rstrip()
-            assert isinstance(self.line, unicode)
             while self.state != self.eol_state:
-                states.append(self.state)
                 tokens = self.state()
                 if tokens:
                     for token in tokens:
@@ -116,9 +128,15 @@ class Tokenizer(object):
     def peek(self, length):
         return self.line[self.index:self.index + length]
 
+    def match(self, regexp):
+        """Consume the longest run of characters at the current position
+        matching regexp, and return them."""
+        m = regexp.match(self.line, self.index)
+        self.index = m.end()
+        return m.group()
+
     def skip_whitespace(self):
-        while self.char() == " ":
-            self.consume()
+        self.index = whitespace_re.match(self.line, self.index).end()
 
     def eol_state(self):
         if self.next_line_state is None:
@@ -156,16 +174,14 @@ class Tokenizer(object):
     def heading_state(self):
         rv = ""
         while True:
+            rv += self.match(heading_re)
             c = self.char()
             if c == "\\":
                 rv += self.consume_escape()
             elif c == "]":
                 break
-            elif c == eol:
-                raise ParseError(self.filename, self.line_number, "EOL in heading")
             else:
-                rv += c
-                self.consume()
+                raise ParseError(self.filename, self.line_number, "EOL in heading")
 
         yield (token_types.string, decode(rv))
         yield (token_types.paren, "]")
@@ -176,6 +192,7 @@ class Tokenizer(object):
     def key_state(self):
         rv = ""
         while True:
+            rv += self.match(key_re)
             c = self.char()
             if c == " ":
                 self.skip_whitespace()
@@ -186,11 +203,8 @@ class Tokenizer(object):
                 break
             elif c == eol:
                 raise ParseError(self.filename, self.line_number, "EOL in key name (missing ':'?)")
-            elif c == "\\":
-                rv += self.consume_escape()
             else:
-                rv += c
-                self.consume()
+                rv += self.consume_escape()
         yield (token_types.string, decode(rv))
         yield (token_types.separator, ":")
         self.consume()
@@ -246,10 +260,17 @@ class Tokenizer(object):
         rv = ""
         spaces = 0
         while True:
+            text = self.match(list_value_re)
+            if text:
+                # Spaces are only part of the value when they're followed by
+                # something other than an escape
+                rv += " " * spaces + text
+                spaces = 0
             c = self.char()
-            if c == "\\":
-                escape = self.consume_escape()
-                rv += escape
+            if c == " ":
+                spaces += len(self.match(whitespace_re))
+            elif c == "\\":
+                rv += self.consume_escape()
             elif c == eol:
                 raise ParseError(self.filename, self.line_number, "EOL in list value")
             elif c == "#":
@@ -258,18 +279,10 @@ class Tokenizer(object):
                 self.state = self.list_value_start_state
                 self.consume()
                 break
-            elif c == " ":
-                spaces += 1
-                self.consume()
-            elif c == "]":
+            else:
                 self.state = self.list_end_state
                 self.consume()
                 break
-            else:
-                rv += " " * spaces
-                spaces = 0
-                rv += c
-                self.consume()
 
         if rv:
             yield (token_types.string, decode(rv))
@@ -305,29 +318,26 @@ class Tokenizer(object):
         rv = ""
         spaces = 0
         while True:
+            text = self.match(value_re)
+            if text:
+                rv += " " * spaces + text
+                spaces = 0
             c = self.char()
-            if c == "\\":
+            if c == " ":
+                # prevent whitespace before comments from being included in the value
+                spaces += len(self.match(whitespace_re))
+            elif c == "\\":
                 rv += self.consume_escape()
             elif c == "#":
                 self.state = self.comment_state
                 break
-            elif c == " ":
-                # prevent whitespace before comments from being included in the value
-                spaces += 1
-                self.consume()
-            elif c == eol:
+            else:
                 self.state = self.line_end_state
                 break
-            else:
-                rv += " " * spaces
-                spaces = 0
-                rv += c
-                self.consume()
         yield (token_types.string, decode(rv))
 
     def comment_state(self):
-        while self.char() is not eol:
-            self.consume()
+        self.index = len(self.line)
         self.state = self.eol_state
 
     def line_end_state(self):
@@ -341,19 +351,18 @@ class Tokenizer(object):
             raise ParseError(self.filename, self.line_number, "Junk before EOL %s" % c)
 
     def consume_string(self, quote_char):
+        string_re = string_res[quote_char]
         rv = ""
         while True:
+            rv += self.match(string_re)
             c = self.char()
             if c == "\\":
                 rv += self.consume_escape()
             elif c == quote_char:
                 self.consume()
                 break
-            elif c == eol:
-                raise ParseError(self.filename, self.line_number, "EOL in quoted string")
             else:
-                rv += c
-                self.consume()
+                raise ParseError(self.filename, self.line_number, "EOL in quoted string")
 
         return decode(rv)
 
@@ -389,66 +398,26 @@ class Tokenizer(object):
 
     def operator_state(self):
         # Only symbolic operators
-        index_0 = self.index
-        while True:
-            c = self.char()
-            if c == eol:
-                break
-            elif c in operator_chars:
-                self.consume()
-            else:
-                self.state = self.expr_state
-                break
-        yield (token_types.ident, self.line[index_0:self.index])
+        value = self.match(operator_re)
+        if self.char() != eol:
+            self.state = self.expr_state
+        yield (token_types.ident, value)
 
     def digit_state(self):
-        index_0 = self.index
-        seen_dot = False
-        while True:
-            c = self.char()
-            if c == eol:
-                break
-            elif c in digits:
-                self.consume()
-            elif c == ".":
-                if seen_dot:
-                    raise ParseError(self.filename, self.line_number, "Invalid number")
-                self.consume()
-                seen_dot = True
-            elif c in parens:
-                break
-            elif c in operator_chars:
-                break
-            elif c == " ":
-                break
-            elif c == ":":
-                break
-            else:
-                raise ParseError(self.filename, self.line_number, "Invalid character in number")
+        value = self.match(number_re)
+        if value.count(".") > 1:
+            raise ParseError(self.filename, self.line_number, "Invalid number")
+        c = self.char()
+        if c != eol and c not in parens and c not in operator_chars and c not in " :":
+            raise ParseError(self.filename, self.line_number, "Invalid character in number")
 
         self.state = self.expr_state
-        yield (token_types.number, self.line[index_0:self.index])
+        yield (token_types.number, value)
 
     def ident_state(self):
-        index_0 = self.index
-        while True:
-            c = self.char()
-            if c == eol:
-                break
-            elif c == ".":
-                break
-            elif c in parens:
-                break
-            elif c in operator_chars:
-                break
-            elif c == " ":
-                break
-            elif c == ":":
-                break
-            else:
-                self.consume()
+        value = self.match(ident_re)
         self.state = self.expr_state
-        yield (token_types.ident, self.line[index_0:self.index])
+        yield (token_types.ident, value)
 
     def consume_escape(self):
         assert self.char() == "\\"
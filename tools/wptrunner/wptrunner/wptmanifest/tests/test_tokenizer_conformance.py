@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+
+import pytest
+
+from .. import parser
+from ..parser import ParseError, token_types
+from .reference_tokenizer import ReferenceTokenizer
+
+# Fragments that random manifests are built from, covering the syntax the
+# tokenizer states handle and some things they reject
+fragments = ["[", "]", "[heading", "key", "expected", ":", ": ", " ", "  ", "if ", "os",
+             " == ", "!=", "=", "!", '"win"', "'linux'", '"unterminated', "1", "1.5", "1.2.3",
+             "1x", "@True", "@Reset", "#", "# comment", "\\x41", "\\u00e9", "\\n", "\\]",
+             "\\", ",", ", ", "(", ")", "not ", "and ", "or ", "a.b", "FAIL", "PASS",
+             "é", "\t"]
+
+metadata_root = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir,
+                             "test", "metadata")
+
+
+def tokens(tokenizer, data, max_tokens=200):
+    """List of the tokens for data, ending with the eof token or the
+    ParseError raised.
+
+    Some malformed expressions make both tokenizers produce empty tokens
+    indefinitely, so at most max_tokens tokens are returned."""
+    rv = []
+    try:
+        for token in tokenizer.tokenize(data):
+            rv.append(token)
+            if token[0] == token_types.eof or len(rv) == max_tokens:
+                break
+    except ParseError as e:
+        rv.append(("error", e.message))
+    return rv
+
+
+def random_manifest(rng):
+    lines = []
+    for _ in xrange(rng.randint(1, 8)):
+        indent = " " * rng.choice([0, 0, 2, 4, 6, 3])
+        line = "".join(rng.choice(fragments) for _ in xrange(rng.randint(0, 8)))
+        lines.append(indent + line)
+    return "\n".join(lines)
+
+
+def random_structured_manifest(rng):
+    """Manifest with the usual structure of headings, keys, lists and
+    conditions, but random text in the names and values."""
+    def text(choices, max_length=4):
+        return "".join(rng.choice(choices) for _ in xrange(rng.randint(1, max_length)))
+
+    name_chars = ["a", "b", "-", "_", ".", "é", "\\x41", "\\]", "\\ ", "1"]
+    value_chars = name_chars + [" ", "  ", "#", "'", '"', ":", "\\n", "(", "!"]
+    expr_parts = ["os", "debug", "1", "2.5", '"win"', "'x'", "==", "!=", "and", "or", "not",
+                  "(", ")", "[0]"]
+
+    lines = []
+    for _ in xrange(rng.randint(1, 6)):
+        indent = "  " * rng.randint(0, 2)
+        kind = rng.randint(0, 3)
+        if kind == 0:
+            lines.append("%s[%s]" % (indent, text(name_chars + ["[", " "], 8)))
+        elif kind == 1:
+            lines.append("%s%s: %s" % (indent, text(name_chars), text(value_chars, 8)))
+        elif kind == 2:
+            items = [rng.choice(["", "@"]) + text(name_chars + [" "]) if rng.random() < 0.7
+                     else '"%s"' % text(name_chars + [",", "]"])
+                     for _ in xrange(rng.randint(0, 3))]
+            lines.append("%s%s: [%s]%s" % (indent, text(name_chars), ", ".join(items),
+                                           rng.choice(["", "  # comment"])))
+        else:
+            lines.append("%s%s:" % (indent, text(name_chars)))
+            for _ in xrange(rng.randint(0, 3)):
+                expr = " ".join(rng.choice(expr_parts) for _ in xrange(rng.randint(1, 5)))
+                lines.append("%s  if %s: %s" % (indent, expr, text(value_chars)))
+            lines.append("%s  %s" % (indent, text(value_chars)))
+    return "\n".join(lines)
+
+
+def assert_conforms(data):
+    assert tokens(parser.Tokenizer(), data) == tokens(ReferenceTokenizer(), data), data
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_manifests(seed):
+    rng = random.Random(seed)
+    for _ in xrange(150):
+        assert_conforms(random_manifest(rng))
+        assert_conforms(random_structured_manifest(rng))
+
+
+def test_valid_manifest():
+    assert_conforms("""[test.html]
+  type: testharness
+  disabled: @False
+  prefs: [dom.foo:true, "layout.bar:1", @Reset]
+  expected:
+    if os == "linux" and not debug: TIMEOUT  # bug 1234
+    if (os == "win") and (version == "10.0") or bits != 32: ERROR
+    if (processor == 'x86_64') and e10s: [PASS, FAIL]
+    FAIL
+  [subtest with \\] and \\x41 \\u00e9]
+    expected:
+      if product == "firefox" and (os == "mac"): FAIL
+      PASS
+    max-asserts: 1.5
+    key with escaped\\ space: value with  spaces   # comment
+""")
+
+
+def test_repo_metadata():
+    for dirpath, dirnames, filenames in os.walk(metadata_root):
+        for filename in filenames:
+            if filename.endswith(".ini"):
+                with open(os.path.join(dirpath, filename)) as f:
+                    assert_conforms(f.read())
@@ -11,7 +11,10 @@ import wptcommandline
 import wptlogging
 import wpttest
 from font import FontInstaller
-from testrunner import ManagerGroup
+from metadatacache import MetadataCache
+from testrunner import ManagerGroup, TestImplementation
+from screenshotcache import ScreenshotHashCache, browser_build_id, reference_keys
+from timings import TimingData
 from browsers.base import NullBrowser
 
 here = os.path.split(__file__)[0]
@@ -60,6 +63,14 @@ def get_loader(test_paths, product, ssl_env, debug=None, run_info_extras=None, *
     if kwargs["tags"]:
         meta_filters.append(testloader.TagFilter(tags=kwargs["tags"]))
 
+    timings = None
+    if kwargs.get("timing_db"):
+        timings = TimingData.load(kwargs["timing_db"])
+
+    metadata_cache = None
+    if kwargs.get("metadata_cache"):
+        metadata_cache = MetadataCache.load(kwargs["metadata_cache"])
+
     test_loader = testloader.TestLoader(test_manifests,
                                         kwargs["test_types"],
                                         run_info,
@@ -69,7 +80,11 @@ def get_loader(test_paths, product, ssl_env, debug=None, run_info_extras=None, *
                                         total_chunks=kwargs["total_chunks"],
                                         chunk_number=kwargs["this_chunk"],
                                         include_https=ssl_env.ssl_enabled,
-                                        skip_timeout=kwargs["skip_timeout"])
+                                        skip_timeout=kwargs["skip_timeout"],
+                                        timings=timings,
+                                        metadata_cache=metadata_cache)
+    if metadata_cache is not None:
+        metadata_cache.save()
     return run_info, test_loader
 
 
@@ -132,6 +147,25 @@ def get_pause_after_test(test_loader, **kwargs):
     return kwargs["pause_after_test"]
 
 
+def get_screenshot_hashes(product, test_loader, run_info, **kwargs):
+    if not kwargs.get("screenshot_cache") or "reftest" not in kwargs["test_types"]:
+        return None
+
+    if kwargs["repeat"] > 1 or kwargs["repeat_until_unexpected"] or kwargs["rerun"] > 1:
+        logger.info("Not using the screenshot cache because tests are repeated")
+        return None
+
+    build_id = kwargs.get("screenshot_cache_build")
+    if build_id is None:
+        build_id = browser_build_id(product, kwargs.get("binary"), run_info)
+    if build_id is None:
+        logger.warning("Not using the screenshot cache because the browser build is unknown; "
+                       "use --screenshot-cache-build to identify it")
+        return None
+
+    return ScreenshotHashCache.load(kwargs["screenshot_cache"], build_id, test_loader.manifests)
+
+
 def run_tests(config, test_paths, product, **kwargs):
     with wptlogging.CaptureIO(logger, not kwargs["no_capture_stdio"]):
         env.do_delayed_imports(logger, test_paths)
@@ -163,7 +197,8 @@ def run_tests(config, test_paths, product, **kwargs):
                                                run_info_extras=run_info_extras(**kwargs),
                                                **kwargs)
 
-        test_source_kwargs = {"processes": kwargs["processes"]}
+        test_source_kwargs = {"processes": kwargs["processes"],
+                              "timings": getattr(test_loader, "timings", None)}
         if kwargs["run_by_dir"] is False:
             test_source_cls = testloader.SingleTestSource
         else:
@@ -173,6 +208,8 @@ def run_tests(config, test_paths, product, **kwargs):
 
         logger.info("Using %i client processes" % kwargs["processes"])
 
+        screenshot_hashes = get_screenshot_hashes(product, test_loader, run_info, **kwargs)
+
         unexpected_total = 0
 
         kwargs["pause_after_test"] = get_pause_after_test(test_loader, **kwargs)
@@ -192,6 +229,9 @@ def run_tests(config, test_paths, product, **kwargs):
             repeat = kwargs["repeat"]
             repeat_count = 0
             repeat_until_unexpected = kwargs["repeat_until_unexpected"]
+            # Set by other threads to stop the run before all the tests and
+            # repetitions are done
+            stop_flag = kwargs.get("stop_flag")
 
             while repeat_count < repeat or repeat_until_unexpected:
                 repeat_count += 1
@@ -201,10 +241,11 @@ def run_tests(config, test_paths, product, **kwargs):
                     logger.info("Repetition %i / %i" % (repeat_count, repeat))
 
                 unexpected_count = 0
+                screenshot_cache = None
                 logger.suite_start(test_loader.test_ids, run_info)
+                test_implementations = {}
+                run_tests = {}
                 for test_type in kwargs["test_types"]:
-                    logger.info("Running %s tests" % test_type)
-
                     # WebDriver tests may create and destroy multiple browser
                     # processes as part of their expected behavior. These
                     # processes are managed by a WebDriver server binary. This
@@ -223,7 +264,6 @@ def run_tests(config, test_paths, product, **kwargs):
                     executor_cls = executor_classes.get(test_type)
                     executor_kwargs = get_executor_kwargs(test_type,
                                                           test_environment.config,
-                                                          test_environment.cache_manager,
                                                           run_info,
                                                           **kwargs)
 
@@ -232,12 +272,20 @@ def run_tests(config, test_paths, product, **kwargs):
                                      (test_type, product))
                         continue
 
+                    if (test_type == "reftest" and screenshot_hashes is not None and
+                        "screenshot_cache" in executor_kwargs):
+                        reftest_keys = reference_keys(test_loader.tests["reftest"])
+                        screenshot_cache = executor_kwargs["screenshot_cache"]
+                        count = screenshot_hashes.populate(screenshot_cache, reftest_keys)
+                        logger.info("Using %i reference screenshot hashes from previous runs" %
+                                    count)
+
                     for test in test_loader.disabled_tests[test_type]:
                         logger.test_start(test.id)
                         logger.test_end(test.id, status="SKIP")
 
                     if test_type == "testharness":
-                        run_tests = {"testharness": []}
+                        run_tests["testharness"] = []
                         for test in test_loader.tests["testharness"]:
                             if test.testdriver and not executor_cls.supports_testdriver:
                                 logger.test_start(test.id)
@@ -245,34 +293,61 @@ def run_tests(config, test_paths, product, **kwargs):
                             else:
                                 run_tests["testharness"].append(test)
                     else:
-                        run_tests = test_loader.tests
+                        run_tests[test_type] = test_loader.tests[test_type]
+
+                    test_implementations[test_type] = TestImplementation(executor_cls,
+                                                                         executor_kwargs,
+                                                                         browser_cls,
+                                                                         browser_kwargs)
+
+                test_types = [item for item in kwargs["test_types"]
+                              if item in test_implementations]
+                if kwargs["mix_test_types"]:
+                    # Run all the test types from one queue, so that there's
+                    # no wait for all the tests of one type to finish before
+                    # the next type starts
+                    run_groups = [test_types]
+                else:
+                    run_groups = [[test_type] for test_type in test_types]
+
+                for group_test_types in run_groups:
+                    if stop_flag is not None and stop_flag.is_set():
+                        break
+                    logger.info("Running %s tests" % ", ".join(group_test_types))
 
                     with ManagerGroup("web-platform-tests",
                                       kwargs["processes"],
                                       test_source_cls,
                                       test_source_kwargs,
-                                      browser_cls,
-                                      browser_kwargs,
-                                      executor_cls,
-                                      executor_kwargs,
+                                      {test_type: test_implementations[test_type]
+                                       for test_type in group_test_types},
                                       kwargs["rerun"],
                                       kwargs["pause_after_test"],
                                       kwargs["pause_on_unexpected"],
                                       kwargs["restart_on_unexpected"],
-                                      kwargs["debug_info"]) as manager_group:
+                                      kwargs["debug_info"],
+                                      kwargs["batch_size"],
+                                      stop_flag) as manager_group:
                         try:
-                            manager_group.run(test_type, run_tests)
+                            manager_group.run(group_test_types, run_tests)
                         except KeyboardInterrupt:
                             logger.critical("Main thread got signal")
                             manager_group.stop()
                             raise
                     unexpected_count += manager_group.unexpected_count()
 
+                if screenshot_hashes is not None and screenshot_cache is not None:
+                    screenshot_hashes.update(screenshot_cache, reftest_keys)
+                    screenshot_hashes.save()
+
                 unexpected_total += unexpected_count
                 logger.info("Got %i unexpected results" % unexpected_count)
                 if repeat_until_unexpected and unexpected_total > 0:
                     break
                 logger.suite_end()
+                if stop_flag is not None and stop_flag.is_set():
+                    logger.info("Stopping the run early")
+                    break
     return unexpected_total == 0
 
 
@@ -0,0 +1,5 @@
+count = [0]
+
+def main(request, response):
+    count[0] += 1
+    return str(count[0])
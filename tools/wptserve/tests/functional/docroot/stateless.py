@@ -0,0 +1,7 @@
+__stateless__ = True
+
+count = [0]
+
+def main(request, response):
+    count[0] += 1
+    return str(count[0])
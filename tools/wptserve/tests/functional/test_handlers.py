@@ -85,6 +85,13 @@ class TestFileHandler(TestUsingServer):
             self.request("/document.txt", headers={"Range":"bytes=%i-%i" % (len(expected), len(expected) + 10)})
         self.assertEqual(cm.exception.code, 416)
 
+    def test_range_pipe(self):
+        resp = self.request("/document.txt", query="pipe=slice(2,5)",
+                            headers={"Range":"bytes=10-19"})
+        self.assertEqual(206, resp.getcode())
+        expected = open(os.path.join(doc_root, "document.txt"), 'rb').read()
+        self.assertEqual(expected[12:15], resp.read())
+
     def test_sub_config(self):
         resp = self.request("/sub.sub.txt")
         expected = b"localhost localhost %i" % self.server.port
@@ -268,6 +275,54 @@ class TestPythonHandler(TestUsingServer):
 
         assert cm.value.code == 404
 
+    def test_script_error(self):
+        # Errors from running the script aren't reported as the script being missing
+        for name, source in [("main_error.py",
+                              "def main(request, response):\n    raise OSError('FAIL')\n"),
+                             ("module_error.py",
+                              "open('missing.txt')\ndef main(request, response):\n    pass\n")]:
+            path = os.path.join(doc_root, name)
+            try:
+                with open(path, "w") as f:
+                    f.write(source)
+                with pytest.raises(HTTPError) as cm:
+                    self.request("/" + name)
+
+                assert cm.value.code == 500
+            finally:
+                os.unlink(path)
+
+    def test_stateless(self):
+        wptserve.handlers.script_cache.clear()
+        assert self.request("/stateless.py").read() == "1"
+        assert self.request("/stateless.py").read() == "2"
+
+    def test_not_stateless(self):
+        wptserve.handlers.script_cache.clear()
+        assert self.request("/not_stateless.py").read() == "1"
+        assert self.request("/not_stateless.py").read() == "1"
+
+    def test_cache_invalidation(self):
+        path = os.path.join(doc_root, "cache_invalidation.py")
+        try:
+            with open(path, "w") as f:
+                f.write("def main(request, response):\n    return 'FAIL'\n")
+            assert self.request("/cache_invalidation.py").read() == "FAIL"
+
+            with open(path, "w") as f:
+                f.write("def main(request, response):\n    return 'PASS' + ''\n")
+            assert self.request("/cache_invalidation.py").read() == "PASS"
+        finally:
+            os.unlink(path)
+
+    def test_no_cache(self):
+        route = ("GET", "/test/stateless.py",
+                 wptserve.handlers.PythonScriptHandler(base_path=doc_root, url_base="/test/",
+                                                       cache=False))
+        self.server.router.register(*route)
+        assert self.request("/test/stateless.py").read() == "1"
+        assert self.request("/test/stateless.py").read() == "1"
+
 
 class TestDirectoryHandler(TestUsingServer):
     def test_directory(self):
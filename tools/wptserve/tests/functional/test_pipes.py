@@ -66,6 +66,31 @@ class TestSub(TestUsingServer):
         expected = "PASS"
         self.assertEqual(resp.read().rstrip(), expected)
 
+    def test_sub_var(self):
+        resp = self.request("/sub_var.sub.txt")
+        first, second = resp.read().split()
+        self.assertEqual(first, second)
+
+    def test_sub_after_slice(self):
+        resp = self.request("/sub_params.txt", query="test=PASS&pipe=slice(0,13)|sub")
+        expected = "PASS"
+        self.assertEqual(resp.read().rstrip(), expected)
+
+    def test_sub_cache_invalidation(self):
+        path = os.path.join(doc_root, "cache_invalidation.sub.txt")
+        try:
+            with open(path, "w") as f:
+                f.write("{{GET[first]}}")
+            self.assertEqual(self.request("/cache_invalidation.sub.txt",
+                                          query="first=FAIL&second=PASS").read(), "FAIL")
+
+            with open(path, "w") as f:
+                f.write("{{GET[second]}}")
+            self.assertEqual(self.request("/cache_invalidation.sub.txt",
+                                          query="first=FAIL&second=PASS").read(), "PASS")
+        finally:
+            os.unlink(path)
+
 class TestTrickle(TestUsingServer):
     def test_trickle(self):
         #Actually testing that the response trickles in is not that easy
@@ -0,0 +1,88 @@
+import pytest
+from six.moves.urllib.parse import urlsplit
+
+wptserve = pytest.importorskip("wptserve")
+from wptserve.router import Router, any_method
+
+
+class Request(object):
+    def __init__(self, method, path):
+        self.method = method
+        self.url_parts = urlsplit(path)
+        self.route_match = None
+
+
+def linear_get_handler(router, request):
+    """Reference implementation checking each route in turn"""
+    for method, regexp, handler in reversed(router.routes):
+        if (request.method == method or
+            method in (any_method, "*") or
+            (request.method == "HEAD" and method == "GET")):
+            m = regexp.match(request.url_parts.path)
+            if m:
+                match_parts = m.groupdict().copy()
+                if len(match_parts) < len(m.groups()):
+                    match_parts["*"] = m.groups()[-1]
+                return handler, match_parts
+    return None, None
+
+
+def make_routes(mount_points):
+    routes = [("GET", "/tools/runner/*", "runner"),
+              ("POST", "/tools/runner/update_manifest.py", "update_manifest"),
+              ("*", "/_certs/*", "404"),
+              ("*", "/tools/*", "404"),
+              ("*", "{spec}/tools/*", "404"),
+              ("*", "/serve.py", "404")]
+    for i, url_base in enumerate(mount_points):
+        for method, suffix in [("GET", "*.worker.html"),
+                               ("GET", "*.window.html"),
+                               ("GET", "*.any.html"),
+                               ("GET", "*.any.worker.js"),
+                               ("GET", "*.asis"),
+                               ("*", "*.py"),
+                               ("GET", "*")]:
+            routes.append((method, url_base + suffix, "%s %s" % (url_base, suffix)))
+    routes.append((["GET", "POST"], "/api/{resource}/*.json", "api"))
+    return routes
+
+
+paths = ["/", "/test.html", "/dom/test.any.html", "/a/b.worker.html", "/tools/runner/index.html",
+         "/tools/runner/update_manifest.py", "/tools/foo.py", "/css/tools/x.html", "/serve.py",
+         "/_certs/x", "/api/test/data.json", "/api/test/test2/data.json", "/api/test/data.py",
+         "/mount5/x.py", "/mount5/x.any.html", "/mount20/a/b/c.asis", "/mount20x/y.html"]
+
+
+@pytest.mark.parametrize("count", [0, 1, 20])
+@pytest.mark.parametrize("method", ["GET", "HEAD", "POST", "PUT"])
+def test_get_handler(count, method):
+    mount_points = ["/"] + ["/mount%i/" % i for i in range(count)]
+    router = Router("/", make_routes(mount_points))
+    if count == 20 and method in ("GET", "HEAD"):
+        # Make sure the routes span more than one combined regexp
+        assert len(router._get_dispatch(method)[1]) > 1
+
+    for path in paths:
+        request = Request(method, path)
+        expected_handler, expected_match = linear_get_handler(router, request)
+        assert router.get_handler(request) == expected_handler
+        assert request.route_match == expected_match
+
+
+def test_register_invalidates():
+    router = Router("/", [("GET", "/*", "all")])
+    request = Request("GET", "/test.html")
+    assert router.get_handler(request) == "all"
+
+    router.register("GET", "/test.html", "test")
+    assert router.get_handler(request) == "test"
+    assert router.get_handler(Request("GET", "/other.html")) == "all"
+
+
+def test_unregistered_methods_share_dispatch():
+    router = Router("/", make_routes(["/"]))
+    for i in range(10):
+        request = Request("METHOD%i" % i, "/test.py")
+        assert router.get_handler(request) == "/ *.py"
+    assert router.get_handler(Request("PUT", "/test.html")) is None
+    assert sorted(router._dispatch.keys()) == ["*"]
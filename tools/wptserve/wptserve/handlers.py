@@ -1,13 +1,15 @@
 import cgi
 import json
 import os
+import threading
 import traceback
 
+from six import exec_
 from six.moves.urllib.parse import parse_qs, quote, unquote, urljoin
 
 from .constants import content_types
-from .pipes import Pipeline, template
-from .ranges import RangeParser
+from .pipes import Pipeline, template_cache
+from .ranges import RangeFile, RangeParser
 from .request import Authentication
 from .response import MultipartContent
 from .utils import HTTPException
@@ -171,36 +173,39 @@ class FileHandler(object):
             use_sub = False
 
         try:
-            with open(headers_path) as headers_file:
-                data = headers_file.read()
+            with open(headers_path, "rb") as headers_file:
+                if use_sub:
+                    data = template_cache.get(headers_path, headers_file).render(request,
+                                                                                 escape_type="none")
+                else:
+                    data = headers_file.read()
         except IOError:
             return []
         else:
-            if use_sub:
-                data = template(request, data, escape_type="none")
             return [tuple(item.strip() for item in line.split(":", 1))
                     for line in data.splitlines() if line]
 
     def get_data(self, response, path, byte_ranges):
-        """Return either the handle to a file, or a string containing
-        the content of a chunk of the file, if we have a range request."""
+        """Return either the handle to a file, a RangeFile covering part of
+        the file for a single range request, or the multipart content for a
+        request with several ranges."""
         if byte_ranges is None:
             return open(path, 'rb')
+        elif len(byte_ranges) == 1:
+            response.status = 206
+            response.headers.set("Content-Range", byte_ranges[0].header_value())
+            return RangeFile(open(path, 'rb'), byte_ranges[0])
         else:
             with open(path, 'rb') as f:
                 response.status = 206
-                if len(byte_ranges) > 1:
-                    parts_content_type, content = self.set_response_multipart(response,
-                                                                              byte_ranges,
-                                                                              f)
-                    for byte_range in byte_ranges:
-                        content.append_part(self.get_range_data(f, byte_range),
-                                            parts_content_type,
-                                            [("Content-Range", byte_range.header_value())])
-                    return content
-                else:
-                    response.headers.set("Content-Range", byte_ranges[0].header_value())
-                    return self.get_range_data(f, byte_ranges[0])
+                parts_content_type, content = self.set_response_multipart(response,
+                                                                          byte_ranges,
+                                                                          f)
+                for byte_range in byte_ranges:
+                    content.append_part(self.get_range_data(f, byte_range),
+                                        parts_content_type,
+                                        [("Content-Range", byte_range.header_value())])
+                return content
 
     def set_response_multipart(self, response, ranges, f):
         parts_content_type = response.headers.get("Content-Type")
@@ -220,27 +225,79 @@ class FileHandler(object):
 file_handler = FileHandler()
 
 
+class ScriptCache(object):
+    """Cache of compiled python handler scripts, keyed by path.
+
+    Entries are invalidated when the mtime or size of the file changes. For
+    scripts that set ``__stateless__ = True`` at the top level, the
+    environment produced by running the script is also kept, so that later
+    requests call the existing ``main`` function without rerunning the
+    module-level code."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, path, stat):
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == (stat.st_mtime, stat.st_size):
+            return entry[1], entry[2]
+        return None, None
+
+    def set(self, path, stat, code, environ=None):
+        with self._lock:
+            self._entries[path] = ((stat.st_mtime, stat.st_size), code, environ)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+script_cache = ScriptCache()
+
+
 class PythonScriptHandler(object):
-    def __init__(self, base_path=None, url_base="/"):
+    def __init__(self, base_path=None, url_base="/", cache=True):
         self.base_path = base_path
         self.url_base = url_base
+        self.cache = cache
 
     def __repr__(self):
         return "<%s base_path:%s url_base:%s>" % (self.__class__.__name__, self.base_path, self.url_base)
 
+    def _load_environ(self, path):
+        # Only failing to read the script means that it wasn't found; errors
+        # from running it are server errors
+        try:
+            stat = os.stat(path)
+            code, environ = script_cache.get(path, stat) if self.cache else (None, None)
+            if environ is not None:
+                return environ
+
+            if code is None:
+                with open(path, "rb") as f:
+                    source = f.read()
+                code = compile(source, path, "exec", 0, True)
+        except (IOError, OSError):
+            raise HTTPException(404)
+
+        environ = {"__file__": path}
+        exec_(code, environ, environ)
+        if self.cache:
+            script_cache.set(path, stat, code,
+                             environ if environ.get("__stateless__") else None)
+        return environ
+
     def __call__(self, request, response):
         path = filesystem_path(self.base_path, request, self.url_base)
 
-        try:
-            environ = {"__file__": path}
-            execfile(path, environ, environ)
-            if "main" in environ:
-                handler = FunctionHandler(environ["main"])
-                handler(request, response)
-            else:
-                raise HTTPException(500, "No main function in script %s" % path)
-        except IOError:
-            raise HTTPException(404)
+        environ = self._load_environ(path)
+        if "main" in environ:
+            handler = FunctionHandler(environ["main"])
+            handler(request, response)
+        else:
+            raise HTTPException(500, "No main function in script %s" % path)
 
 python_script_handler = PythonScriptHandler()
 
@@ -1,6 +1,8 @@
 from cgi import escape
 import gzip as gzip_module
+import os
 import re
+import threading
 import time
 import types
 import uuid
@@ -357,34 +359,46 @@ def sub(request, response, escape_type="html"):
 
     {{$id}}
     """
-    content = resolve_content(response)
-
-    new_content = template(request, content, escape_type=escape_type)
-
-    response.content = new_content
+    content = response.content
+    if isinstance(getattr(content, "name", None), types.StringTypes):
+        # Whole files are compiled once and then reused until they change
+        try:
+            compiled = template_cache.get(content.name, content)
+        finally:
+            content.close()
+        response.content = compiled.render(request, escape_type)
+    else:
+        response.content = template(request, resolve_content(response),
+                                    escape_type=escape_type)
     return response
 
-def template(request, content, escape_type="html"):
-    #TODO: There basically isn't any error handling here
-    tokenizer = ReplacementTokenizer()
+escape_funcs = {"html": lambda x:escape(x, quote=True),
+                "none": lambda x:x}
 
-    variables = {}
+template_regexp = re.compile(r"{{([^}]*)}}")
 
-    def config_replacement(match):
-        content, = match.groups()
 
-        tokens = tokenizer.tokenize(content)
+class TemplateField(object):
+    """A single {{...}} substitution in a compiled Template.
+
+    :param content: The text between the braces."""
+    def __init__(self, content):
+        tokens = ReplacementTokenizer().tokenize(content)
 
         if tokens[0][0] == "var":
-            variable = tokens[0][1]
+            self.variable = tokens[0][1]
             tokens = tokens[1:]
         else:
-            variable = None
+            self.variable = None
 
         assert tokens[0][0] == "ident" and all(item[0] == "index" for item in tokens[1:]), tokens
 
-        field = tokens[0][1]
+        self.tokens = tokens
+        self.field = tokens[0][1]
+        self.indexes = [item[1] for item in tokens[1:]]
 
+    def resolve(self, request, variables):
+        field = self.field
         if field in variables:
             value = variables[field]
         elif field == "headers":
@@ -392,7 +406,7 @@ def template(request, content, escape_type="html"):
         elif field == "GET":
             value = FirstWrapper(request.GET)
         elif field in request.server.config:
-            value = request.server.config[tokens[0][1]]
+            value = request.server.config[field]
         elif field == "location":
             value = {"server": "%s://%s:%s" % (request.url_parts.scheme,
                                                request.url_parts.hostname,
@@ -412,25 +426,86 @@ def template(request, content, escape_type="html"):
         else:
             raise Exception("Undefined template variable %s" % field)
 
-        for item in tokens[1:]:
-            value = value[item[1]]
+        for index in self.indexes:
+            value = value[index]
+
+        assert isinstance(value, (int,) + types.StringTypes), self.tokens
+
+        if self.variable is not None:
+            variables[self.variable] = value
+
+        return value
+
+
+class Template(object):
+    """Template content for the sub pipe, parsed once so that it can be
+    rendered for many requests.
+
+    :param content: The bytes of the template."""
+    def __init__(self, content):
+        parts = template_regexp.split(content)
+        # split alternates literal text and the content of the substitutions
+        self.parts = [part if i % 2 == 0 else TemplateField(part)
+                      for i, part in enumerate(parts)]
 
-        assert isinstance(value, (int,) + types.StringTypes), tokens
+    def render(self, request, escape_type="html"):
+        """Return the template content with substitutions made for request."""
+        if len(self.parts) == 1:
+            return self.parts[0]
 
-        if variable is not None:
-            variables[variable] = value
+        escape_func = escape_funcs[escape_type]
+        variables = {}
+        rv = []
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                rv.append(part)
+            else:
+                value = part.resolve(request, variables)
+                #Should possibly support escaping for other contexts e.g. script
+                #TODO: read the encoding of the response
+                rv.append(escape_func(unicode(value)).encode("utf-8"))
+        return b"".join(rv)
+
+
+class TemplateCache(object):
+    """Cache of compiled templates, keyed by path.
+
+    Entries are invalidated when the inode, mtime or size of the file
+    changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
 
-        escape_func = {"html": lambda x:escape(x, quote=True),
-                       "none": lambda x:x}[escape_type]
+    def get(self, path, f):
+        """Return the compiled Template for the file at path.
 
-        #Should possibly support escaping for other contexts e.g. script
-        #TODO: read the encoding of the response
-        return escape_func(unicode(value)).encode("utf-8")
+        :param path: Path of the template file, used as the cache key.
+        :param f: File object open for reading at the start of the file."""
+        stat = os.fstat(f.fileno())
+        key = (stat.st_ino, stat.st_mtime, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                return entry[1]
 
-    template_regexp = re.compile(r"{{([^}]*)}}")
-    new_content = template_regexp.sub(config_replacement, content)
+        compiled = Template(f.read())
+        with self._lock:
+            self._entries[path] = (key, compiled)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+template_cache = TemplateCache()
+
+
+def template(request, content, escape_type="html"):
+    #TODO: There basically isn't any error handling here
+    return Template(content).render(request, escape_type)
 
-    return new_content
 
 @pipe()
 def gzip(request, response):
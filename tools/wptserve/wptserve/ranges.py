@@ -88,3 +88,30 @@ class Range(object):
 
     def header_value(self):
         return "bytes %i-%i/%i" % (self.lower, self.upper - 1, self.file_size)
+
+
+class RangeFile(object):
+    """File-like object exposing a single byte range of an open file.
+
+    :param f: File object to read from; it is closed along with this object.
+    :param byte_range: Range of the file to expose.
+    """
+    def __init__(self, f, byte_range):
+        self.file = f
+        self.offset = byte_range.lower
+        self.length = byte_range.upper - byte_range.lower
+        self._pos = 0
+
+    def read(self, size=-1):
+        remaining = self.length - self._pos
+        if size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        self.file.seek(self.offset + self._pos)
+        data = self.file.read(size)
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        self.file.close()
@@ -8,6 +8,7 @@ import socket
 
 from .constants import response_codes
 from .logger import get_logger
+from .ranges import RangeFile
 
 missing = object()
 
@@ -404,6 +405,9 @@ class ResponseWriter(object):
             "content-length" not in self._headers_seen):
             #Would be nice to avoid double-encoding here
             self.write_header("Content-Length", len(self.encode(self._response.content)))
+        elif (isinstance(self._response.content, RangeFile) and
+              "content-length" not in self._headers_seen):
+            self.write_header("Content-Length", self._response.content.length)
 
     def end_headers(self):
         """Finish writing headers and write the separator.
@@ -27,7 +27,15 @@ class RouteTokenizer(object):
         return scanner.scan(input_str)
 
 class RouteCompiler(object):
-    def __init__(self):
+    """Compile a tokenized route pattern into a regular expression.
+
+    :param capture: Whether the regexp should contain the match groups
+                    for {name} groups and *. Without these the regexp
+                    can be combined with others, but it can only be used
+                    to test whether a path matches.
+    """
+    def __init__(self, capture=True):
+        self.capture = capture
         self.reset()
 
     def reset(self):
@@ -64,15 +72,19 @@ class RouteCompiler(object):
     def process_group(self, token):
         if self.star_seen:
             raise ValueError("Group seen after star in regexp")
+        if not self.capture:
+            return "[^/]+"
         return "(?P<%s>[^/]+)" % token[1]
 
     def process_star(self, token):
         if self.star_seen:
             raise ValueError("Star seen after star in regexp")
         self.star_seen = True
+        if not self.capture:
+            return "(?:.*"
         return "(.*"
 
-def compile_path_match(route_pattern):
+def compile_path_match(route_pattern, capture=True):
     """tokens: / or literal or match or *"""
 
     tokenizer = RouteTokenizer()
@@ -80,10 +92,32 @@ def compile_path_match(route_pattern):
 
     assert unmatched == "", unmatched
 
-    compiler = RouteCompiler()
+    compiler = RouteCompiler(capture=capture)
 
     return compiler.compile(tokens)
 
+# Python 2 limits the number of groups in a single regexp to 100
+max_routes_per_regexp = 90
+
+def compile_dispatch(patterns):
+    """Combine a list of route regexp patterns that have no capturing
+    groups into a list of regexps matching the same paths. Each pattern
+    is wrapped in a group named r<index>, so that for a match the
+    lastgroup attribute identifies the first pattern in the list that
+    matched, just as if the patterns were tried one at a time.
+
+    :param patterns: List of regexp pattern strings
+    :returns: List of (offset, regexp) pairs, where the index of the
+              matching pattern is offset plus the number in lastgroup.
+    """
+    rv = []
+    for offset in range(0, len(patterns), max_routes_per_regexp):
+        chunk = patterns[offset:offset + max_routes_per_regexp]
+        regexp = re.compile("|".join("(?P<r%i>%s)" % (i, pattern)
+                                     for i, pattern in enumerate(chunk)))
+        rv.append((offset, regexp))
+    return rv
+
 class Router(object):
     """Object for matching handler functions to requests.
 
@@ -98,6 +132,12 @@ class Router(object):
         self.doc_root = doc_root
         self.routes = []
         self.logger = get_logger()
+        # Non-capturing pattern for each entry in self.routes
+        self._match_patterns = []
+        # Methods that have routes of their own
+        self._methods = set()
+        # Map of request method to (routes, dispatch regexps) for that method
+        self._dispatch = {}
         for route in reversed(routes):
             self.register(*route)
 
@@ -139,7 +179,33 @@ class Router(object):
             methods = [methods]
         for method in methods:
             self.routes.append((method, compile_path_match(path), handler))
+            self._methods.add(method)
+            self._match_patterns.append(compile_path_match(path, capture=False).pattern)
             self.logger.debug("Route pattern: %s" % self.routes[-1][1].pattern)
+        self._dispatch = {}
+
+    def _get_dispatch(self, request_method):
+        """Get the routes that apply to a request method, in priority order,
+        along with the regexps used to find the first matching route."""
+        if (request_method not in self._methods and
+            not (request_method == "HEAD" and "GET" in self._methods)):
+            # Other methods only match the routes for any method, so they share
+            # one entry rather than adding one for each method a client sends
+            request_method = "*"
+        dispatch = self._dispatch.get(request_method)
+        if dispatch is None:
+            routes = []
+            patterns = []
+            for route, pattern in reversed(list(zip(self.routes, self._match_patterns))):
+                method = route[0]
+                if (request_method == method or
+                    method in (any_method, "*") or
+                    (request_method == "HEAD" and method == "GET")):
+                    routes.append(route)
+                    patterns.append(pattern)
+            dispatch = (routes, compile_dispatch(patterns))
+            self._dispatch[request_method] = dispatch
+        return dispatch
 
     def get_handler(self, request):
         """Get a handler for a request or None if there is no handler.
@@ -147,22 +213,25 @@ class Router(object):
         :param request: Request to get a handler for.
         :rtype: Callable or None
         """
-        for method, regexp, handler in reversed(self.routes):
-            if (request.method == method or
-                method in (any_method, "*") or
-                (request.method == "HEAD" and method == "GET")):
-                m = regexp.match(request.url_parts.path)
-                if m:
-                    if not hasattr(handler, "__class__"):
-                        name = handler.__name__
-                    else:
-                        name = handler.__class__.__name__
-                    self.logger.debug("Found handler %s" % name)
-
-                    match_parts = m.groupdict().copy()
-                    if len(match_parts) < len(m.groups()):
-                        match_parts["*"] = m.groups()[-1]
-                    request.route_match = match_parts
-
-                    return handler
+        path = request.url_parts.path
+        routes, dispatch = self._get_dispatch(request.method)
+        for offset, dispatch_regexp in dispatch:
+            m = dispatch_regexp.match(path)
+            if m:
+                method, regexp, handler = routes[offset + int(m.lastgroup[1:])]
+                m = regexp.match(path)
+                assert m is not None
+
+                if not hasattr(handler, "__class__"):
+                    name = handler.__name__
+                else:
+                    name = handler.__class__.__name__
+                self.logger.debug("Found handler %s" % name)
+
+                match_parts = m.groupdict().copy()
+                if len(match_parts) < len(m.groups()):
+                    match_parts["*"] = m.groups()[-1]
+                request.route_match = match_parts
+
+                return handler
         return None